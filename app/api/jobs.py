@@ -0,0 +1,156 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+import docker
+
+from app.backup import NauticalBackup
+from app.logger import Logger
+from app.nautical_env import get_nautical_env
+
+
+class JobAlreadyRunning(Exception):
+    """A backup is already running (or queued) and API_JOB_OVERLAP=reject"""
+
+    def __init__(self, job: "BackupJob"):
+        super().__init__(f"Backup job {job.id} is already {job.status}")
+        self.job = job
+
+
+class BackupJob:
+    def __init__(self):
+        self.id: str = uuid.uuid4().hex
+        self.status: str = "queued"  # queued, running, completed or failed
+        self.created_at: datetime = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+        self.summary: Dict[str, Any] = {}
+        self.future: Optional[Future] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ["queued", "running"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "summary": self.summary,
+        }
+
+    def __repr__(self) -> str:
+        return f"BackupJob(id={self.id}, status={self.status})"
+
+
+class JobManager:
+    """Runs backups inside the API process, one at a time, on a single worker thread.
+
+    The Docker client and NauticalBackup are created on the first job and reused afterwards.
+    Plans use a NauticalBackup of their own on the same Docker client, so they never share state with a backup.
+    Overlapping requests are rejected or queued depending on API_JOB_OVERLAP.
+    """
+
+    MAX_JOBS_KEPT = 50  # Finished jobs older than this are forgotten
+
+    def __init__(self, docker_factory: Callable[[], docker.DockerClient] = docker.from_env):
+        self._docker_factory = docker_factory
+        self._docker: Optional[docker.DockerClient] = None
+        self._nautical: Optional[NauticalBackup] = None
+        self._planner: Optional[NauticalBackup] = None
+        self._plan_lock = threading.Lock()  # plan() resets the planner's state, so one plan at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nautical-job")
+        self._jobs: "OrderedDict[str, BackupJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self) -> BackupJob:
+        """Queue a backup. Raises JobAlreadyRunning when another job is active and API_JOB_OVERLAP=reject"""
+        with self._lock:
+            active = [job for job in self._jobs.values() if job.is_active]
+            if active and get_nautical_env().API_JOB_OVERLAP == "reject":
+                raise JobAlreadyRunning(active[0])
+
+            # A queued job will already pick up every change, so there is no need for a second one
+            queued = [job for job in active if job.status == "queued"]
+            if queued:
+                return queued[0]
+
+            job = BackupJob()
+            self._jobs[job.id] = job
+            self._forget_old_jobs()
+            job.future = self._executor.submit(self._run, job)
+            return job
+
+    def get(self, job_id: str) -> Optional[BackupJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job: BackupJob, timeout: Optional[float] = None) -> BackupJob:
+        if job.future:
+            job.future.result(timeout)
+        return job
+
+    def plan(self, estimate: Optional[str] = None) -> Dict[str, Any]:
+        """Estimate the next backup"""
+        with self._plan_lock:
+            if self._planner is None:
+                self._planner = NauticalBackup(self._get_docker(), new_report_file=False)
+            return self._planner.plan(estimate)
+
+    def shutdown(self) -> None:
+        """Let a running backup finish (so its containers are restarted) and drop the queued ones"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            if self._docker is not None:
+                self._docker.close()
+                self._docker = None
+
+    def _get_docker(self) -> docker.DockerClient:
+        with self._lock:
+            if self._docker is None:
+                self._docker = self._docker_factory()
+            return self._docker
+
+    def _get_nautical(self) -> NauticalBackup:
+        if self._nautical is None:
+            self._nautical = NauticalBackup(self._get_docker())
+        return self._nautical
+
+    def _run(self, job: BackupJob) -> None:
+        job.status = "running"
+        job.started_at = datetime.now()
+        try:
+            nautical = self._get_nautical()
+            nautical.backup(exit_on_run_once=False)  # RUN_ONCE must not stop the API container
+            job.summary = self._summarize(nautical)
+            job.status = "completed"
+        except SystemExit:
+            job.summary = self._summarize(self._get_nautical())
+            job.status = "completed"
+        except Exception as e:
+            Logger().log_this(f"Backup job {job.id} failed: {e}", "ERROR")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now()
+
+    @staticmethod
+    def _summarize(nautical: NauticalBackup) -> Dict[str, Any]:
+        return {
+            "completed": sorted(nautical.containers_completed),
+            "skipped": sorted(nautical.containers_skipped),
+            "failed": sorted(nautical.containers_failed),
+            "errors": list(nautical.error_messages),
+        }
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if not job.is_active]
+        for job_id in finished[: max(0, len(self._jobs) - self.MAX_JOBS_KEPT)]:
+            del self._jobs[job_id]
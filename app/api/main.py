@@ -3,7 +3,7 @@ from fastapi.security import HTTPBasic
 import uvicorn
 import os
 from typing import Annotated
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from functools import lru_cache
 from contextlib import asynccontextmanager
@@ -12,6 +12,7 @@ from app.api.config import Settings
 from app.api.authorize import authorize
 import app.api.nautical_router as nautical_router
 from app.logger import Logger
+from app.metrics import MetricsRegistry
 
 
 @asynccontextmanager
@@ -23,6 +24,7 @@ async def lifespan(app: FastAPI):
     # Steps that will happen on shutdown event
     logger = Logger()
     logger.log_this("Shutting down API...", "INFO")
+    nautical_router.jobs.shutdown()
 
 
 @lru_cache
@@ -59,6 +61,12 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics(username: Annotated[str, Depends(authorize)]):
+    """Prometheus metrics of every backup run. Requires PROMETHEUS_METRICS=true"""
+    return PlainTextResponse(MetricsRegistry.load().render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/auth")
 def auth(username: Annotated[str, Depends(authorize)]):
     return {"username": username}
@@ -1,26 +1,33 @@
-from typing import Any, Union, Optional
-from fastapi import HTTPException, APIRouter, Depends, Path, status, BackgroundTasks
-import subprocess
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+from typing import Any, AsyncIterator, Union, Optional
+from fastapi import HTTPException, APIRouter, Depends, Path, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
-from typing import Annotated
+from typing import Annotated, Literal
 
 from app.api.authorize import authorize
+from app.api.jobs import BackupJob, JobAlreadyRunning, JobManager
 from app.api.utils import next_cron_occurrences
 from app.db import DB
+from app.events import event_bus, follow_progress_events
+from app.nautical_env import get_nautical_env
 
 # All routes in this file start with /nautical
 router = APIRouter(prefix="/api/v1/nautical", tags=["nautical"])
 
 db = DB()
+jobs = JobManager()
 
 
-def kickoff_nautical():
+def submit_backup_job() -> BackupJob:
     try:
-        subprocess.run(["nautical"], check=True)
-        return {"message": f"Nautical Backup completed successfully"}
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(status_code=500, detail=str(e.stderr.decode()))
+        return jobs.submit()
+    except JobAlreadyRunning as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": str(e), "job_id": e.job.id},
+        )
 
 
 @router.get("/dashboard", summary="The most useful information", response_class=JSONResponse)
@@ -30,17 +37,18 @@ def dashboard(username: Annotated[str, Depends(authorize)]) -> JSONResponse:
     """
 
     next_crons = next_cron_occurrences(5)
+    data = db.dump_json()  # Read the database once for every value
 
     d = {
         "next_cron": next_crons,
         "next_run": next_crons.get("1", [None, None])[1] if next_crons else None,
-        "last_cron": db.get("last_cron", "None"),
-        "number_of_containers": db.get("number_of_containers", 0),
-        "last_backup_seconds_taken": db.get("last_backup_seconds_taken", 0),
-        "completed": db.get("containers_completed", 0),
-        "skipped": db.get("containers_skipped", 0),
-        "errors": db.get("errors", 0),
-        "backup_running": db.get("containers_skipped", "false"),
+        "last_cron": data.get("last_cron", "None"),
+        "number_of_containers": data.get("number_of_containers", 0),
+        "last_backup_seconds_taken": data.get("last_backup_seconds_taken", 0),
+        "completed": data.get("containers_completed", 0),
+        "skipped": data.get("containers_skipped", 0),
+        "errors": data.get("errors", 0),
+        "backup_running": data.get("containers_skipped", "false"),
     }
     return JSONResponse(content=jsonable_encoder(d))
 
@@ -59,6 +67,84 @@ def next_cron(
     return res
 
 
+@router.get("/history", summary="The most recent backup runs", response_class=JSONResponse)
+def history(
+    username: Annotated[str, Depends(authorize)],
+    limit: Annotated[int, Query(ge=1, le=500)] = 20,
+) -> JSONResponse:
+    """
+    Return the most recent backup runs, newest first. Requires `NAUTICAL_DB_BACKEND=sqlite`.
+    """
+    return JSONResponse(content=jsonable_encoder({"backend": db.backend, "runs": db.get_runs(limit)}))
+
+
+@router.get(
+    "/history/{container_name}",
+    summary="The most recent backup outcomes of a single container",
+    response_class=JSONResponse,
+)
+def container_history(
+    username: Annotated[str, Depends(authorize)],
+    container_name: Annotated[str, Path(title="The name of the container")],
+    limit: Annotated[int, Query(ge=1, le=500)] = 20,
+) -> JSONResponse:
+    """
+    Return the duration, skip and failure reasons of a container for the most recent runs, newest first.
+    Requires `NAUTICAL_DB_BACKEND=sqlite`.
+    """
+    d = {
+        "backend": db.backend,
+        "container_name": container_name,
+        "outcomes": db.get_container_history(container_name, limit),
+    }
+    return JSONResponse(content=jsonable_encoder(d))
+
+
+@router.get("/rsync_stats", summary="The latest rsync statistics of every container", response_class=JSONResponse)
+def rsync_stats(username: Annotated[str, Depends(authorize)]) -> JSONResponse:
+    """
+    Return the files and bytes rsync transferred in the latest backup of each container, per destination folder,
+    with the largest transfers first. Requires `RSYNC_STATS=true`.
+    """
+    all_stats = db.get("rsync_stats", {}) or {}
+    totals = {
+        name: sum(r.get("transferred_file_size", 0) for r in destinations.values())
+        for name, destinations in all_stats.items()
+    }
+    containers = [
+        {"container_name": name, "bytes_transferred": totals[name], "destinations": all_stats[name]}
+        for name in sorted(all_stats, key=lambda name: totals[name], reverse=True)
+    ]
+    return JSONResponse(content=jsonable_encoder({"containers": containers}))
+
+
+@router.get(
+    "/rsync_stats/{container_name}",
+    summary="The latest rsync statistics of a single container",
+    response_class=JSONResponse,
+)
+def container_rsync_stats(
+    username: Annotated[str, Depends(authorize)],
+    container_name: Annotated[str, Path(title="The name of the container")],
+) -> JSONResponse:
+    destinations = (db.get("rsync_stats", {}) or {}).get(container_name)
+    if destinations is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No rsync stats for {container_name}")
+    return JSONResponse(content=jsonable_encoder({"container_name": container_name, "destinations": destinations}))
+
+
+@router.get("/plan", summary="Estimate the next backup without stopping any container", response_class=JSONResponse)
+def plan(
+    username: Annotated[str, Depends(authorize)],
+    estimate: Annotated[Optional[Literal["cached", "scan", "rsync"]], Query()] = None,
+) -> JSONResponse:
+    """
+    Return the containers of each group with their estimated transfer size and downtime, and whether every
+    destination has enough free space. `estimate` defaults to `PREFLIGHT_ESTIMATE`.
+    """
+    return JSONResponse(content=jsonable_encoder(jobs.plan(estimate)))
+
+
 @router.post(
     "/start_backup",
     summary="Start backup now, will not respond until the backup has been completed.",
@@ -68,7 +154,10 @@ def start_backup(username: Annotated[str, Depends(authorize)]):
     """
     Start a backup now and respond when completed. This respects all environment and docker labels.
     """
-    return kickoff_nautical()
+    job = jobs.wait(submit_backup_job())
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail={"message": job.error, "job_id": job.id})
+    return {"message": f"Nautical Backup completed successfully", "job_id": job.id}
 
 
 @router.post(
@@ -76,11 +165,62 @@ def start_backup(username: Annotated[str, Depends(authorize)]):
     summary="Start backup now, will immediatly respond even though the backup continues in the background",
     response_class=JSONResponse,
 )
-async def kickoff_backup(username: Annotated[str, Depends(authorize)], background_tasks: BackgroundTasks):
+async def kickoff_backup(username: Annotated[str, Depends(authorize)]):
     """
     Start a backup now and respond immediately. This respects all environment and docker labels.
     """
-    # Run the func 'kickoff_nautical' in the background, but return immediately
-    background_tasks.add_task(kickoff_nautical)
+    # The backup runs on the job worker thread, so this returns immediately
+    job = submit_backup_job()
 
-    return {"message": f"Nautical Backup started successfully"}
+    return {"message": f"Nautical Backup started successfully", "job_id": job.id}
+
+
+@router.get("/jobs/{job_id}", summary="The status of a backup started through the API", response_class=JSONResponse)
+def job_status(
+    username: Annotated[str, Depends(authorize)],
+    job_id: Annotated[str, Path(title="The job ID returned when the backup was started")],
+) -> JSONResponse:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Job {job_id} not found")
+    return JSONResponse(content=jsonable_encoder(job.to_dict()))
+
+
+@router.get(
+    "/events",
+    summary="Live backup progress as server-sent events",
+    response_class=StreamingResponse,
+)
+async def events(username: Annotated[str, Depends(authorize)], request: Request) -> StreamingResponse:
+    """
+    Stream container transitions (stopping, copying, starting, done, skipped, failed) and backup start/finish
+    as they happen. Backups run by this process (`/start_backup`, `/kickoff_backup`) are always streamed.
+    Backups run by another process (cron) are streamed when `JSON_LOG_FILE` is set.
+
+    Like every other route this requires HTTP Basic auth. `EventSource` cannot send an `Authorization` header,
+    so browsers should read the stream with `fetch()` instead (see `static/scripts.js`).
+    """
+    queue = event_bus.subscribe_queue(asyncio.get_running_loop())
+    json_log_file = get_nautical_env().JSON_LOG_FILE
+    follower = asyncio.create_task(follow_progress_events(json_log_file, queue)) if json_log_file else None
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            yield ": connected\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # Stops proxies from closing an idle connection
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            event_bus.unsubscribe(queue)
+            if follower is not None:
+                follower.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,3 +1,92 @@
 document.addEventListener('DOMContentLoaded', function() {
+    if (!window.fetch || !window.ReadableStream || !window.TextDecoder) {
+        return;
+    }
 
+    let progress = document.getElementById('backup-progress');
+    if (!progress) {
+        progress = document.createElement('ul');
+        progress.id = 'backup-progress';
+        document.body.appendChild(progress);
+    }
+
+    // One row per container, updated in place as it moves through the backup
+    function onContainer(event) {
+        let row = progress.querySelector('[data-container="' + CSS.escape(event.container_name) + '"]');
+        if (!row) {
+            row = document.createElement('li');
+            row.dataset.container = event.container_name;
+            progress.appendChild(row);
+        }
+
+        let text = event.container_name + ': ' + event.state;
+        if (event.reason) {
+            text += ' (' + event.reason + ')';
+        }
+        row.textContent = text;
+        row.className = 'state-' + event.state;
+    }
+
+    function onBackup(event) {
+        if (event.state === 'started') {
+            progress.innerHTML = '';
+        }
+        progress.dataset.state = event.state;
+    }
+
+    const handlers = {container: onContainer, backup: onBackup};
+
+    // Dispatch one server-sent event frame ("event:" and "data:" lines, comments start with ":")
+    function onFrame(frame) {
+        let type = 'message';
+        const data = [];
+        frame.split('\n').forEach(function(line) {
+            if (line.startsWith('event:')) {
+                type = line.slice(6).trim();
+            } else if (line.startsWith('data:')) {
+                data.push(line.slice(5).trim());
+            }
+        });
+        if (data.length && handlers[type]) {
+            handlers[type](JSON.parse(data.join('\n')));
+        }
+    }
+
+    // EventSource cannot send the Basic auth credentials the route requires, so read the stream with fetch.
+    // The browser adds the credentials it already holds for this origin.
+    function connect() {
+        fetch('/api/v1/nautical/events', {credentials: 'same-origin', headers: {Accept: 'text/event-stream'}})
+            .then(function(response) {
+                if (!response.ok || !response.body) {
+                    return;  // Not logged in, nothing to show
+                }
+
+                const reader = response.body.getReader();
+                const decoder = new TextDecoder();
+                let buffer = '';
+
+                function read() {
+                    return reader.read().then(function(result) {
+                        if (result.done) {
+                            setTimeout(connect, 5000);
+                            return;
+                        }
+
+                        buffer += decoder.decode(result.value, {stream: true}).replace(/\r\n/g, '\n');
+                        let end;
+                        while ((end = buffer.indexOf('\n\n')) !== -1) {
+                            onFrame(buffer.slice(0, end));
+                            buffer = buffer.slice(end + 2);
+                        }
+                        return read();
+                    });
+                }
+                return read();
+            })
+            .catch(function() {
+                setTimeout(connect, 5000);
+            });
+    }
+
+    connect();
 });
@@ -1,20 +1,43 @@
-from typing import Any, Optional, Union
+from typing import Any, Optional, Tuple, Union
 import croniter
 import pytz
+from pytz.tzinfo import BaseTzInfo
 import os
 from datetime import datetime
 
 
-def next_cron_occurrences(
-    occurrences: Optional[int] = 5, now: Optional[datetime] = None
-) -> Optional[dict[str | int, Any]]:
+def cron_schedule() -> Optional[Tuple[str, BaseTzInfo]]:
+    """The CRON_SCHEDULE expression and its timezone. None when the schedule is disabled"""
     cron_enabled = os.getenv("CRON_SCHEDULE_ENABLED", "true").lower()
     if cron_enabled == "false":
         return None
 
     cron_expression = os.getenv("CRON_SCHEDULE", "0 4 * * *")
     timezone = os.getenv("TZ", "Etc/UTC")
-    tz = pytz.timezone(timezone)
+    return cron_expression, pytz.timezone(timezone)
+
+
+def next_cron_time(now: Optional[datetime] = None) -> Optional[datetime]:
+    """The next time the CRON_SCHEDULE fires after `now`. None when the schedule is disabled"""
+    schedule = cron_schedule()
+    if schedule is None:
+        return None
+
+    cron_expression, tz = schedule
+    if now == None:
+        now = datetime.now(tz)
+
+    return croniter.croniter(cron_expression, start_time=now).get_next(datetime)
+
+
+def next_cron_occurrences(
+    occurrences: Optional[int] = 5, now: Optional[datetime] = None
+) -> Optional[dict[str | int, Any]]:
+    schedule = cron_schedule()
+    if schedule is None:
+        return None
+
+    cron_expression, tz = schedule
 
     if now == None:
         now = datetime.now(tz)
@@ -1,26 +1,37 @@
 #!/usr/bin/env python3
 
-import copy
+import argparse
+import contextlib
+import json
 import os
+import shlex
 import shutil
+import sqlite3
 import subprocess
 import sys
+import threading
 import time
 import codecs
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 import docker
-from docker.errors import APIError, ImageNotFound
+from docker.errors import APIError, DockerException, ImageNotFound
 from docker.models.containers import Container
-from requests.exceptions import ReadTimeout
+from requests.exceptions import ConnectionError as RequestsConnectionError, ReadTimeout
 
 from app.api.config import Settings
+from app.container_snapshot import ContainerSnapshot, refresh_container_states
 from app.db import DB
+from app.events import event_bus
 from app.logger import Logger, LogType
-from app.nautical_env import NauticalEnv
+from app.metrics import MetricsRegistry
+from app.nautical_env import get_nautical_env
+from app.retention_catalog import RetentionCatalog
+from app.rsync_stats import parse_rsync_stats, strip_quiet_flag, strip_rsync_stats
 
 
 class BeforeOrAfter(Enum):
@@ -34,10 +45,64 @@ class BeforeAfterorDuring(Enum):
     DURING = 3
 
 
+class RsyncResult:
+    """The outcome of copying one source folder to one destination"""
+
+    def __init__(
+        self,
+        container_name: str,
+        src_dir: Path,
+        dest_dir: Path,
+        returncode: int,
+        duration_seconds: float,
+        stats: Optional[Dict[str, int]] = None,
+    ):
+        self.container_name = container_name
+        self.src_dir = src_dir
+        self.dest_dir = dest_dir
+        self.returncode = returncode
+        self.duration_seconds = duration_seconds
+        self.stats = stats or {}  # Parsed `rsync --stats` output (RSYNC_STATS=true). Ex: {"literal_data": 1024}
+
+    @property
+    def bytes_transferred(self) -> Optional[int]:
+        """Size of the files rsync copied, or None when stats were not collected"""
+        return self.stats.get("transferred_file_size")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "src_dir": str(self.src_dir),
+            "dest_dir": str(self.dest_dir),
+            "returncode": self.returncode,
+            "duration_seconds": round(self.duration_seconds, 3),
+            **self.stats,
+        }
+
+    def __repr__(self) -> str:
+        transferred = f", {self.bytes_transferred} bytes" if self.bytes_transferred is not None else ""
+        return f"'{self.dest_dir}' (exit {self.returncode}, {self.duration_seconds:.2f}s{transferred})"
+
+
 class NauticalBackup:
-    def __init__(self, docker_client: docker.DockerClient):
+    # Expired backups are moved here before being deleted in the background (RETENTION_DELETE_MODE=background)
+    TRASH_DIR_NAME = ".nautical-trash"
+    # Background deletes that failed after their run was stored. Reported by the next run
+    PENDING_DELETE_ERRORS_KEY = "retention_delete_errors"
+
+    # How plan() estimates the size of each container (see PREFLIGHT_ESTIMATE)
+    PLAN_ESTIMATES = ["cached", "scan", "rsync"]
+
+    # Scan estimates of containers never backed up, for the next "cached" plan. Kept apart from container_sizes,
+    # which capacity retention trusts as the size of the previous run
+    PLAN_SIZE_ESTIMATES_KEY = "plan_size_estimates"
+
+    # Docker events that can move a container between states
+    CONTAINER_STATE_EVENTS = ["start", "restart", "die", "stop", "kill", "pause", "unpause", "destroy"]
+
+    def __init__(self, docker_client: docker.DockerClient, new_report_file: bool = True):
+        """new_report_file=False leaves the report file alone, for instances that only plan"""
         self.db = DB()
-        self.env = NauticalEnv()
+        self.env = get_nautical_env()
         self.logger = Logger()
         self.settings = Settings()
         self.docker = docker_client
@@ -49,12 +114,60 @@ class NauticalBackup:
         self.container_skip_reasons: Dict[str, str] = {}
         self.container_failure_reasons: Dict[str, str] = {}
         self.error_messages: List[str] = []
+        self.rsync_results: List[RsyncResult] = []
+        # (primary dest_dir, dest_dir_no_path) of each successful copy. Used to fill secondary destinations
+        self.primary_copies: Dict[str, List[Tuple[Path, str]]] = {}
+        # Same for the additional folders copied while the container was stopped
+        self.primary_additional_copies: Dict[str, List[Tuple[Path, str]]] = {}
+        # Seconds from the start of the BEFORE phase until the AFTER phase finished, per container
+        self.container_durations: Dict[str, float] = {}
+        self._container_start_times: Dict[str, float] = {}
+        self._container_stop_times: Dict[str, float] = {}  # When each container was stopped, to measure downtime
+        # Source fingerprints (SKIP_UNCHANGED_SOURCES). Loaded from the DB at the start of each backup
+        self.source_fingerprints: Dict[str, Dict] = {}
+        self._new_fingerprints: Dict[str, str] = {}
         self.prefix = self.env.LABEL_PREFIX
 
+        # Guards the outcome tracking above when groups are backed up concurrently
+        self._outcome_lock = threading.RLock()
+
+        # Copies to secondary destinations that run in the background (SECONDARY_DEST_MODE=deferred)
+        self._deferred_executor: Optional[ThreadPoolExecutor] = None
+        self._deferred_copies: List[Tuple[Container, Path, Future]] = []
+
+        # Deletes of expired backups that were moved to the trash (RETENTION_DELETE_MODE=background)
+        self._trash_executor: Optional[ThreadPoolExecutor] = None
+        self._trash_deletes: List[Future] = []
+        # Set once the outcome of the run is stored. Later delete failures are kept for the next run
+        self._outcome_stored = False
+
+        # Size of each container's last backup (bytes). Projects the space the next run needs
+        self.container_sizes: Dict[str, int] = {}
+        self._plan_size_estimates: Dict[str, int] = {}  # See PLAN_SIZE_ESTIMATES_KEY
+        self._capacity_lock = threading.Lock()
+        # Previous backups this run hard-links against (USE_LINK_DEST). Capacity retention must not remove them
+        self._link_dest_bases: Set[Path] = set()
+
+        # Seconds each container was stopped for. Stored after each run to estimate the next downtime
+        self.container_downtimes: Dict[str, float] = {}
+
+        # Index of the dated backup folders, so retention does not list every destination folder on each run
+        self.retention_catalog = RetentionCatalog(self.db, self.env.DEST_DATE_FORMAT, [self.TRASH_DIR_NAME])
+
+        # Populated by group_containers() when USE_CONTAINER_SNAPSHOT is enabled
+        self.snapshot: Optional[ContainerSnapshot] = None
+
+        # The group being backed up by the current thread, attached to every emitted event
+        self._event_context = threading.local()
+        self.event_bus = event_bus  # Live progress for the API (stopping, copying, starting, done, failed)
+
+        # Loaded at the start of each backup when PROMETHEUS_METRICS is enabled
+        self.metrics: Optional[MetricsRegistry] = None
+
         # Grab the backup starting time
         self.start_time = datetime.now()
 
-        if self.env.REPORT_FILE == True and self.env.REPORT_FILE_ON_BACKUP_ONLY == False:
+        if new_report_file and self.env.REPORT_FILE == True and self.env.REPORT_FILE_ON_BACKUP_ONLY == False:
             self.logger._create_new_report_file()
 
         self.verify_nautical_mounted_source_location(self.env.SOURCE_LOCATION)
@@ -79,19 +192,22 @@ class NauticalBackup:
         return ";".join(cleaned_messages)
 
     def _record_error(self, message: str) -> None:
-        if message not in self.error_messages:
-            self.error_messages.append(message)
+        with self._outcome_lock:
+            if message not in self.error_messages:
+                self.error_messages.append(message)
 
     def _record_container_skipped(self, c: Container, reason: str, message: str, log=True, level: str = "INFO") -> None:
-        self.containers_skipped.add(c.name)
-        self.container_skip_reasons.setdefault(c.name if c.name else str(c.id), reason)
+        with self._outcome_lock:
+            self.containers_skipped.add(c.name)
+            self.container_skip_reasons.setdefault(c.name if c.name else str(c.id), reason)
         if log:
             self.log_this(message, level)
 
     def _record_container_failed(self, c: Container, reason: str, message: str, log=True) -> None:
-        self.containers_failed.add(c.name)
-        self.container_failure_reasons.setdefault(c.name if c.name else str(c.id), reason)
-        self._record_error(message)
+        with self._outcome_lock:
+            self.containers_failed.add(c.name)
+            self.container_failure_reasons.setdefault(c.name if c.name else str(c.id), reason)
+            self._record_error(message)
         if log:
             self.log_this(message, "ERROR")
 
@@ -103,19 +219,174 @@ class NauticalBackup:
         return "success"
 
     def _reset_outcomes(self) -> None:
-        self.containers_completed.clear()
-        self.containers_skipped.clear()
-        self.containers_failed.clear()
-        self.container_skip_reasons.clear()
-        self.container_failure_reasons.clear()
-        self.error_messages.clear()
+        with self._outcome_lock:
+            self.containers_completed.clear()
+            self.containers_skipped.clear()
+            self.containers_failed.clear()
+            self.container_skip_reasons.clear()
+            self.container_failure_reasons.clear()
+            self.error_messages.clear()
+            self.rsync_results.clear()
+            self.primary_copies.clear()
+            self.primary_additional_copies.clear()
+            self.container_durations.clear()
+            self._container_start_times.clear()
+            self._container_stop_times.clear()
+            self._new_fingerprints.clear()
+            self.container_downtimes.clear()
+            self._link_dest_bases.clear()
+            self._outcome_stored = False
+
+    def _mark_container_started(self, c: Container) -> None:
+        with self._outcome_lock:
+            self._container_start_times[c.name] = time.monotonic()
+
+    def _mark_container_finished(self, c: Container) -> None:
+        with self._outcome_lock:
+            started = self._container_start_times.pop(c.name, None)
+            if started is not None:
+                self.container_durations[c.name] = round(time.monotonic() - started, 3)
+
+    def _emit_event(
+        self,
+        phase: str,
+        c: Optional[Container] = None,
+        duration_ms: Optional[float] = None,
+        bytes_transferred: Optional[int] = None,
+        exit_code: Optional[int] = None,
+        **fields,
+    ) -> None:
+        """Record a structured event (stop, rsync, start, downtime, hook, retention) in the metrics and JSON_LOG_FILE"""
+        if self.metrics is not None:
+            self._observe_event_metrics(phase, c, duration_ms, bytes_transferred, exit_code, fields)
+
+        if not self.env.JSON_LOG_FILE:
+            return
+
+        event = {
+            "phase": phase,
+            "container_name": c.name if c else None,
+            "container_id": str(c.id) if c else None,
+            "group": getattr(self._event_context, "group", None),
+            "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+            "bytes": bytes_transferred,
+            "exit_code": exit_code,
+        }
+        event.update(fields)
+        self.logger.log_event(event)
+
+    def _observe_event_metrics(
+        self,
+        phase: str,
+        c: Optional[Container],
+        duration_ms: Optional[float],
+        bytes_transferred: Optional[int],
+        exit_code: Optional[int],
+        fields: Dict,
+    ) -> None:
+        if self.metrics is None:
+            return
+
+        labels = {"container": c.name if c else ""}
+        seconds = duration_ms / 1000 if duration_ms is not None else None
+        histograms = {
+            "stop": "nautical_container_stop_seconds",
+            "start": "nautical_container_start_seconds",
+            "downtime": "nautical_container_downtime_seconds",
+            "rsync": "nautical_rsync_duration_seconds",
+        }
+
+        if phase in histograms and seconds is not None:
+            self.metrics.observe(histograms[phase], seconds, labels)
+
+        if phase == "rsync":
+            if bytes_transferred is not None:
+                self.metrics.inc("nautical_rsync_bytes_total", bytes_transferred, labels)
+            if exit_code:
+                self.metrics.inc("nautical_rsync_failures_total", 1, labels)
+        elif phase == "hook" and seconds is not None:
+            hook_labels = {**labels, "hook": str(fields.get("hook")), "when": str(fields.get("when"))}
+            self.metrics.observe("nautical_hook_duration_seconds", seconds, hook_labels)
+        elif phase == "retention":
+            self.metrics.inc("nautical_retention_deletions_total", fields.get("deleted", 0))
+
+    def _record_run_metrics(self) -> None:
+        """Add this run to the saved metrics for the /metrics endpoint"""
+        if self.metrics is None:
+            return
+
+        with self._outcome_lock:
+            self.metrics.inc("nautical_backup_runs_total", 1, {"status": self._backup_status()})
+            self.metrics.observe(
+                "nautical_backup_run_duration_seconds", (self.end_time - self.start_time).total_seconds()
+            )
+            self.metrics.inc("nautical_backup_errors_total", len(self.error_messages))
+            self.metrics.inc("nautical_containers_completed_total", len(self.containers_completed))
+            for name in self.containers_skipped - self.containers_failed:
+                reason = self.container_skip_reasons.get(name, "unknown")
+                self.metrics.inc("nautical_containers_skipped_total", 1, {"reason": reason})
+            for name in self.containers_failed:
+                reason = self.container_failure_reasons.get(name, "unknown")
+                self.metrics.inc("nautical_containers_failed_total", 1, {"reason": reason})
+
+        try:
+            self.metrics.add_to_saved()
+        except OSError as e:
+            self.log_this(f"Unable to save the metrics: {e}", "WARN")
+
+    def _publish_live(self, event_type: str, **fields) -> None:
+        """Push a progress event to the live subscribers of this process.
+        Also written to JSON_LOG_FILE, where the API picks it up when the backup runs in another process (cron)
+        """
+        self.event_bus.publish(event_type, **fields)
+        if self.env.JSON_LOG_FILE:
+            self.logger.log_event({"phase": "progress", "event": event_type, "pid": os.getpid(), **fields})
+
+    def _publish_progress(self, c: Container, state: str, **fields) -> None:
+        """Push a container state transition to anyone watching the backup live"""
+        self._publish_live(
+            "container",
+            state=state,
+            container_name=c.name,
+            container_id=str(c.id),
+            group=getattr(self._event_context, "group", None),
+            **fields,
+        )
 
     def get_label(self, container: Container, target: str, default=None):
         """Apply the label prefix and return the label value
         By default the label will look like: `nautical-backup.enable`
         """
+        if self.snapshot:
+            return self.snapshot.get_label(container, target, default)
         return container.labels.get(f"{self.prefix}.{target}", default)
 
+    def _get_image_name(self, c: Container) -> str:
+        """Return the image of the container, without an extra API call when the snapshot knows it"""
+        if self.snapshot:
+            image_name = self.snapshot.get_image_name(c)
+            if image_name is not None:
+                return image_name
+        return str(c.image)
+
+    def _refresh_containers(self, containers: List[Container]) -> None:
+        """Refresh the status of all these containers with a single request, before each group phase"""
+        try:
+            if self.snapshot:
+                changed = self.snapshot.refresh(containers)
+            else:
+                changed = refresh_container_states(self.docker, containers)
+        except (APIError, DockerException, RequestsConnectionError) as e:
+            self.log_this(f"Unable to refresh container states in bulk: {e}. Inspecting each container", "DEBUG")
+            for c in containers:
+                c.reload()
+            return
+
+        if changed:
+            self.log_this(
+                f"Container states changed: {self.logger.set_to_string(set(c.name for c in changed))}", "TRACE"
+            )
+
     def verify_nautical_mounted_source_location(self, src_dir: str):
         self.log_this(f"Verifying source directory '{src_dir}'...", "DEBUG", LogType.INIT)
         if not os.path.isdir(src_dir):
@@ -178,14 +449,15 @@ class NauticalBackup:
 
         try:
             # Attempt to pull info from container. Skip if not found
-            info = str(c.name) + " " + str(c.id) + " " + str(c.image) + " " + str(c.labels)
+            image_name = self._get_image_name(c)
+            info = str(c.name) + " " + str(c.id) + " " + image_name + " " + str(c.labels)
         except ImageNotFound as e:
             self._record_container_skipped(
                 c, "image_not_found", "Skipping container because its info was not found.", level="WARN"
             )
             return True
 
-        if "minituff/nautical-backup" in str(c.image):
+        if "minituff/nautical-backup" in image_name:
             self._record_container_skipped(
                 c,
                 "nautical_backup_image",
@@ -210,11 +482,8 @@ class NauticalBackup:
             )
             return True
 
-        # Read the environment variables
-        SKIP_CONTAINERS = self.env.SKIP_CONTAINERS
-
-        # Convert the strings into lists
-        skip_containers_set = set(SKIP_CONTAINERS.split(","))
+        # Already split into a set when the environment was parsed
+        skip_containers_set = self.env.SKIP_CONTAINERS_SET
 
         nautical_backup_enable_str = str(self.get_label(c, "enable", ""))
         if nautical_backup_enable_str.lower() == "false":
@@ -247,12 +516,19 @@ class NauticalBackup:
         # No reason to skip
         return False
 
-    def group_containers(self) -> Dict[str, List[Container]]:
-        containers: List[Container] = self.docker.containers.list()  # type: ignore
+    def group_containers(self, record_count: bool = True) -> Dict[str, List[Container]]:
+        """Containers to back up, by group. record_count stores the number of containers in the database"""
+        if self.env.USE_CONTAINER_SNAPSHOT:
+            self.snapshot = ContainerSnapshot(self.docker, self.prefix)
+            containers: List[Container] = self.snapshot.load()
+        else:
+            self.snapshot = None
+            containers: List[Container] = self.docker.containers.list()  # type: ignore
         starting_container_amt = len(containers)
         self.log_this(f"Processing {starting_container_amt} containers...", "INFO")
 
-        self.db.put("number_of_containers", starting_container_amt)
+        if record_count:
+            self.db.put("number_of_containers", starting_container_amt)
 
         output = ""
         for container in containers:
@@ -299,11 +575,11 @@ class NauticalBackup:
 
         return containers_by_group
 
-    def _set_exec_environment_variables(self, vars: Dict[str, str]):
-        """Set the environment variables for the exec command"""
+    def _get_exec_environment(self, vars: Dict[str, str]) -> Dict[str, str]:
+        """Return the environment for the exec command. os.environ is left untouched, since groups may run concurrently"""
         for k, v in vars.items():  # Loop through all the variables in the class
             self.log_this(f"Setting environment variable {k} to {v}", "TRACE")
-            os.environ[k] = v  # Set the environment variable
+        return {**os.environ, **vars}
 
     def _run_exec(
         self,
@@ -350,7 +626,7 @@ class NauticalBackup:
             else:
                 return None
         else:
-            nautical_env = NauticalEnv()
+            nautical_env = self.env
 
             if when == BeforeAfterorDuring.BEFORE:
                 curl_command = str(nautical_env._PRE_BACKUP_CURL)
@@ -400,10 +676,19 @@ class NauticalBackup:
             vars["NB_EXEC_CONTAINER_FAILURE_REASONS"] = self._format_reasons_for_exec(self.container_failure_reasons)
             vars["NB_EXEC_ERROR_MESSAGES"] = self._format_error_messages_for_exec()
 
-        self._set_exec_environment_variables(vars)
+        exec_env = self._get_exec_environment(vars)
 
         self.log_this(f"Running EXEC command: {command}")
-        out = subprocess.run(command, shell=True, executable="/bin/bash", capture_output=True)
+        exec_start = time.monotonic()
+        out = subprocess.run(command, shell=True, executable="/bin/bash", capture_output=True, env=exec_env)
+        self._emit_event(
+            "hook",
+            c if attached_to_container else None,
+            duration_ms=(time.monotonic() - exec_start) * 1000,
+            exit_code=out.returncode,
+            hook="exec",
+            when=when.name,
+        )
 
         if out.stderr and isinstance(out.stderr, bytes) or isinstance(out.stderr, str):
             self.log_this(f"Exec command error: {codecs.decode(out.stderr, 'utf-8').strip()}", "WARN")
@@ -433,13 +718,22 @@ class NauticalBackup:
         command = f"timeout {timeout} " + command
 
         self.log_this(f"RUNNING '{command}'", "DEBUG")
-        c.exec_run(command)
+        hook_start = time.monotonic()
+        result = c.exec_run(command)
+        self._emit_event(
+            "hook",
+            c,
+            duration_ms=(time.monotonic() - hook_start) * 1000,
+            exit_code=getattr(result, "exit_code", None),
+            hook="lifecycle",
+            when=when.name,
+        )
 
     def _stop_container(self, c: Container, attempt=1) -> bool:
-        c.reload()  # Refresh the status for this container
+        if attempt > 1:
+            c.reload()  # The whole group was refreshed before the first attempt
 
-        SKIP_STOPPING = self.env.SKIP_STOPPING
-        skip_stopping_set = set(SKIP_STOPPING.split(","))
+        skip_stopping_set = self.env.SKIP_STOPPING_SET
         if c.name in skip_stopping_set or c.id in skip_stopping_set:
             self.log_this(f"Container {c.name} is in SKIP_STOPPING list. Will not stop container.", "DEBUG")
             return True
@@ -460,6 +754,8 @@ class NauticalBackup:
             c.stop(timeout=stop_timeout)  # * Actually stop the container
         except ReadTimeout:
             self.log_this(f"Timed out waiting for {c.name} to stop. Checking container status...", "WARN")
+            if self.env.CONTAINER_WAIT_MODE == "events":
+                self._wait_for_container_exit(c, stop_timeout)
             # Fall through to c.reload() — container may have stopped despite the timeout
         except APIError as e:
             self.log_this(f"Error stopping container {c.name}. Skipping backup for this container.", "ERROR")
@@ -473,13 +769,14 @@ class NauticalBackup:
             self._stop_container(c, attempt=attempt + 1)
         return False
 
-    def _start_container(self, c: Container, attempt=1, max_attempts: Optional[int] = None) -> bool:
+    def _start_container(self, c: Container, attempt=1, max_attempts: Optional[int] = None, refresh=True) -> bool:
         if max_attempts is None:
             start_timeout = int(self.get_label(c, "start-timeout", str(self.env.START_TIMEOUT)))
             max_attempts = max(1, (start_timeout // 2) + 1)
             self.log_this(f"Container {c.name}: start-timeout={start_timeout}s (max_attempts={max_attempts})", "DEBUG")
 
-        c.reload()  # Refresh the status for this container
+        if refresh:
+            c.reload()  # Refresh the status for this container
         status = c.status  # Read once to avoid consuming multiple mock cycles
 
         if status == "running":
@@ -496,6 +793,13 @@ class NauticalBackup:
                     f"Container {c.name} is in '{status}' state, waiting for it to stabilize (Attempt {attempt}/{max_attempts})",
                     "WARN",
                 )
+                if self.env.CONTAINER_WAIT_MODE == "events":
+                    # Return as soon as Docker reports the new state instead of re-checking every 2 seconds
+                    remaining_seconds = 2 * (max_attempts - attempt + 1)
+                    status = self._wait_for_container_status(c, ["running", "exited"], remaining_seconds)
+                    next_attempt = attempt + 1 if status in ["running", "exited"] else max_attempts + 1
+                    return self._start_container(c, attempt=next_attempt, max_attempts=max_attempts, refresh=False)
+
                 time.sleep(2)
                 return self._start_container(c, attempt=attempt + 1, max_attempts=max_attempts)
             return False
@@ -524,6 +828,45 @@ class NauticalBackup:
             return self._start_container(c, attempt=attempt + 1, max_attempts=max_attempts)
         return False
 
+    def _wait_for_container_status(self, c: Container, statuses: List[str], timeout: int) -> str:
+        """Block until the container reaches one of `statuses` or `timeout` seconds pass.
+        Listens to the Docker events stream, so the container is only inspected when its state changes.
+        Returns the last known status.
+        """
+        since = int(time.time()) - 1  # Replay anything that happened right before we subscribed
+        until = int(time.time()) + max(1, timeout)
+
+        c.reload()  # Refresh the status for this container
+        status = c.status
+        if status in statuses:
+            return status
+
+        try:
+            events = self.docker.events(
+                decode=True,
+                since=since,
+                until=until,
+                filters={"container": c.id, "type": "container", "event": self.CONTAINER_STATE_EVENTS},
+            )
+            for event in events:
+                self.log_this(f"Container {c.name} event: {event.get('Action', event.get('status'))}", "TRACE")
+                c.reload()  # Refresh the status for this container
+                status = c.status
+                if status in statuses:
+                    events.close()
+                    break
+        except (APIError, DockerException, RequestsConnectionError) as e:
+            self.log_this(f"Unable to follow Docker events for {c.name}: {e}", "DEBUG")
+
+        return status
+
+    def _wait_for_container_exit(self, c: Container, timeout: int) -> None:
+        """Block on the Docker wait endpoint until the container is no longer running"""
+        try:
+            c.wait(condition="not-running", timeout=max(1, timeout))
+        except (APIError, DockerException, ReadTimeout, RequestsConnectionError) as e:
+            self.log_this(f"Stopped waiting for {c.name} to exit: {e}", "DEBUG")
+
     def _get_src_dir(self, c: Container, log=False) -> Tuple[Path, str]:
         """Get the source directory for the container
         Returns a tuple of the source directory and the source directory name
@@ -567,7 +910,98 @@ class NauticalBackup:
         folders = [f.strip() for f in label_src.split(",") if f.strip()]
         return [(base_src_dir / f, f) for f in folders]
 
-    def _get_dest_dir(self, c: Container, src_dir_name: str) -> Tuple[Path, str]:
+    @staticmethod
+    def _fingerprint_tree(root: Path) -> Tuple[int, int, int]:
+        """Return (entries, total size, newest mtime/ctime in ns) for everything under root.
+        ctime is included because tools that preserve mtimes (rsync -t, tar) still change it.
+        Deleted or renamed files change the mtime of their parent directory.
+        """
+        entries = total_size = newest = 0
+        stack = [str(root)]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    stat = entry.stat(follow_symlinks=False)
+                    entries += 1
+                    total_size += stat.st_size
+                    newest = max(newest, stat.st_mtime_ns, stat.st_ctime_ns)
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+        root_stat = os.stat(root)
+        newest = max(newest, root_stat.st_mtime_ns, root_stat.st_ctime_ns)
+        return entries, total_size, newest
+
+    def _fingerprint_source(self, c: Container) -> Optional[str]:
+        """Fingerprint of every source directory of a container. None when a directory cannot be read"""
+        parts = []
+        for src_dir, src_dir_no_path in self._get_label_src_dirs(c):
+            try:
+                entries, total_size, newest = self._fingerprint_tree(src_dir)
+            except OSError:
+                return None
+            parts.append(f"{src_dir_no_path}:{entries}:{total_size}:{newest}")
+        return "|".join(parts)
+
+    def _is_change_detection_enabled(self, c: Container) -> bool:
+        """The `skip-unchanged` label overrides SKIP_UNCHANGED_SOURCES"""
+        label = str(self.get_label(c, "skip-unchanged", "")).lower()
+        if label in ["true", "false"]:
+            return label == "true"
+        return self.env.SKIP_UNCHANGED_SOURCES
+
+    def _is_source_unchanged(self, c: Container, fingerprint: Optional[str]) -> bool:
+        previous = self.source_fingerprints.get(str(c.name))
+        if fingerprint is None or not previous or previous.get("fingerprint") != fingerprint:
+            return False
+
+        # The previous copy must still be there (and belong to today's folder when using dated folders)
+        if str(self.env.USE_DEST_DATE_FOLDER).lower() == "true":
+            if previous.get("date") != self.start_time.strftime(self.env.DEST_DATE_FORMAT):
+                return False
+        destinations = previous.get("destinations") or []
+        return bool(destinations) and all(Path(d).exists() for d in destinations)
+
+    def _skip_unchanged_group(self, group: str, containers: List[Container]) -> bool:
+        """Skip the whole group when the source of every container is unchanged since its last backup.
+        When any of them changed, the whole group is backed up so it stays consistent.
+        """
+        if not containers or not all(self._is_change_detection_enabled(c) for c in containers):
+            return False
+
+        fingerprints = {str(c.name): self._fingerprint_source(c) for c in containers}
+        with self._outcome_lock:
+            self._new_fingerprints.update({n: f for n, f in fingerprints.items() if f is not None})
+
+        if not all(self._is_source_unchanged(c, fingerprints[str(c.name)]) for c in containers):
+            return False
+
+        for c in containers:
+            self._record_container_skipped(
+                c, "source_unchanged", f"Skipping {c.name} because its source has not changed since the last backup"
+            )
+            self._publish_progress(c, "skipped", reason="source_unchanged")
+        return True
+
+    def _updated_source_fingerprints(self) -> Dict[str, Dict]:
+        """Fingerprints to store after this run. Only containers that completed are trusted"""
+        with self._outcome_lock:
+            fingerprints = dict(self.source_fingerprints)
+            for name in self.containers_failed:
+                fingerprints.pop(name, None)
+            for name in self.containers_completed:
+                fingerprint = self._new_fingerprints.get(name)
+                copies = self.primary_copies.get(name)
+                if fingerprint is None or not copies:
+                    fingerprints.pop(name, None)
+                    continue
+                fingerprints[name] = {
+                    "fingerprint": fingerprint,
+                    "destinations": [str(dest_dir) for dest_dir, _ in copies],
+                    "date": self.start_time.strftime(self.env.DEST_DATE_FORMAT),
+                }
+            return fingerprints
+
+    def _get_dest_dir(self, c: Container, src_dir_name: str, create=True) -> Tuple[Path, str]:
         base_dest_dir = Path(self.env.DEST_LOCATION)
         dest_dir_full: Path = base_dest_dir / str(c.name)
         dest_dir_name = str(c.name)
@@ -623,11 +1057,21 @@ class NauticalBackup:
                 dest_dir_full: Path = base_dest_dir / time_format / dest_dir_name
                 dest_dir_no_path = f"{time_format}/{dest_dir_name}"
 
-            if not os.path.exists(dest_dir_full):
-                os.makedirs(dest_dir_full, exist_ok=True)
+            if create and not os.path.exists(dest_dir_full):
+                self._make_backup_dir(base_dest_dir, dest_dir_full)
 
         return dest_dir_full, dest_dir_no_path
 
+    def _tracking_catalog(self, base_dest_dir: Path, path: Path):
+        """Keep the retention catalog in step with a folder created or removed inside the block"""
+        if not self.env.RETENTION_CATALOG:
+            return contextlib.nullcontext()
+        return self.retention_catalog.tracking(base_dest_dir, path)
+
+    def _make_backup_dir(self, base_dest_dir: Path, dest_dir: Path) -> None:
+        with self._tracking_catalog(base_dest_dir, dest_dir):
+            os.makedirs(dest_dir, exist_ok=True)
+
     def _format_dated_folder(self, base_dest_dir: Path, folder: str) -> Path:
         """Format the destination folder with the date"""
 
@@ -645,6 +1089,59 @@ class NauticalBackup:
 
         return dest_dir
 
+    def _find_previous_dated_folder(self, base_dest_dir: Path, dest_dir_no_path: str) -> Optional[Path]:
+        """Find the most recent dated backup of the same container that is older than `dest_dir_no_path`.
+
+        `dest_dir_no_path` is `<container>/<date>` or `<date>/<container>` depending on DEST_DATE_PATH_FORMAT.
+        """
+        relative = Path(dest_dir_no_path)
+        try:
+            if self.env.DEST_DATE_PATH_FORMAT == "container/date":
+                current_date_name = relative.name
+                # destination/<container>/<date>
+                candidates = self._list_dated_retention_dirs(base_dest_dir / relative.parent)
+            else:
+                current_date_name = relative.parts[0]
+                container_relative = Path(*relative.parts[1:])
+                # destination/<date>/<container>
+                candidates = [
+                    (date, date_dir / container_relative)
+                    for date, date_dir in self._list_dated_retention_dirs(base_dest_dir)
+                ]
+        except OSError:
+            return None
+
+        try:
+            current_date: Optional[datetime] = datetime.strptime(current_date_name, self.env.DEST_DATE_FORMAT)
+        except ValueError:
+            current_date = None
+
+        previous: Optional[Tuple[datetime, Path]] = None
+        for parsed_date, folder in candidates:
+            if current_date is not None and parsed_date >= current_date:
+                continue
+            if not folder.is_dir() or folder.is_symlink():
+                continue
+            if previous is None or parsed_date > previous[0]:
+                previous = (parsed_date, folder)
+
+        return previous[1] if previous else None
+
+    def _get_link_dest_args(self, base_dest_dir: Path, dest_dir_no_path: str) -> str:
+        """Return the rsync arguments to hard-link unchanged files against the previous dated backup"""
+        if not self.env.USE_LINK_DEST or str(self.env.USE_DEST_DATE_FOLDER).lower() != "true":
+            return ""
+
+        previous_folder = self._find_previous_dated_folder(base_dest_dir, dest_dir_no_path)
+        if previous_folder is None:
+            self.log_this(f"No previous backup of '{dest_dir_no_path}' to hard-link against", "DEBUG")
+            return ""
+
+        self.log_this(f"Hard-linking unchanged files of '{dest_dir_no_path}' against '{previous_folder}'", "DEBUG")
+        with self._outcome_lock:
+            self._link_dest_bases.add(previous_folder)
+        return f" --link-dest={shlex.quote(str(previous_folder.absolute()))}"
+
     def _backup_additional_folders_standalone(self, when: BeforeOrAfter, base_dest_dir: Path):
         """Backup folders that are not associated with a container."""
         additional_folders = str(self.env.ADDITIONAL_FOLDERS)
@@ -678,12 +1175,12 @@ class NauticalBackup:
                 dest_dir = self._format_dated_folder(base_dest_dir, folder)
 
                 if not os.path.exists(dest_dir):
-                    os.makedirs(dest_dir, exist_ok=True)
+                    self._make_backup_dir(base_dest_dir, dest_dir)
 
             self.log_this(f"Backing up standalone additional folder '{folder}'")
             self._run_rsync(None, rsync_args, src_dir, dest_dir)
 
-    def _backup_additional_folders(self, c: Container, base_dest_dir: Path):
+    def _backup_additional_folders(self, c: Container, base_dest_dir: Path, is_primary: bool = False):
         additional_folders = str(self.get_label(c, "additional-folders", ""))
         base_src_dir = Path(self.env.SOURCE_LOCATION)
 
@@ -700,11 +1197,16 @@ class NauticalBackup:
                 dest_dir = self._format_dated_folder(base_dest_dir, folder)
 
                 if not os.path.exists(dest_dir):
-                    os.makedirs(dest_dir, exist_ok=True)
+                    self._make_backup_dir(base_dest_dir, dest_dir)
 
             self.verify_destination_location(dest_dir)
             self.log_this(f"Backing up additional folder '{folder}' for container {c.name}")
-            self._run_rsync(c, rsync_args, src_dir, dest_dir)
+            rsync_ok = self._run_rsync(c, rsync_args, src_dir, dest_dir)
+            if rsync_ok and is_primary:
+                with self._outcome_lock:
+                    self.primary_additional_copies.setdefault(str(c.name), []).append(
+                        (dest_dir, str(dest_dir.relative_to(base_dest_dir)))
+                    )
 
     def _backup_container_folders(self, c: Container, dest_path: Optional[Path] = None):
         is_secondary = dest_path is not None
@@ -726,14 +1228,18 @@ class NauticalBackup:
                 self.log_this(f"Destination directory '{dest_dir}' does not exist", "ERROR")
 
             if src_dir.exists():
-                os.makedirs(dest_dir, exist_ok=True)
+                self._make_backup_dir(dest_path, dest_dir)
                 self.log_this(f"Backing up {c.name}...", "INFO")
 
-                rsync_ok = self._run_rsync(c, rsync_args, src_dir, dest_dir)
+                link_dest_args = self._get_link_dest_args(dest_path, dest_dir_no_path)
+                rsync_ok = self._run_rsync(c, rsync_args + link_dest_args, src_dir, dest_dir)
                 if not rsync_ok:
                     self._record_container_skipped(
                         c, "rsync_failed", f"Skipping completion of {c.name} because rsync failed", log=False
                     )
+                elif not is_secondary:
+                    with self._outcome_lock:
+                        self.primary_copies.setdefault(str(c.name), []).append((dest_dir, dest_dir_no_path))
             elif src_dir_required == "false":
                 # Do nothing. This container is still started and stopped, but there is nothing to backup
                 # Likely this container is part of a group and the source directory is not required
@@ -745,22 +1251,67 @@ class NauticalBackup:
 
         additional_folders_when = str(self.get_label(c, "additional-folders.when", "during")).lower()
         if not additional_folders_when or additional_folders_when == "during":
-            self._backup_additional_folders(c, dest_path)
+            self._backup_additional_folders(c, dest_path, is_primary=not is_secondary)
 
     def _run_rsync(self, c: Optional[Container], rsync_args: str, src_dir: Path, dest_dir: Path) -> bool:
         src_folder = f"{src_dir.absolute()}/"
         dest_folder = f"{dest_dir.absolute()}/"
 
+        collect_stats = self._collects_rsync_stats()
+        if collect_stats:
+            # -q also hides the --stats summary
+            rsync_args = f"{strip_quiet_flag(rsync_args)} --stats --no-human-readable"
+
         command = f"{rsync_args} {src_folder} {dest_folder}"
 
         self.log_this(f"RUNNING: 'rsync {command}'", "DEBUG")
 
-        # args = command.split()  # Split the command into a list of arguments
-        out = subprocess.run(f"/usr/bin/rsync {command}", shell=True, capture_output=False)
-        # out = subprocess.run(args, shell=True, executable="/usr/bin/rsync", capture_output=False)
+        # File names do not have to be UTF-8, so undecodable bytes are replaced instead of raising
+        capture: Dict[str, Any] = {
+            "capture_output": collect_stats,
+            "text": collect_stats,
+            "errors": "replace" if collect_stats else None,
+        }
+
+        rsync_start = time.monotonic()
+        if self.env.RSYNC_EXEC_MODE == "argv":
+            # Launch rsync directly without spawning a shell
+            args = ["/usr/bin/rsync", *shlex.split(rsync_args), src_folder, dest_folder]
+            out = subprocess.run(args, **capture)
+        else:
+            out = subprocess.run(f"/usr/bin/rsync {command}", shell=True, **capture)
+
+        rsync_duration = time.monotonic() - rsync_start
+        name = c.name if c else "unknown"
+
+        stats: Dict[str, int] = {}
+        if collect_stats:
+            stats = parse_rsync_stats(out.stdout or "")
+            self.log_this(f"rsync stats for {name}: {stats}", "TRACE")
+            # Without the capture, this output would have gone straight to the container log
+            output = strip_rsync_stats(out.stdout or "")
+            if output:
+                self.log_this(f"rsync output for {name}: {output}", "INFO")
+            if out.stderr:
+                self.log_this(
+                    f"rsync output for {name}: {str(out.stderr).strip()}", "WARN" if out.returncode else "DEBUG"
+                )
+
+        result = RsyncResult(str(name), src_dir, dest_dir, out.returncode, rsync_duration, stats)
+        with self._outcome_lock:
+            self.rsync_results.append(result)
+        self._emit_event(
+            "rsync",
+            c,
+            duration_ms=rsync_duration * 1000,
+            bytes_transferred=result.bytes_transferred,
+            exit_code=out.returncode,
+            src_dir=str(src_dir),
+            dest_dir=str(dest_dir),
+            **stats,
+        )
 
         if out.returncode != 0:
-            name = c.name if c else "unknown"
             message = f"rsync exited with code {out.returncode} for {name}"
             if out.returncode == 23:
                 # Exit code 23 = partial transfer; commonly caused by symlinks on filesystems
@@ -780,6 +1331,14 @@ class NauticalBackup:
             return False
         return True
 
+    def _collects_rsync_stats(self) -> bool:
+        """rsync also reports its statistics when the size of each backup is tracked, since that is what it copied"""
+        return self.env.RSYNC_STATS or self._tracks_container_sizes()
+
+    def _tracks_container_sizes(self) -> bool:
+        """The size of each container's backup is needed by capacity retention and the pre-flight check"""
+        return self._is_capacity_retention_enabled() or self.env.PREFLIGHT_CHECK != "off"
+
     def _get_rsync_args(self, c: Optional[Container], log=False) -> str:
         default_rsync_args = self.env.DEFAULT_RNC_ARGS
         custom_rsync_args = ""
@@ -819,24 +1378,70 @@ class NauticalBackup:
 
         return f"{default_rsync_args} {custom_rsync_args}"
 
-    def _apply_retention_policy(self, base_dest_dir: Path) -> None:
+    # Grandfather-father-son tiers. Each one keeps the newest backup of the N most recent periods that have one
+    RETENTION_TIERS = {
+        "daily": lambda date: (date.year, date.month, date.day),
+        "weekly": lambda date: tuple(date.isocalendar())[:2],
+        "monthly": lambda date: (date.year, date.month),
+        "yearly": lambda date: (date.year,),
+    }
+
+    def _get_retention_tiers(self) -> Dict[str, int]:
+        """The enabled RETENTION_KEEP_<TIER> settings. Ex: {"daily": 7, "monthly": 12}"""
+        tiers = {
+            "daily": self.env.RETENTION_KEEP_DAILY,
+            "weekly": self.env.RETENTION_KEEP_WEEKLY,
+            "monthly": self.env.RETENTION_KEEP_MONTHLY,
+            "yearly": self.env.RETENTION_KEEP_YEARLY,
+        }
+        return {tier: count for tier, count in tiers.items() if count > 0}
+
+    def _select_backups_to_keep(
+        self, dated_backups: List[Tuple[datetime, Path]], backups_to_keep: int, tiers: Dict[str, int]
+    ) -> Tuple[List[Tuple[datetime, Path]], List[Tuple[datetime, Path]]]:
+        """Split dated backups (newest first) into the ones kept and the ones to remove.
+
+        Keeps the union of the `backups_to_keep` newest backups and, for each tier, the newest backup
+        of each of its most recent periods.
+        """
+        kept = set(range(min(backups_to_keep, len(dated_backups))))
+        for tier, count in tiers.items():
+            period_of = self.RETENTION_TIERS[tier]
+            periods_seen = set()
+            for index, (date, _) in enumerate(dated_backups):
+                period = period_of(date)
+                if period in periods_seen:
+                    continue
+                if len(periods_seen) >= count:
+                    break
+                periods_seen.add(period)
+                kept.add(index)
+
+        backups_kept = [backup for index, backup in enumerate(dated_backups) if index in kept]
+        backups_to_remove = [backup for index, backup in enumerate(dated_backups) if index not in kept]
+        return backups_kept, backups_to_remove
+
+    def _apply_retention_policy(self, base_dest_dir: Path) -> int:
         """Delete old date-stamped backup folders, keeping the N most recent backups.
 
-        Only runs when NUMBER_OF_BACKUPS_TO_KEEP > 0 and USE_DEST_DATE_FOLDER is true.
+        Only runs when NUMBER_OF_BACKUPS_TO_KEEP > 0 or a RETENTION_KEEP_<TIER> is set, and USE_DEST_DATE_FOLDER
+        is true. Backups kept by any tier (daily, weekly, monthly, yearly) are kept in addition to the N newest.
         Folders whose names cannot be parsed with DEST_DATE_FORMAT are left untouched.
         When RETENTION_DRY_RUN is true, candidates are logged but nothing is deleted.
+        Returns the number of folders that were removed.
 
         Path formats are pruned according to their folder shape:
           - container/date: destination/<container>/<date>/  — date folders pruned per container dir
           - date/container: destination/<date>/<container>/  — date folders pruned as atomic backup sets
         """
         backups_to_keep: int = self.env.NUMBER_OF_BACKUPS_TO_KEEP
-        if backups_to_keep <= 0 or str(self.env.USE_DEST_DATE_FOLDER).lower() != "true":
-            return
+        tiers: Dict[str, int] = self._get_retention_tiers()
+        if (backups_to_keep <= 0 and not tiers) or str(self.env.USE_DEST_DATE_FOLDER).lower() != "true":
+            return 0
 
         if base_dest_dir.is_symlink() or not base_dest_dir.is_dir():
             self.log_this(f"Retention policy: destination '{base_dest_dir}' is not a directory; skipping", "DEBUG")
-            return
+            return 0
 
         min_backups_to_keep: int = self.env.MIN_BACKUPS_TO_KEEP
         if min_backups_to_keep > 0 and min_backups_to_keep > backups_to_keep:
@@ -848,15 +1453,8 @@ class NauticalBackup:
             backups_to_keep = min_backups_to_keep
 
         is_dry_run: bool = self.env.RETENTION_DRY_RUN
-        date_format: str = self.env.DEST_DATE_FORMAT
         log_tag: str = " (DRY RUN)" if is_dry_run else ""
-
-        def _parse_date(folder_name: str) -> Optional[datetime]:
-            """Return a datetime if folder_name matches date_format, otherwise None."""
-            try:
-                return datetime.strptime(folder_name, date_format)
-            except ValueError:
-                return None
+        removed: List[Path] = []
 
         def _record_retention_error(message: str, error: OSError) -> None:
             """Record retention failures without aborting the completed backup."""
@@ -867,7 +1465,15 @@ class NauticalBackup:
         def _iter_child_dirs(parent: Path) -> List[Path]:
             """Return real child directories, skipping symlinks to avoid pruning outside the destination."""
             try:
-                return [child for child in parent.iterdir() if not child.is_symlink() and child.is_dir()]
+                return self._list_retention_dirs(parent)
+            except OSError as error:
+                _record_retention_error(f"unable to inspect '{parent}'", error)
+                return []
+
+        def _iter_dated_dirs(parent: Path) -> List[Tuple[datetime, Path]]:
+            """Return the child directories whose name parses with DEST_DATE_FORMAT, with their date."""
+            try:
+                return self._list_dated_retention_dirs(parent)
             except OSError as error:
                 _record_retention_error(f"unable to inspect '{parent}'", error)
                 return []
@@ -876,10 +1482,20 @@ class NauticalBackup:
             """Log and conditionally delete a single backup folder."""
             if is_dry_run:
                 self.log_this(f"Retention policy (DRY RUN): would remove '{target_folder}'", "INFO")
+            elif self.env.RETENTION_DELETE_MODE == "background":
+                self.log_this(f"Retention policy: moving '{target_folder}' to the trash", "INFO")
+                try:
+                    with self._tracking_catalog(base_dest_dir, target_folder):
+                        self._move_to_trash(base_dest_dir, target_folder)
+                    removed.append(target_folder)
+                except OSError as error:
+                    _record_retention_error(f"failed to remove '{target_folder}'", error)
             else:
                 self.log_this(f"Retention policy: removing '{target_folder}'", "INFO")
                 try:
-                    shutil.rmtree(target_folder)
+                    with self._tracking_catalog(base_dest_dir, target_folder):
+                        shutil.rmtree(target_folder)
+                    removed.append(target_folder)
                 except OSError as error:
                     _record_retention_error(f"failed to remove '{target_folder}'", error)
 
@@ -905,15 +1521,10 @@ class NauticalBackup:
                 return
 
             # Collect all date-named subfolders for this container
-            dated_backups: List[Tuple[datetime, Path]] = []
-            for date_folder in _iter_child_dirs(container_dir):
-                parsed_date = _parse_date(date_folder.name)
-                if parsed_date is not None:
-                    dated_backups.append((parsed_date, date_folder))
+            dated_backups: List[Tuple[datetime, Path]] = _iter_dated_dirs(container_dir)
 
             dated_backups.sort(key=lambda entry: entry[0], reverse=True)  # newest first
-            backups_kept = dated_backups[:backups_to_keep]
-            backups_to_remove = dated_backups[backups_to_keep:]
+            backups_kept, backups_to_remove = self._select_backups_to_keep(dated_backups, backups_to_keep, tiers)
 
             if not backups_kept and not backups_to_remove:
                 return
@@ -943,18 +1554,13 @@ class NauticalBackup:
             if destination_dir.is_symlink() or not destination_dir.is_dir():
                 return
 
-            dated_folders: List[Tuple[datetime, Path]] = []
-            for entry in _iter_child_dirs(destination_dir):
-                parsed_date = _parse_date(entry.name)
-                if parsed_date is not None:
-                    dated_folders.append((parsed_date, entry))
+            dated_folders: List[Tuple[datetime, Path]] = _iter_dated_dirs(destination_dir)
 
             if not dated_folders:
                 return
 
             dated_folders.sort(key=lambda e: e[0], reverse=True)  # newest first
-            folders_kept = dated_folders[:backups_to_keep]
-            folders_to_remove = dated_folders[backups_to_keep:]
+            folders_kept, folders_to_remove = self._select_backups_to_keep(dated_folders, backups_to_keep, tiers)
 
             if folders_kept:
                 date_label_newest = folders_kept[0][1].name
@@ -971,6 +1577,9 @@ class NauticalBackup:
             for _, folder in folders_to_remove:
                 _log_and_delete(folder)
 
+        if self.env.RETENTION_DELETE_MODE == "background" and not is_dry_run:
+            self._empty_trash(base_dest_dir)  # Left over from a run that exited before it finished deleting
+
         if self.env.DEST_DATE_PATH_FORMAT == "container/date":
             for container_dir in _iter_child_dirs(base_dest_dir):
                 _prune_container_date(container_dir)
@@ -981,159 +1590,986 @@ class NauticalBackup:
                 f"Unknown DEST_DATE_PATH_FORMAT '{self.env.DEST_DATE_PATH_FORMAT}' for retention policy", "ERROR"
             )
 
-    def reset_db(self) -> None:
-        """Reset the database values to their defaults"""
-        self.db.put("containers_completed", 0)
-        self.db.put("containers_skipped", 0)
-        self.db.put("errors", 0)
-        self.db.put("last_backup_seconds_taken", 0)
-        self.db.put("last_cron", "None")
-        self.db.put("completed", "0")
-        self.db.put("backup_running", False)
-
-    def backup(self):
-        if self.env.REPORT_FILE == True:
-            self.logger._create_new_report_file()
+        if self.env.RETENTION_CATALOG:
+            self.retention_catalog.save()
 
-        self.log_this("Starting backup...", "INFO")
+        return len(removed)
 
-        self._reset_outcomes()
-        self.reset_db()
-        self.db.put("backup_running", True)
+    def _list_retention_dirs(self, parent: Path) -> List[Path]:
+        """Real child directories of parent, without the trash. Raises OSError if parent cannot be read"""
+        if self.env.RETENTION_CATALOG:
+            return self.retention_catalog.child_dirs(parent)
+        return [
+            child
+            for child in parent.iterdir()
+            if child.name != self.TRASH_DIR_NAME and not child.is_symlink() and child.is_dir()
+        ]
 
-        self.start_time = datetime.now()
-        self.db.put("last_cron", self.start_time.strftime("%m/%d/%y %H:%M"))
+    def _list_dated_retention_dirs(self, parent: Path) -> List[Tuple[datetime, Path]]:
+        """Child directories of parent named after DEST_DATE_FORMAT, with their date. Raises OSError"""
+        if self.env.RETENTION_CATALOG:
+            return self.retention_catalog.dated_child_dirs(parent)
 
-        self._run_exec(None, BeforeAfterorDuring.BEFORE, attached_to_container=False)
+        dated_dirs: List[Tuple[datetime, Path]] = []
+        for child in self._list_retention_dirs(parent):
+            try:
+                dated_dirs.append((datetime.strptime(child.name, self.env.DEST_DATE_FORMAT), child))
+            except ValueError:
+                continue
+        return dated_dirs
 
-        dest_dirs = copy.deepcopy(self.env.SECONDARY_DEST_DIRS)
-        for dir in dest_dirs:
-            self.log_this(f"Secondary destination directories '{dir.absolute()}'", "DEBUG")
-        dest_dirs.insert(0, Path(self.env.DEST_LOCATION))
+    def _is_capacity_retention_enabled(self) -> bool:
+        if str(self.env.USE_DEST_DATE_FOLDER).lower() != "true":
+            return False
+        return self.env.RETENTION_MIN_FREE_BYTES > 0 or self.env.RETENTION_MIN_FREE_PERCENT > 0
 
-        for dir in dest_dirs:
-            self._backup_additional_folders_standalone(BeforeOrAfter.BEFORE, dir)
+    def _projected_backup_size(self, containers: List[Container]) -> int:
+        """Size of the next backup of these containers, from the size of their backup in the previous run"""
+        return sum(int(self.container_sizes.get(str(c.name), 0)) for c in containers)
 
-        containers_by_group = self.group_containers()
+    def _ensure_destination_capacity(self, containers: List[Container]) -> None:
+        """Delete the oldest dated backups until each destination can hold the backup of these containers
+        and still keep RETENTION_MIN_FREE_BYTES / RETENTION_MIN_FREE_PERCENT free
+        """
+        if not self._is_capacity_retention_enabled() or not containers:
+            return
 
-        for group, containers in containers_by_group.items():
-            # No need to print group for individual containers
-            if not group.startswith(self.default_group_pfx_sfx) and not group.endswith(self.default_group_pfx_sfx):
-                self.log_this(f"Backing up group: {group}")
+        projected_bytes = self._projected_backup_size(containers)
+        retention_dirs = [Path(self.env.DEST_LOCATION)]
+        if self.env.RETENTION_SECONDARY_DESTINATIONS:
+            retention_dirs.extend(self.env.SECONDARY_DEST_DIRS)
+
+        with self._capacity_lock:  # Concurrent groups must not each count the same free space
+            for dest_dir in retention_dirs:
+                retention_start = time.monotonic()
+                deleted = self._free_destination_space(dest_dir, projected_bytes)
+                if deleted:
+                    self._emit_event(
+                        "retention",
+                        duration_ms=(time.monotonic() - retention_start) * 1000,
+                        dest_dir=str(dest_dir),
+                        deleted=deleted,
+                        trigger="capacity",
+                    )
 
-            # Before backup
-            for c in containers:
-                # Run before hooks
-                self._run_exec(c, BeforeAfterorDuring.BEFORE, attached_to_container=True)
-                self._run_lifecyle_hook(c, BeforeOrAfter.BEFORE)
-
-                additional_folders_when = str(self.get_label(c, "additional-folders.when", "during")).lower()
-                if additional_folders_when == "before":
-                    for dir in dest_dirs:
-                        self._backup_additional_folders(c, dir)
-
-                label_src_dirs = self._get_label_src_dirs(c)
-                any_src_exists = any(src_dir.exists() for src_dir, _ in label_src_dirs)
-                if not any_src_exists:
-                    src_dir_required = str(self.get_label(c, "source-dir-required", "true")).lower()
-                    if src_dir_required == "false":
-                        self.log_this(f"{c.name} - Source directory does not exist, but that's okay", "DEBUG")
-                    else:
-                        self._record_container_skipped(
-                            c,
-                            "source_directory_missing",
-                            f"{c.name} - Source directory does not exist. Skipping",
-                            level="WARN",
-                        )
+    def _free_destination_space(self, base_dest_dir: Path, projected_bytes: int) -> int:
+        """Delete the oldest dated backups of a destination until projected_bytes fit above the free space floor.
+        Every container keeps at least max(MIN_BACKUPS_TO_KEEP, 1) backups. Returns the number of folders removed.
+        """
+        try:
+            usage = os.statvfs(base_dest_dir)
+        except OSError as error:
+            self.log_this(f"Retention policy: unable to check free space on '{base_dest_dir}': {error}", "WARN")
+            return 0
+
+        total_bytes = usage.f_blocks * usage.f_frsize
+        free_bytes = usage.f_bavail * usage.f_frsize
+        floor_bytes = max(self.env.RETENTION_MIN_FREE_BYTES, total_bytes * self.env.RETENTION_MIN_FREE_PERCENT // 100)
+        required_bytes = floor_bytes + projected_bytes
+        if free_bytes >= required_bytes:
+            self.log_this(
+                f"Retention policy: '{base_dest_dir}' has {free_bytes} bytes free, {required_bytes} needed", "TRACE"
+            )
+            return 0
+
+        is_dry_run: bool = self.env.RETENTION_DRY_RUN
+        log_tag: str = " (DRY RUN)" if is_dry_run else ""
+        self.log_this(
+            f"Retention policy{log_tag}: '{base_dest_dir}' has {free_bytes} bytes free but {required_bytes} are needed "
+            f"({projected_bytes} for this backup). Removing the oldest backups",
+            "WARN",
+        )
+
+        removed = 0
+        for _, folder in self._capacity_candidates(base_dest_dir):
+            if free_bytes >= required_bytes:
+                break
+
+            if is_dry_run:
+                self.log_this(f"Retention policy (DRY RUN): would remove '{folder}' to free space", "INFO")
+                try:
+                    free_bytes += self._unique_size(folder)
+                except OSError:
+                    pass
+                continue
+
+            self.log_this(f"Retention policy: removing '{folder}' to free space", "INFO")
+            try:
+                with self._tracking_catalog(base_dest_dir, folder):
+                    shutil.rmtree(folder)  # Never in the background, the space is needed now
+                removed += 1
+            except OSError as error:
+                message = f"Retention policy: failed to remove '{folder}': {error}"
+                self._record_error(message)
+                self.log_this(message, "ERROR")
+
+            try:
+                usage = os.statvfs(base_dest_dir)
+                free_bytes = usage.f_bavail * usage.f_frsize
+            except OSError:
+                break
+
+        if self.env.RETENTION_CATALOG:
+            self.retention_catalog.save()
+
+        if free_bytes < required_bytes:
+            message = (
+                f"Retention policy{log_tag}: unable to free enough space on '{base_dest_dir}' "
+                f"({free_bytes} bytes free, {required_bytes} needed) without going under MIN_BACKUPS_TO_KEEP"
+            )
+            if is_dry_run:
+                self.log_this(message, "WARN")  # Nothing was removed, so this run is not in error
+            else:
+                self._record_error(message)
+                self.log_this(message, "ERROR")
+        return removed
+
+    def _is_in_use_by_this_run(self, folder: Path) -> bool:
+        """True for this run's dated folder and for folders holding a backup this run hard-links against"""
+        current_names = {self.start_time.strftime(self.env.DEST_DATE_FORMAT)}
+        if self.env.USE_CONTAINER_BACKUP_DATE:
+            current_names.add(time.strftime(self.env.DEST_DATE_FORMAT))
+        if folder.name in current_names:
+            return True
+
+        with self._outcome_lock:
+            return any(base == folder or folder in base.parents for base in self._link_dest_bases)
+
+    def _capacity_candidates(self, base_dest_dir: Path) -> List[Tuple[datetime, Path]]:
+        """Dated backup folders that can be deleted to free space, oldest first.
+        Skips the folders this run writes to or hard-links against
+        """
+        backups_to_keep = max(self.env.MIN_BACKUPS_TO_KEEP, 1)
+
+        def _removable(parent: Path) -> List[Tuple[datetime, Path]]:
+            try:
+                dated_dirs = self._list_dated_retention_dirs(parent)
+            except OSError as error:
+                self.log_this(f"Retention policy: unable to inspect '{parent}': {error}", "WARN")
+                return []
+            dated_dirs.sort(key=lambda entry: entry[0], reverse=True)  # newest first
+            return [entry for entry in dated_dirs[backups_to_keep:] if not self._is_in_use_by_this_run(entry[1])]
+
+        candidates: List[Tuple[datetime, Path]] = []
+        if self.env.DEST_DATE_PATH_FORMAT == "container/date":
+            try:
+                container_dirs = self._list_retention_dirs(base_dest_dir)
+            except OSError as error:
+                self.log_this(f"Retention policy: unable to inspect '{base_dest_dir}': {error}", "WARN")
+                container_dirs = []
+            for container_dir in container_dirs:
+                candidates.extend(_removable(container_dir))
+        elif self.env.DEST_DATE_PATH_FORMAT == "date/container":
+            candidates.extend(_removable(base_dest_dir))
+
+        candidates.sort(key=lambda entry: entry[0])  # oldest first
+        return candidates
+
+    def _updated_container_sizes(self) -> Dict[str, int]:
+        """Space the primary backup of each completed container took, used to project the size of the next run.
+        Taken from the size rsync transferred, so files hard-linked against a previous backup (USE_LINK_DEST)
+        are not counted and the destination is not scanned again
+        """
+        with self._outcome_lock:
+            sizes = dict(self.container_sizes)
+            for name in self.containers_completed:
+                primary_dirs = {
+                    dest_dir
+                    for dest_dir, _ in [
+                        *self.primary_copies.get(name, []),
+                        *self.primary_additional_copies.get(name, []),
+                    ]
+                }
+                transferred = [
+                    r.bytes_transferred
+                    for r in self.rsync_results
+                    if r.container_name == name and r.dest_dir in primary_dirs
+                ]
+                if transferred and None not in transferred:
+                    sizes[name] = sum(transferred)
+        return sizes
+
+    @staticmethod
+    def _unique_size(root: Path) -> int:
+        """Size of the files under root that are not hard-linked elsewhere, i.e. the space removing root frees"""
+        total_size = 0
+        stack = [str(root)]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
                         continue
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_nlink == 1:
+                        total_size += stat.st_size
+        return total_size
+
+    def _move_to_trash(self, base_dest_dir: Path, folder: Path) -> None:
+        """Atomically rename an expired folder into the trash of its destination and delete it in the background"""
+        trash_dir = base_dest_dir / self.TRASH_DIR_NAME
+
+        # The same folder name can expire in different containers (container/date layout)
+        relative_name = str(folder.relative_to(base_dest_dir)).replace(os.sep, "__")
+        trash_path = trash_dir / f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{relative_name}"
+        try:
+            trash_dir.mkdir(exist_ok=True)
+            os.rename(folder, trash_path)
+        except OSError as error:
+            self.log_this(
+                f"Retention policy: unable to move '{folder}' to the trash ({error}). Removing it now", "WARN"
+            )
+            shutil.rmtree(folder)
+            return
+        self._delete_in_background(trash_path)
+
+    def _empty_trash(self, base_dest_dir: Path) -> None:
+        trash_dir = base_dest_dir / self.TRASH_DIR_NAME
+        if not trash_dir.is_dir() or trash_dir.is_symlink():
+            return
+
+        try:
+            leftovers = list(trash_dir.iterdir())
+        except OSError as error:
+            self._record_error(f"Retention policy: unable to inspect '{trash_dir}': {error}")
+            return
+
+        for entry in leftovers:
+            self._delete_in_background(entry)
+
+    def _delete_in_background(self, path: Path) -> None:
+        with self._outcome_lock:
+            if self._trash_executor is None:
+                self._trash_executor = ThreadPoolExecutor(
+                    max_workers=self.env.RETENTION_DELETE_WORKERS, thread_name_prefix="nautical-trash"
+                )
+            self._trash_deletes.append(self._trash_executor.submit(self._delete_trash_entry, path))
+
+    def _delete_trash_entry(self, path: Path) -> None:
+        try:
+            if path.is_dir() and not path.is_symlink():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except OSError as error:
+            message = f"Retention policy: failed to remove '{path}': {error}"
+            self.log_this(message, "ERROR")
+            with self._outcome_lock:
+                if not self._outcome_stored:
+                    self._record_error(message)
+                    return
+                # Too late to be counted in this run. The next run reports it
+                pending = list(self.db.get(self.PENDING_DELETE_ERRORS_KEY, []) or [])
+                self.db.put(self.PENDING_DELETE_ERRORS_KEY, pending + [message])
+
+    def wait_for_retention_deletes(self) -> None:
+        """Block until every folder moved to the trash has been deleted"""
+        with self._outcome_lock:
+            executor, deletes = self._trash_executor, self._trash_deletes
+            self._trash_executor, self._trash_deletes = None, []
+
+        if executor is None:
+            return
+
+        pending = sum(1 for future in deletes if not future.done())
+        if pending:
+            self.log_this(f"Waiting for {pending} expired backups to be deleted...", "DEBUG")
+        executor.shutdown(wait=True)
+
+    def _partition_independent_groups(
+        self, containers_by_group: Dict[str, List[Container]]
+    ) -> List[List[Tuple[str, List[Container]]]]:
+        """Split the groups into batches that share no containers.
+
+        A container can belong to multiple groups. Those groups cannot run at the same time,
+        so they are kept together (in their original order) and run one after another.
+        """
+        batches: List[List[Tuple[str, List[Container]]]] = []
+        batch_container_ids: List[set] = []
+
+        for group, containers in containers_by_group.items():
+            ids = set(str(c.id) for c in containers)
+            overlapping = [i for i, batch_ids in enumerate(batch_container_ids) if batch_ids & ids]
+
+            if not overlapping:
+                batches.append([(group, containers)])
+                batch_container_ids.append(ids)
+                continue
+
+            # Merge every overlapping batch into the first one
+            first = overlapping[0]
+            for i in reversed(overlapping[1:]):
+                batches[first].extend(batches.pop(i))
+                batch_container_ids[first] |= batch_container_ids.pop(i)
+            batches[first].append((group, containers))
+            batch_container_ids[first] |= ids
+
+        return batches
 
-                stop_result = self._stop_container(c)  # Stop containers
-                if not stop_result:
-                    self._record_container_failed(
+    def _backup_groups(self, containers_by_group: Dict[str, List[Container]], dest_dirs: List[Path]) -> None:
+        """Backup every group, running up to MAX_CONCURRENT_GROUPS independent groups at the same time"""
+        max_workers = self.env.MAX_CONCURRENT_GROUPS
+        batches = self._partition_independent_groups(containers_by_group)
+
+        if max_workers <= 1 or len(batches) <= 1:
+            for group, containers in containers_by_group.items():
+                self._backup_group(group, containers, dest_dirs)
+            return
+
+        def _run_batch(batch: List[Tuple[str, List[Container]]]) -> None:
+            for group, containers in batch:
+                self._backup_group(group, containers, dest_dirs)
+
+        self.log_this(f"Backing up {len(batches)} independent groups with {max_workers} workers", "DEBUG")
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nautical-group") as executor:
+            futures = [executor.submit(_run_batch, batch) for batch in batches]
+            for future in futures:
+                future.result()
+
+    def _backup_group(self, group: str, containers: List[Container], dest_dirs: List[Path]) -> None:
+        """Run the before, during and after phases for a single group of containers"""
+        is_default_group = group.startswith(self.default_group_pfx_sfx) or group.endswith(self.default_group_pfx_sfx)
+        self._event_context.group = None if is_default_group else group
+        try:
+            self._backup_group_phases(group, containers, dest_dirs)
+        finally:
+            self._event_context.group = None
+
+    def _backup_group_phases(self, group: str, containers: List[Container], dest_dirs: List[Path]) -> None:
+        # No need to print group for individual containers
+        if not group.startswith(self.default_group_pfx_sfx) and not group.endswith(self.default_group_pfx_sfx):
+            self.log_this(f"Backing up group: {group}")
+
+        if self._skip_unchanged_group(group, containers):
+            return
+
+        self._ensure_destination_capacity(containers)
+        self._refresh_containers(containers)
+
+        # Before backup
+        for c in containers:
+            self._mark_container_started(c)
+
+            # Run before hooks
+            self._run_exec(c, BeforeAfterorDuring.BEFORE, attached_to_container=True)
+            self._run_lifecyle_hook(c, BeforeOrAfter.BEFORE)
+
+            additional_folders_when = str(self.get_label(c, "additional-folders.when", "during")).lower()
+            if additional_folders_when == "before":
+                for dir in dest_dirs:
+                    self._backup_additional_folders(c, dir)
+
+            label_src_dirs = self._get_label_src_dirs(c)
+            any_src_exists = any(src_dir.exists() for src_dir, _ in label_src_dirs)
+            if not any_src_exists:
+                src_dir_required = str(self.get_label(c, "source-dir-required", "true")).lower()
+                if src_dir_required == "false":
+                    self.log_this(f"{c.name} - Source directory does not exist, but that's okay", "DEBUG")
+                else:
+                    self._record_container_skipped(
                         c,
-                        "stop_failed",
-                        f"Error stopping container {c.name}. Skipping backup for this container.",
-                        log=False,
+                        "source_directory_missing",
+                        f"{c.name} - Source directory does not exist. Skipping",
+                        level="WARN",
                     )
+                    self._mark_container_finished(c)
+                    continue
+
+            self._publish_progress(c, "stopping")
+            stop_start = time.monotonic()
+            stop_result = self._stop_container(c)  # Stop containers
+            self._emit_event("stop", c, duration_ms=(time.monotonic() - stop_start) * 1000, success=stop_result)
+            if stop_result:
+                with self._outcome_lock:
+                    self._container_stop_times[c.name] = stop_start
+            if not stop_result:
+                self._record_container_failed(
+                    c,
+                    "stop_failed",
+                    f"Error stopping container {c.name}. Skipping backup for this container.",
+                    log=False,
+                )
 
+        if self._is_group_pipelined(group, containers):
+            # Restart each container as soon as its own data and the data of every higher priority
+            # container in this group has been copied, instead of waiting for the whole group
+            self.log_this(f"Group {group} is pipelined. Containers restart as soon as their backup completes", "DEBUG")
+            self._refresh_containers(containers)
+            for c in containers:
+                self._backup_container_during(c)
+                self._backup_container_after(c, dest_dirs)
+        else:
             # During backup
+            self._refresh_containers(containers)
             for c in containers:
-                # Backup containers
-                c.reload()  # Refresh the status for this container
-                if c.status != "exited":
-                    stop_before_backup = str(self.get_label(c, "stop-before-backup", "true"))
-
-                    # Allow the user to skip stopping the container before backup
-                    # Here we allow the Enviorment variable to supercede the EMPTY label
-                    stop_before_backup_env = True
-                    SKIP_STOPPING = self.env.SKIP_STOPPING
-                    skip_stopping_set = set(SKIP_STOPPING.split(","))
-                    if c.name in skip_stopping_set or c.id in skip_stopping_set:
-                        stop_before_backup_env = False
-
-                    if stop_before_backup.lower() == "true" and stop_before_backup_env == True:
-                        if c.name not in self.containers_skipped:
-                            self._record_container_skipped(
-                                c,
-                                "not_stopped",
-                                f"Skipping backup of {c.name} because it was not stopped",
-                                level="WARN",
-                            )
-                        else:
-                            self._record_container_skipped(
-                                c, "not_stopped", f"Skipping backup of {c.name} because it was not stopped", log=False
-                            )
-                        continue
+                self._backup_container_during(c)
 
-                self._backup_container_folders(c)
-                secondary_dest_dirs = self.env.SECONDARY_DEST_DIRS
+            # After backup
+            self._refresh_containers(containers)
+            for c in containers:
+                self._backup_container_after(c, dest_dirs)
 
-                for dir in secondary_dest_dirs:
-                    self._backup_container_folders(c, dir)
+        if self.env.SECONDARY_DEST_MODE == "fanout":
+            # Every container of the group is running again. Fill the secondaries before the next group starts
+            for c in containers:
+                self._defer_replication_to_secondaries(c)
+            self._wait_for_deferred_replication()
 
-                self._run_exec(c, BeforeAfterorDuring.DURING, attached_to_container=True)
+    def _is_group_pipelined(self, group: str, containers: List[Container]) -> bool:
+        """A group is pipelined when any of its containers sets the `group.<name>.pipeline=true` label"""
+        for c in containers:
+            if str(self.get_label(c, f"group.{group}.pipeline", "")).lower() == "true":
+                return True
+        return False
 
-            # After backup
-            for c in containers:
+    def _backup_container_during(self, c: Container) -> None:
+        """Copy the data of a (stopped) container and run its DURING exec"""
+        # Backup containers. Their status was refreshed in bulk with the rest of the group
+        if c.status != "exited":
+            stop_before_backup = str(self.get_label(c, "stop-before-backup", "true"))
+
+            # Allow the user to skip stopping the container before backup
+            # Here we allow the Enviorment variable to supercede the EMPTY label
+            stop_before_backup_env = True
+            skip_stopping_set = self.env.SKIP_STOPPING_SET
+            if c.name in skip_stopping_set or c.id in skip_stopping_set:
+                stop_before_backup_env = False
+
+            if stop_before_backup.lower() == "true" and stop_before_backup_env == True:
+                if c.name not in self.containers_skipped:
+                    self._record_container_skipped(
+                        c,
+                        "not_stopped",
+                        f"Skipping backup of {c.name} because it was not stopped",
+                        level="WARN",
+                    )
+                else:
+                    self._record_container_skipped(
+                        c, "not_stopped", f"Skipping backup of {c.name} because it was not stopped", log=False
+                    )
+                return
+
+        self._publish_progress(c, "copying")
+        self._backup_container_to_destinations(c)
 
-                start_result = self._start_container(c)  # Start containers
-                if not start_result:
-                    self._record_container_failed(c, "start_failed", f"Error starting container {c.name}.", log=False)
+        self._run_exec(c, BeforeAfterorDuring.DURING, attached_to_container=True)
 
-                self._run_lifecyle_hook(c, BeforeOrAfter.AFTER)
-                self._run_exec(c, BeforeAfterorDuring.AFTER, attached_to_container=True)
+    def _backup_container_to_destinations(self, c: Container) -> None:
+        """Copy the container to the primary and every secondary destination.
+        Up to MAX_CONCURRENT_DESTINATIONS copies run at the same time.
+        """
+        # None is the primary destination
+        dest_paths: List[Optional[Path]] = [None, *self.env.SECONDARY_DEST_DIRS]
+        if self.env.SECONDARY_DEST_MODE != "direct":
+            # Only the primary is read from the source. Secondaries are filled from it after the restart
+            dest_paths = [None]
+        max_workers = min(self.env.MAX_CONCURRENT_DESTINATIONS, len(dest_paths))
+
+        if max_workers <= 1:
+            for dest_path in dest_paths:
+                self._backup_container_folders(c, dest_path)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="nautical-dest") as executor:
+                list(executor.map(lambda dest_path: self._backup_container_folders(c, dest_path), dest_paths))
+
+        results = self.get_rsync_results(str(c.name))
+        if results:
+            self.log_this(f"rsync results for {c.name}: {', '.join(repr(r) for r in results)}", "DEBUG")
+
+    def _replicate_to_secondary(self, c: Container, dest_path: Path, primary_copies: List[Tuple[Path, str]]) -> bool:
+        """Copy the primary backup of this container to a single secondary destination"""
+        if not self.verify_destination_location(dest_path):
+            self._record_container_failed(
+                c, "secondary_destination_unavailable", f"Secondary destination '{dest_path}' is not available"
+            )
+            return False
 
-                additional_folders_when = str(self.get_label(c, "additional-folders.when", "during")).lower()
-                if additional_folders_when == "after":
-                    for dir in dest_dirs:
-                        self._backup_additional_folders(c, dir)
+        rsync_args = self._get_rsync_args(c)
+        all_ok = True
+        for primary_dest_dir, dest_dir_no_path in primary_copies:
+            secondary_dest_dir = dest_path / dest_dir_no_path
+            self._make_backup_dir(dest_path, secondary_dest_dir)
+            self.log_this(f"Copying {c.name} from '{primary_dest_dir}' to '{secondary_dest_dir}'", "DEBUG")
+            link_dest_args = self._get_link_dest_args(dest_path, dest_dir_no_path)
+            rsync_ok = self._run_rsync(c, rsync_args + link_dest_args, primary_dest_dir, secondary_dest_dir)
+            all_ok = rsync_ok and all_ok
+
+        with self._outcome_lock:
+            primary_additional_copies = list(self.primary_additional_copies.get(str(c.name), []))
+
+        for primary_dest_dir, dest_dir_no_path in primary_additional_copies:
+            secondary_dest_dir = dest_path / dest_dir_no_path
+            self._make_backup_dir(dest_path, secondary_dest_dir)
+            self.log_this(
+                f"Copying additional folder of {c.name} from '{primary_dest_dir}' to '{secondary_dest_dir}'", "DEBUG"
+            )
+            rsync_ok = self._run_rsync(c, rsync_args, primary_dest_dir, secondary_dest_dir)
+            all_ok = rsync_ok and all_ok
+        return all_ok
 
-                if c.name not in self.containers_skipped and c.name not in self.containers_failed:
-                    self.containers_completed.add(c.name)
-                    self.log_this(f"Backup of {c.name} complete!", "INFO")
-                elif c.name in self.containers_failed and c.name not in self.containers_skipped:
-                    self.log_this(
-                        f"Backup data for {c.name} was completed, but the container failed to restart within the start timeout.",
-                        "WARN",
+    def _defer_replication_to_secondaries(self, c: Container) -> None:
+        """Queue the copies to every secondary destination on the background pool.
+        The pool is drained at the end of the group ("fanout") or of the run ("deferred").
+        """
+        if not self.env.SECONDARY_DEST_DIRS:
+            return
+
+        with self._outcome_lock:
+            primary_copies = list(self.primary_copies.get(str(c.name), []))
+            if self._deferred_executor is None:
+                self._deferred_executor = ThreadPoolExecutor(
+                    max_workers=self.env.MAX_CONCURRENT_DESTINATIONS, thread_name_prefix="nautical-deferred"
+                )
+
+            for dest_path in self.env.SECONDARY_DEST_DIRS:
+                future = self._deferred_executor.submit(self._replicate_to_secondary, c, dest_path, primary_copies)
+                self._deferred_copies.append((c, dest_path, future))
+
+    def _wait_for_deferred_replication(self) -> None:
+        """Finish all background copies to secondary destinations.
+        Containers that were already reported as complete are moved to failed if one of their copies failed.
+        """
+        with self._outcome_lock:
+            executor, deferred_copies = self._deferred_executor, self._deferred_copies
+            self._deferred_executor, self._deferred_copies = None, []
+
+        if executor is None:
+            return
+
+        self.log_this(f"Waiting for {len(deferred_copies)} deferred secondary copies to finish...", "INFO")
+        executor.shutdown(wait=True)
+
+        for c, dest_path, future in deferred_copies:
+            error = future.exception()
+            if error is not None:
+                self._record_container_failed(
+                    c, "secondary_copy_failed", f"Copy of {c.name} to '{dest_path}' failed: {error}"
+                )
+
+        with self._outcome_lock:
+            failed_after_completion = self.containers_completed & self.containers_failed
+            self.containers_completed -= failed_after_completion
+
+        for name in sorted(str(n) for n in failed_after_completion):
+            self.log_this(f"Backup of {name} to a secondary destination failed", "WARN")
+
+    def get_rsync_results(self, container_name: str) -> List[RsyncResult]:
+        """Return the rsync result of every destination for this container (in the current run)"""
+        with self._outcome_lock:
+            return [r for r in self.rsync_results if r.container_name == container_name]
+
+    def _backup_container_after(self, c: Container, dest_dirs: List[Path]) -> None:
+        """Start a container, run its AFTER hooks and record the outcome"""
+        self._publish_progress(c, "starting")
+        start_start = time.monotonic()
+        start_result = self._start_container(c, refresh=False)  # Start containers (refreshed with the group)
+        self._emit_event("start", c, duration_ms=(time.monotonic() - start_start) * 1000, success=start_result)
+        with self._outcome_lock:
+            stopped_at = self._container_stop_times.pop(c.name, None)
+        if start_result and stopped_at is not None:
+            downtime = time.monotonic() - stopped_at
+            with self._outcome_lock:
+                self.container_downtimes[c.name] = round(downtime, 3)
+            self._emit_event("downtime", c, duration_ms=downtime * 1000)
+        if not start_result:
+            self._record_container_failed(c, "start_failed", f"Error starting container {c.name}.", log=False)
+
+        if self.env.SECONDARY_DEST_MODE == "deferred":
+            self._defer_replication_to_secondaries(c)
+
+        self._run_lifecyle_hook(c, BeforeOrAfter.AFTER)
+        self._run_exec(c, BeforeAfterorDuring.AFTER, attached_to_container=True)
+
+        additional_folders_when = str(self.get_label(c, "additional-folders.when", "during")).lower()
+        if additional_folders_when == "after":
+            for dir in dest_dirs:
+                self._backup_additional_folders(c, dir)
+
+        self._mark_container_finished(c)
+
+        with self._outcome_lock:
+            is_skipped = c.name in self.containers_skipped
+            is_failed = c.name in self.containers_failed
+            if not is_skipped and not is_failed:
+                self.containers_completed.add(c.name)
+
+        if is_failed:
+            self._publish_progress(c, "failed", reason=self.container_failure_reasons.get(c.name))
+        elif is_skipped:
+            self._publish_progress(c, "skipped", reason=self.container_skip_reasons.get(c.name))
+        else:
+            self._publish_progress(c, "done", duration_seconds=self.container_durations.get(c.name))
+
+        if not is_skipped and not is_failed:
+            self.log_this(f"Backup of {c.name} complete!", "INFO")
+        elif is_failed and not is_skipped:
+            self.log_this(
+                f"Backup data for {c.name} was completed, but the container failed to restart within the start timeout.",
+                "WARN",
+            )
+
+    def reset_db(self) -> None:
+        """Reset the database values to their defaults"""
+        self.db.update(
+            {
+                "containers_completed": 0,
+                "containers_skipped": 0,
+                "errors": 0,
+                "last_backup_seconds_taken": 0,
+                "last_cron": "None",
+                "completed": "0",
+                "backup_running": False,
+            }
+        )
+
+    def _container_bytes_transferred(self, container_name: str) -> Optional[int]:
+        """Bytes rsync copied for this container to every destination. None when RSYNC_STATS is disabled"""
+        with self._outcome_lock:
+            transferred = [
+                r.bytes_transferred
+                for r in self.rsync_results
+                if r.container_name == container_name and r.bytes_transferred is not None
+            ]
+        return sum(transferred) if transferred else None
+
+    def _updated_rsync_stats(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """The latest rsync statistics of each container, per destination folder"""
+        all_stats: Dict[str, Dict[str, Dict[str, Any]]] = self.db.get("rsync_stats", {}) or {}
+        finished_at = datetime.now().isoformat(timespec="seconds")
+
+        with self._outcome_lock:
+            results = [r for r in self.rsync_results if r.stats]
+
+        for container_name in {r.container_name for r in results}:
+            all_stats[container_name] = {
+                str(r.dest_dir): {**r.to_dict(), "finished_at": finished_at}
+                for r in results
+                if r.container_name == container_name
+            }
+        return all_stats
+
+    def _record_run_history(self) -> None:
+        """Store this run and the outcome of every container in the database history"""
+        with self._outcome_lock:
+            outcomes = []
+            for name in sorted(self.containers_completed | self.containers_skipped | self.containers_failed):
+                if name in self.containers_failed:
+                    status, reason = "failed", self.container_failure_reasons.get(name)
+                elif name in self.containers_skipped:
+                    status, reason = "skipped", self.container_skip_reasons.get(name)
+                else:
+                    status, reason = "completed", None
+
+                outcomes.append(
+                    {
+                        "container_name": name,
+                        "status": status,
+                        "reason": reason,
+                        "duration_seconds": self.container_durations.get(name),
+                        "bytes_transferred": self._container_bytes_transferred(name),
+                    }
+                )
+
+            run = {
+                "started_at": self.start_time.isoformat(timespec="seconds"),
+                "finished_at": self.end_time.isoformat(timespec="seconds"),
+                "duration_seconds": round((self.end_time - self.start_time).total_seconds(), 3),
+                "status": self._backup_status(),
+                "containers_completed": len(self.containers_completed),
+                "containers_skipped": len(self.containers_skipped),
+                "containers_failed": len(self.containers_failed),
+                "errors": len(self.error_messages),
+            }
+
+        try:
+            self.db.record_run(run, outcomes)
+        except sqlite3.Error as e:
+            self.log_this(f"Unable to store the backup history: {e}", "WARN")
+
+    def plan(self, estimate: Optional[str] = None) -> Dict[str, Any]:
+        """Estimate the next backup without stopping a container or writing to a destination.
+
+        estimate is how the size of each container is estimated (default PREFLIGHT_ESTIMATE):
+          - cached: the size of its backup in the previous run, or a scan of the source when unknown
+          - scan: walk the source folders
+          - rsync: an `rsync --dry-run --stats` pass against the destination
+        """
+        estimate = (estimate or self.env.PREFLIGHT_ESTIMATE).lower()
+        if estimate not in self.PLAN_ESTIMATES:
+            raise ValueError(f"Unknown estimate '{estimate}'. Expected one of: {', '.join(self.PLAN_ESTIMATES)}")
+
+        self._reset_outcomes()
+        self.start_time = datetime.now()
+        self.container_sizes = self.db.get("container_sizes", {}) or {}
+        containers_by_group = self.group_containers(record_count=False)
+        return self._plan_groups(containers_by_group, estimate)
+
+    def _plan_groups(self, containers_by_group: Dict[str, List[Container]], estimate: str) -> Dict[str, Any]:
+        previous_downtimes: Dict[str, float] = self.db.get("container_downtimes", {}) or {}
+        self._plan_size_estimates = self.db.get(self.PLAN_SIZE_ESTIMATES_KEY, {}) or {}
+
+        groups = []
+        for group, containers in containers_by_group.items():
+            is_default_group = group.startswith(self.default_group_pfx_sfx) or group.endswith(
+                self.default_group_pfx_sfx
+            )
+            planned = [self._plan_container(c, estimate, previous_downtimes) for c in containers]
+            downtimes = [p["estimated_downtime_seconds"] for p in planned]
+            groups.append(
+                {
+                    "group": None if is_default_group else group,
+                    "containers": planned,
+                    "estimated_bytes": sum(p["estimated_bytes"] for p in planned),
+                    # Every container of a group is stopped together
+                    "estimated_downtime_seconds": (
+                        round(sum(downtimes), 3) if all(d is not None for d in downtimes) else None
+                    ),
+                }
+            )
+
+        # Remember the estimate of containers that were never backed up, so the next "cached" plan does not scan them
+        unknown_sizes = {
+            p["name"]: p["estimated_bytes"]
+            for g in groups
+            for p in g["containers"]
+            if p["name"] not in self.container_sizes
+            and p["name"] not in self._plan_size_estimates
+            and any(source["exists"] for source in p["sources"])
+        }
+        if unknown_sizes:
+            self._plan_size_estimates.update(unknown_sizes)
+            self.db.put(self.PLAN_SIZE_ESTIMATES_KEY, self._plan_size_estimates)
+
+        total_bytes = sum(g["estimated_bytes"] for g in groups)
+        destinations = [self._plan_destination(dest_dir, total_bytes) for dest_dir in self._planned_destinations()]
+        with self._outcome_lock:
+            skipped = [{"name": name, "reason": reason} for name, reason in sorted(self.container_skip_reasons.items())]
+
+        return {
+            "generated_at": self.start_time.isoformat(timespec="seconds"),
+            "estimate": estimate,
+            "groups": groups,
+            "skipped": skipped,
+            "destinations": destinations,
+            "estimated_bytes": total_bytes,
+            "fits": all(d["fits"] is not False for d in destinations),
+        }
+
+    def _plan_container(self, c: Container, estimate: str, previous_downtimes: Dict[str, float]) -> Dict[str, Any]:
+        sources = []
+        estimated_bytes = 0
+        estimated_files: Optional[int] = 0
+        previous_bytes = self.container_sizes.get(str(c.name))
+        cached_bytes = previous_bytes if previous_bytes is not None else self._plan_size_estimates.get(str(c.name))
+
+        for src_dir, src_dir_no_path in self._get_label_src_dirs(c):
+            dest_dir, dest_dir_no_path = self._get_dest_dir(c, src_dir_no_path, create=False)
+            source = {"source_dir": str(src_dir), "destination_dir": str(dest_dir), "exists": src_dir.exists()}
+            sources.append(source)
+            if not source["exists"] or (estimate == "cached" and cached_bytes is not None):
+                continue
+
+            size_bytes, files = self._estimate_transfer(c, src_dir, dest_dir, dest_dir_no_path, estimate)
+            estimated_bytes += size_bytes
+            estimated_files = None if estimated_files is None or files is None else estimated_files + files
+
+        if estimate == "cached" and cached_bytes is not None:
+            estimated_bytes, estimated_files = int(cached_bytes), None
+
+        # Historical throughput: how long the container was stopped for, per byte of its previous backup
+        estimated_downtime = previous_downtimes.get(str(c.name))
+        if estimated_downtime is not None and previous_bytes:
+            estimated_downtime = round(estimated_downtime * estimated_bytes / previous_bytes, 3)
+
+        return {
+            "name": str(c.name),
+            "id": str(c.id)[:12],
+            "sources": sources,
+            "estimated_bytes": estimated_bytes,
+            "estimated_files": estimated_files,
+            "estimated_downtime_seconds": estimated_downtime,
+        }
+
+    def _estimate_transfer(
+        self, c: Container, src_dir: Path, dest_dir: Path, dest_dir_no_path: str, estimate: str
+    ) -> Tuple[int, Optional[int]]:
+        """Return the (bytes, files) a backup of src_dir would copy. Nothing is written"""
+        if estimate == "rsync":
+            base_dest_dir = Path(self.env.DEST_LOCATION)
+            rsync_args = strip_quiet_flag(
+                self._get_rsync_args(c) + self._get_link_dest_args(base_dest_dir, dest_dir_no_path)
+            )
+            args = ["/usr/bin/rsync", *shlex.split(rsync_args), "--dry-run", "--stats", "--no-human-readable"]
+            out = subprocess.run(
+                [*args, f"{src_dir.absolute()}/", f"{dest_dir.absolute()}/"], capture_output=True, text=True
+            )
+            stats = parse_rsync_stats(out.stdout)
+            if out.returncode == 0 and "transferred_file_size" in stats:
+                return stats["transferred_file_size"], stats.get("files_transferred")
+            self.log_this(f"rsync dry run failed for {c.name} (exit {out.returncode}). Scanning the source", "WARN")
+
+        try:
+            files, size_bytes, _ = self._fingerprint_tree(src_dir)
+        except OSError as e:
+            self.log_this(f"Unable to scan '{src_dir}': {e}", "WARN")
+            return 0, None
+        return size_bytes, files
+
+    def _planned_destinations(self) -> List[Path]:
+        dest_dirs = [Path(self.env.DEST_LOCATION)]
+        dest_dirs.extend(self.env.SECONDARY_DEST_DIRS)
+        return dest_dirs
+
+    def _plan_destination(self, dest_dir: Path, required_bytes: int) -> Dict[str, Any]:
+        """Whether the destination can hold required_bytes and keep the RETENTION_MIN_FREE_* floor"""
+        try:
+            usage = os.statvfs(dest_dir)
+        except OSError as e:
+            self.log_this(f"Unable to check free space on '{dest_dir}': {e}", "WARN")
+            return {"path": str(dest_dir), "free_bytes": None, "required_bytes": required_bytes, "fits": None}
+
+        total_bytes = usage.f_blocks * usage.f_frsize
+        free_bytes = usage.f_bavail * usage.f_frsize
+        floor_bytes = max(self.env.RETENTION_MIN_FREE_BYTES, total_bytes * self.env.RETENTION_MIN_FREE_PERCENT // 100)
+        return {
+            "path": str(dest_dir),
+            "free_bytes": free_bytes,
+            "required_bytes": required_bytes + floor_bytes,
+            "fits": free_bytes >= required_bytes + floor_bytes,
+        }
+
+    def _preflight_check(self, containers_by_group: Dict[str, List[Container]]) -> Dict[str, List[Container]]:
+        """Plan the run before any container is stopped (PREFLIGHT_CHECK).
+        refuse: skip every container when a destination cannot hold the backup
+        reorder: back up the smallest groups first, so the most groups complete before a destination fills up
+        """
+        if self.env.PREFLIGHT_CHECK == "off" or not containers_by_group:
+            return containers_by_group
+
+        plan = self._plan_groups(containers_by_group, self.env.PREFLIGHT_ESTIMATE)
+        if plan["fits"]:
+            self.log_this(
+                f"Pre-flight check: {plan['estimated_bytes']} bytes to back up, every destination fits", "DEBUG"
+            )
+            return containers_by_group
+
+        for dest in plan["destinations"]:
+            if dest["fits"] is False:
+                self._record_error(
+                    f"Pre-flight check: '{dest['path']}' has {dest['free_bytes']} bytes free "
+                    f"but {dest['required_bytes']} are needed"
+                )
+
+        if self.env.PREFLIGHT_CHECK == "refuse":
+            self.log_this("Pre-flight check: not enough space on a destination. Skipping the backup", "ERROR")
+            for containers in containers_by_group.values():
+                for c in containers:
+                    self._record_container_skipped(
+                        c, "insufficient_space", f"Skipping {c.name}, the destination cannot hold the backup", log=False
                     )
+                    self._publish_progress(c, "skipped", reason="insufficient_space")
+            return {}
 
-        for dir in dest_dirs:
-            self._backup_additional_folders_standalone(BeforeOrAfter.AFTER, dir)
+        self.log_this(
+            "Pre-flight check: not enough space on a destination. Backing up the smallest groups first", "WARN"
+        )
+        sizes = {group: planned["estimated_bytes"] for group, planned in zip(containers_by_group, plan["groups"])}
+        return dict(sorted(containers_by_group.items(), key=lambda item: sizes[item[0]]))
+
+    def backup(self, exit_on_run_once: bool = True):
+        """Run a full backup. With RUN_ONCE, the container is stopped afterwards unless exit_on_run_once is False"""
+        if self.env.REPORT_FILE == True:
+            self.logger._create_new_report_file()
 
-        self._apply_retention_policy(Path(self.env.DEST_LOCATION))
+        self.log_this("Starting backup...", "INFO")
+
+        # A long running process may still be deleting the expired backups of the previous run
+        self.wait_for_retention_deletes()
+
+        self._reset_outcomes()
+        self.reset_db()
+
+        self.start_time = datetime.now()
+        self.source_fingerprints = self.db.get("source_fingerprints", {}) or {}
+        self.container_sizes = self.db.get("container_sizes", {}) or {}
+        previous_downtimes = self.db.get("container_downtimes", {}) or {}
+        for message in self.db.get(self.PENDING_DELETE_ERRORS_KEY, []) or []:
+            self._record_error(message)  # Background deletes that failed after the previous run was stored
+        self.db.delete(self.PENDING_DELETE_ERRORS_KEY)
+        self.db.update({"backup_running": True, "last_cron": self.start_time.strftime("%m/%d/%y %H:%M")})
+
+        self.metrics = MetricsRegistry() if self.env.PROMETHEUS_METRICS else None  # Added to the totals at the end
+        self._publish_live("backup", state="started")
+        self._run_exec(None, BeforeAfterorDuring.BEFORE, attached_to_container=False)
+
+        for dir in self.env.SECONDARY_DEST_DIRS:
+            self.log_this(f"Secondary destination directories '{dir.absolute()}'", "DEBUG")
+        dest_dirs = [Path(self.env.DEST_LOCATION), *self.env.SECONDARY_DEST_DIRS]
+
+        containers_by_group = self.group_containers()
+        self._ensure_destination_capacity([c for group in containers_by_group.values() for c in group])
+        checked_containers_by_group = self._preflight_check(containers_by_group)
+        # The pre-flight check refused the run. Nothing is written, not even the standalone folders
+        refused = bool(containers_by_group) and not checked_containers_by_group
+
+        if not refused:
+            for dir in dest_dirs:
+                self._backup_additional_folders_standalone(BeforeOrAfter.BEFORE, dir)
+
+        self._backup_groups(checked_containers_by_group, dest_dirs)
+
+        if not refused:
+            for dir in dest_dirs:
+                self._backup_additional_folders_standalone(BeforeOrAfter.AFTER, dir)
+
+        self._wait_for_deferred_replication()
+
+        retention_dirs = [Path(self.env.DEST_LOCATION)]
         if self.env.RETENTION_SECONDARY_DESTINATIONS:
-            for dir in self.env.SECONDARY_DEST_DIRS:
-                self._apply_retention_policy(dir)
+            retention_dirs.extend(self.env.SECONDARY_DEST_DIRS)
+        for dir in retention_dirs:
+            retention_start = time.monotonic()
+            deleted = self._apply_retention_policy(dir)
+            self._emit_event(
+                "retention",
+                duration_ms=(time.monotonic() - retention_start) * 1000,
+                dest_dir=str(dir),
+                deleted=deleted,
+            )
 
         self.end_time = datetime.now()
         exeuction_time = self.end_time - self.start_time
         duration = datetime.fromtimestamp(exeuction_time.total_seconds())
 
-        self.db.put("backup_running", False)
-        self.db.put("containers_completed", len(self.containers_completed))
-        self.db.put("containers_skipped", len(self.containers_skipped))
-        self.db.put("errors", len(self.error_messages))
-        self.db.put("last_backup_seconds_taken", round(exeuction_time.total_seconds()))
+        with self._outcome_lock:
+            self._outcome_stored = True
+        self.db.update(
+            {
+                "backup_running": False,
+                "containers_completed": len(self.containers_completed),
+                "containers_skipped": len(self.containers_skipped),
+                "errors": len(self.error_messages),
+                "last_backup_seconds_taken": round(exeuction_time.total_seconds()),
+                "source_fingerprints": self._updated_source_fingerprints(),
+                "container_downtimes": {**previous_downtimes, **self.container_downtimes},
+            }
+        )
+        if self.env.RSYNC_STATS:
+            self.db.put("rsync_stats", self._updated_rsync_stats())
+        if self._collects_rsync_stats():
+            self.db.put("container_sizes", self._updated_container_sizes())
+
+        self._record_run_history()
+        self._record_run_metrics()
+        self._publish_live(
+            "backup",
+            state="finished",
+            status=self._backup_status(),
+            completed=len(self.containers_completed),
+            skipped=len(self.containers_skipped),
+            failed=len(self.containers_failed),
+            duration_seconds=round(exeuction_time.total_seconds()),
+        )
 
         self._run_exec(None, BeforeAfterorDuring.AFTER, attached_to_container=False)
 
@@ -1156,14 +2592,20 @@ class NauticalBackup:
             f"Success. {len(self.containers_completed)} containers backed up! {len(self.containers_skipped)} skipped.",
             "INFO",
         )
+        self.logger.drain()
 
-        if self.env.RUN_ONCE == True:
+        if self.env.RUN_ONCE == True and exit_on_run_once:
             self.log_this("RUN_ONCE is true. Exiting...", "INFO")
             subprocess.run("kill -SIGTERM 1", shell=True)  # Quit the container
             sys.exit(0)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Back up the data of Docker containers")
+    parser.add_argument("--plan", action="store_true", help="Print the estimated backup as JSON and exit")
+    parser.add_argument("--estimate", choices=NauticalBackup.PLAN_ESTIMATES, help="How --plan estimates sizes")
+    cli_args = parser.parse_args()
+
     try:
         docker_client = docker.from_env()
         docker_client.ping()  # Test connection to Docker
@@ -1171,5 +2613,13 @@ if __name__ == "__main__":
         print(f"Error connecting to Docker. Please either mount the Docker socket or set DOCKER_HOST.")
         exit(1)
 
+    if cli_args.plan:
+        with contextlib.redirect_stdout(sys.stderr):  # Keep stdout for the JSON plan
+            planner = NauticalBackup(docker_client, new_report_file=False)
+            plan = planner.plan(cli_args.estimate)
+            planner.logger.drain()  # ASYNC_LOGGING output must not land on stdout after the redirect ends
+        print(json.dumps(plan, indent=2))
+        exit(0 if plan["fits"] else 2)
+
     nautical = NauticalBackup(docker_client)
     nautical.backup()
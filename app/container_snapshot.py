@@ -0,0 +1,97 @@
+from typing import Any, Dict, List, Optional
+
+import docker
+from docker.models.containers import Container
+
+
+class ContainerSnapshot:
+    """Run-scoped view of every container, loaded with a single bulk call to the Docker API.
+
+    `docker.containers.list()` inspects every container one at a time. This snapshot builds the
+    Container objects straight from the `/containers/json` summaries instead, pre-parses the labels
+    once, and refreshes container states in bulk.
+    """
+
+    def __init__(self, docker_client: docker.DockerClient, label_prefix: str):
+        self.docker = docker_client
+        self.prefix = f"{label_prefix}."
+
+        self.containers: Dict[str, Container] = {}  # Keyed by container ID
+        self.labels: Dict[str, Dict[str, str]] = {}  # Label prefix removed. Ex: {"enable": "true"}
+        self.images: Dict[str, str] = {}  # Image name each container was created from
+
+    def load(self) -> List[Container]:
+        """Load every running container (the same set as `docker.containers.list()`) in one request"""
+        self.containers.clear()
+        self.labels.clear()
+        self.images.clear()
+
+        for summary in self.docker.api.containers():
+            c = self._to_container(summary)
+            container_id = str(c.id)
+            self.containers[container_id] = c
+            self.images[container_id] = str(summary.get("Image", ""))
+            self.labels[container_id] = {
+                key[len(self.prefix) :]: value
+                for key, value in (summary.get("Labels") or {}).items()
+                if key.startswith(self.prefix)
+            }
+
+        return list(self.containers.values())
+
+    def refresh(self, containers: List[Container]) -> List[Container]:
+        """Refresh the state of the given containers with one request.
+        Returns only the containers whose state actually changed.
+        """
+        return refresh_container_states(self.docker, [c for c in containers if str(c.id) in self.containers])
+
+    def get_label(self, c: Container, target: str, default=None) -> Any:
+        """Return the label without the prefix. Falls back to the container itself if it is not in the snapshot"""
+        labels = self.labels.get(str(c.id))
+        if labels is None:
+            return c.labels.get(f"{self.prefix}{target}", default)
+        return labels.get(target, default)
+
+    def get_image_name(self, c: Container) -> Optional[str]:
+        return self.images.get(str(c.id))
+
+    def _to_container(self, summary: Dict[str, Any]) -> Container:
+        """Build a Container whose attributes match an inspect response closely enough for Nautical"""
+        names: List[str] = summary.get("Names") or []
+        # Linked containers also report names like "/other/alias". The real name has a single slash
+        name = next((n for n in names if "/" not in n.lstrip("/")), names[0] if names else "")
+
+        attrs = {
+            "Id": summary["Id"],
+            "Name": name,
+            "Image": summary.get("ImageID"),
+            "Config": {"Image": summary.get("Image"), "Labels": summary.get("Labels") or {}},
+            "State": {"Status": summary.get("State")},
+        }
+        return Container(attrs=attrs, client=self.docker, collection=self.docker.containers)
+
+
+def refresh_container_states(docker_client: docker.DockerClient, containers: List[Container]) -> List[Container]:
+    """Refresh the state of the given containers with one `/containers/json` request instead of one inspect each.
+    Returns only the containers whose state actually changed.
+    """
+    by_id = {str(c.id): c for c in containers}
+    if not by_id:
+        return []
+
+    changed: List[Container] = []
+    for summary in docker_client.api.containers(all=True, filters={"id": list(by_id)}):
+        c = by_id.get(summary["Id"])
+        if c is None:
+            continue
+
+        new_state = summary.get("State")
+        if c.status != new_state:
+            state = c.attrs.get("State")
+            if isinstance(state, dict):
+                state["Status"] = new_state  # Keep the rest of an inspect response (Health, ExitCode...)
+            else:
+                c.attrs["State"] = {"Status": new_state}
+            changed.append(c)
+
+    return changed
@@ -1,29 +1,277 @@
+import copy
 import os
 import json
-from typing import Any, Optional, Union
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
 from app.logger import Logger, LogType, LogLevel
+from app.nautical_env import get_nautical_env
 from datetime import datetime
 
 
+class JsonStorage:
+    """The original storage. Everything lives in a single JSON document"""
+
+    def __init__(self, db_path: str, cached: bool):
+        self.db_path = db_path
+        self.cached = cached
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cache_signature: Optional[Tuple[int, int, int]] = None
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.db_path)
+
+    def create(self, data: Dict[str, Any]) -> None:
+        with open(self.db_path, "w") as db_file:
+            json.dump(data, db_file)
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Cheap check for changes made by another process (inode, mtime and size)"""
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read_db(self):
+        if self.cached:
+            signature = self._file_signature()
+            if self._cache is not None and signature is not None and signature == self._cache_signature:
+                return self._cache
+
+        if os.path.exists(self.db_path) and os.path.isfile(self.db_path):
+            with open(self.db_path, "r") as f:
+                data = json.load(f)
+        else:
+            data = {}
+
+        if self.cached:
+            # Keep the signature from before the read, so a write that lands in between is seen next time
+            self._cache = data
+            self._cache_signature = signature
+        return data
+
+    def _write_db(self, data):
+        if not self.cached:
+            with open(self.db_path, "w") as f:
+                json.dump(data, f, indent=4)
+            return
+
+        # Write to a temporary file and swap it in, so readers never see a half written document
+        db_dir = os.path.dirname(self.db_path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".nautical-db-", suffix=".tmp", dir=db_dir)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+            os.replace(tmp_path, self.db_path)
+        except OSError:
+            # The file itself may be a bind mount, which cannot be replaced. Write it in place instead
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with open(self.db_path, "w") as f:
+                json.dump(data, f, indent=4)
+
+        self._cache = data
+        self._cache_signature = self._file_signature()
+
+    def read(self) -> Dict[str, Any]:
+        data = self._read_db()
+        # The cached document is shared, so never hand out its mutable values
+        return copy.deepcopy(data) if self.cached else data
+
+    def get(self, key: str, default=None):
+        data = self._read_db()
+        return copy.deepcopy(data.get(key, default)) if self.cached else data.get(key, default)
+
+    def update(self, values: Dict[str, Any]) -> None:
+        data = dict(self._read_db())
+        data.update(values)
+        self._write_db(data)
+
+    def delete(self, key: str) -> None:
+        data = dict(self._read_db())
+        if key in data:
+            del data[key]
+            self._write_db(data)
+
+    # A single JSON document only holds the latest values, so there is no history to keep
+    def record_run(self, run: Dict[str, Any], outcomes: List[Dict[str, Any]]) -> Optional[int]:
+        return None
+
+    def get_runs(self, limit: int) -> List[Dict[str, Any]]:
+        return []
+
+    def get_container_history(self, container_name: str, limit: int) -> List[Dict[str, Any]]:
+        return []
+
+
+class SqliteStorage:
+    """Key/values plus the history of every backup run, stored in SQLite.
+    WAL mode lets the API read while a backup is writing.
+    """
+
+    SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+        """CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL,
+            duration_seconds REAL NOT NULL,
+            status TEXT NOT NULL,
+            containers_completed INTEGER NOT NULL,
+            containers_skipped INTEGER NOT NULL,
+            containers_failed INTEGER NOT NULL,
+            errors INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS container_outcomes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+            container_name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            reason TEXT,
+            duration_seconds REAL,
+            bytes_transferred INTEGER
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_outcomes_container ON container_outcomes (container_name, run_id)",
+        "CREATE INDEX IF NOT EXISTS idx_outcomes_run ON container_outcomes (run_id)",
+    ]
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            # The DB lock serializes access, so the connection can be shared between threads
+            self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            for statement in self.SCHEMA:
+                self._conn.execute(statement)
+        return self._conn
+
+    def exists(self) -> bool:
+        if not os.path.isfile(self.db_path):
+            return False
+        return self.conn.execute("SELECT 1 FROM kv LIMIT 1").fetchone() is not None
+
+    def create(self, data: Dict[str, Any]) -> None:
+        self.update(data)
+
+    def read(self) -> Dict[str, Any]:
+        return {row["key"]: json.loads(row["value"]) for row in self.conn.execute("SELECT key, value FROM kv")}
+
+    def get(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM kv WHERE key = ?", (key,)).fetchone()
+        return default if row is None else json.loads(row["value"])
+
+    def update(self, values: Dict[str, Any]) -> None:
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                [(key, json.dumps(value)) for key, value in values.items()],
+            )
+
+    def delete(self, key: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def record_run(self, run: Dict[str, Any], outcomes: List[Dict[str, Any]]) -> Optional[int]:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                """INSERT INTO runs (started_at, finished_at, duration_seconds, status,
+                containers_completed, containers_skipped, containers_failed, errors)
+                VALUES (:started_at, :finished_at, :duration_seconds, :status,
+                :containers_completed, :containers_skipped, :containers_failed, :errors)""",
+                run,
+            )
+            run_id = cursor.lastrowid
+            conn.executemany(
+                """INSERT INTO container_outcomes
+                (run_id, container_name, status, reason, duration_seconds, bytes_transferred)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (
+                        run_id,
+                        o["container_name"],
+                        o["status"],
+                        o.get("reason"),
+                        o.get("duration_seconds"),
+                        o.get("bytes_transferred"),
+                    )
+                    for o in outcomes
+                ],
+            )
+        return run_id
+
+    def get_runs(self, limit: int) -> List[Dict[str, Any]]:
+        rows = self.conn.execute("SELECT * FROM runs ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(row) for row in rows]
+
+    def get_container_history(self, container_name: str, limit: int) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            """SELECT o.run_id, r.started_at, o.container_name, o.status, o.reason,
+            o.duration_seconds, o.bytes_transferred
+            FROM container_outcomes o JOIN runs r ON r.id = o.run_id
+            WHERE o.container_name = ? ORDER BY o.run_id DESC LIMIT ?""",
+            (container_name, limit),
+        )
+        return [dict(row) for row in rows]
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
 class DB:
-    def __init__(self, db_path: Union[str, Path] = ""):
+    def __init__(self, db_path: Union[str, Path] = "", cached: Optional[bool] = None, backend: Optional[str] = None):
         self.db_path: str = str(db_path)
+        env = get_nautical_env()
         if self.db_path == "":
-            NAUTICAL_DB_PATH = os.getenv("NAUTICAL_DB_PATH", "/config")
-            NAUTICAL_DB_NAME = os.getenv("NAUTICAL_DB_NAME", "nautical-db.json")
-            self.db_path = f"{NAUTICAL_DB_PATH}/{NAUTICAL_DB_NAME}"
+            self.db_path = f"{env.NAUTICAL_DB_PATH}/{env.NAUTICAL_DB_NAME}"
         self.logger = Logger()
+        self._lock = threading.RLock()  # Every read-modify-write must be atomic across threads
+
+        if backend is None:
+            backend = env.NAUTICAL_DB_BACKEND
+        if backend not in ["json", "sqlite"]:
+            backend = "json"  # Set default
+        self.backend: str = backend
+
+        # Keep the parsed document in memory and only re-read it when the file changed on disk
+        if cached is None:
+            cached = env.NAUTICAL_DB_CACHE
+        self.cached: bool = cached
 
         if os.path.exists(self.db_path) and not os.path.isfile(self.db_path):
             # If db_path is a folder (not a file), just make it a file
             self.db_path += "/nautical-db.json"
 
+        if self.backend == "sqlite":
+            if self.db_path.endswith(".json"):
+                self.db_path = self.db_path[: -len(".json")] + ".sqlite"
+            self._storage: Union[JsonStorage, SqliteStorage] = SqliteStorage(self.db_path)
+        else:
+            self._storage = JsonStorage(self.db_path, self.cached)
+
         self._initialize_db()
         self._seed_db()
 
     def __repr__(self) -> str:
-        return str({"db_path": self.db_path, "db": dict(self._read_db())})
+        return str({"db_path": self.db_path, "db": dict(self.dump_json())})
 
     def log_this(self, log_message, log_level=LogLevel.INFO, log_type: LogType = LogType.DEFAULT) -> None:
         """Wrapper for log this"""
@@ -37,71 +285,62 @@ class DB:
             self.log_this(f"Initializing database at '{self.db_path}'...", log_type=LogType.INIT)
             Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
 
-            if not os.path.isfile(self.db_path):
+        with self._lock:
+            if not self._storage.exists():
                 self.log_this(f"Creating Database at path: '{self.db_path}'...", log_type=LogType.INIT)
-                with open(self.db_path, "w") as db_file:
-                    current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    json.dump(
-                        {
-                            "created_at": f"{current_date}",
-                        },
-                        db_file,
-                    )
+                current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self._storage.create({"created_at": f"{current_date}"})
 
                 self.log_this(f"Database initialized at '{self.db_path}'...", log_type=LogType.INIT)
 
     def _seed_db(self):
         """Seed the database with default values."""
-        with open(self.db_path, "r+") as db_file:
-            data = json.load(db_file)
-
-            if data.get("backup_running") is None:
-                data["backup_running"] = False
-
-            if data.get("containers_skipped") is None:
-                data["containers_skipped"] = 0
-
-            if data.get("containers_completed") is None:
-                data["containers_completed"] = 0
-
-            if data.get("number_of_containers") is None:
-                data["number_of_containers"] = 0
+        with self._lock:
+            data = self._storage.read()
 
-            if data.get("errors") is None:
-                data["errors"] = 0
-
-            db_file.seek(0)
-            json.dump(data, db_file, indent=4)
-            db_file.truncate()
-
-    def _read_db(self):
-        if os.path.exists(self.db_path) and os.path.isfile(self.db_path):
-            with open(self.db_path, "r") as f:
-                return json.load(f)
-        else:
-            return {}
-
-    def _write_db(self, data):
-        with open(self.db_path, "w") as f:
-            json.dump(data, f, indent=4)
+            defaults = {
+                "backup_running": False,
+                "containers_skipped": 0,
+                "containers_completed": 0,
+                "number_of_containers": 0,
+                "errors": 0,
+            }
+            self._storage.update({key: value for key, value in defaults.items() if data.get(key) is None})
 
     def get(self, key: str, default=None):
-        data = self._read_db()
-        return data.get(key, default)
+        with self._lock:
+            return self._storage.get(key, default)
 
     def put(self, key: str, value):
-        data = self._read_db()
-        data[key] = value
-        self._write_db(data)
+        self.update({key: value})
+
+    def update(self, values: Dict[str, Any]):
+        """Set multiple keys with a single read-modify-write"""
+        with self._lock:
+            self._storage.update(values)
 
     def delete(self, key: str):
-        data = self._read_db()
-        if key in data:
-            del data[key]
-            self._write_db(data)
+        with self._lock:
+            self._storage.delete(key)
 
     def dump_json(self):
-        return self._read_db()
+        with self._lock:
+            return self._storage.read()
+
+    def record_run(self, run: Dict[str, Any], outcomes: List[Dict[str, Any]]) -> Optional[int]:
+        """Store a finished backup run and the outcome of each container. Only kept by the sqlite backend"""
+        with self._lock:
+            return self._storage.record_run(run, outcomes)
+
+    def get_runs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent backup runs first"""
+        with self._lock:
+            return self._storage.get_runs(limit)
+
+    def get_container_history(self, container_name: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent outcomes of a single container first"""
+        with self._lock:
+            return self._storage.get_container_history(container_name, limit)
 
 
 if __name__ == "__main__":
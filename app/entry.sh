@@ -20,7 +20,9 @@ install_cron(){
     crontab tempcron && rm tempcron
 }
 
-if [ "$CRON_SCHEDULE_ENABLED" = "true" ]; then
+if [ "$CRON_SCHEDULE_ENABLED" = "true" ] && [ "$SCHEDULER_MODE" = "daemon" ]; then
+    logThis "Skipping CRON installation since SCHEDULER_MODE=daemon" "DEBUG" "init"
+elif [ "$CRON_SCHEDULE_ENABLED" = "true" ]; then
     install_cron
 else
     logThis "Skipping CRON installation since CRON_SCHEDULE_ENABLED=false" "INFO" "init"
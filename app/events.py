@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+Event = Dict[str, Any]
+
+
+class EventBus:
+    """Pushes backup progress from NauticalBackup (any thread) to subscribers as it happens.
+
+    Callbacks run on the publishing thread. Async subscribers (like the SSE endpoint) get their own
+    asyncio.Queue, filled on their event loop through `call_soon_threadsafe`.
+    """
+
+    MAX_QUEUE_SIZE = 1000  # Events for a subscriber that stopped reading are dropped after this
+
+    def __init__(self):
+        self._callbacks: List[Callable[[Event], None]] = []
+        self._queues: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Queue[Event]"]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: Callable[[Event], None]) -> None:
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def subscribe_queue(self, loop: asyncio.AbstractEventLoop) -> "asyncio.Queue[Event]":
+        queue: "asyncio.Queue[Event]" = asyncio.Queue(self.MAX_QUEUE_SIZE)
+        with self._lock:
+            self._queues.append((loop, queue))
+        return queue
+
+    def unsubscribe(self, subscriber: Any) -> None:
+        with self._lock:
+            self._callbacks = [c for c in self._callbacks if c != subscriber]
+            self._queues = [(loop, q) for loop, q in self._queues if q is not subscriber]
+
+    def publish(self, event_type: str, **fields: Any) -> None:
+        with self._lock:
+            callbacks = list(self._callbacks)
+            queues = list(self._queues)
+        if not callbacks and not queues:
+            return
+
+        event: Event = {"type": event_type, "timestamp": datetime.now().isoformat(), **fields}
+        for callback in callbacks:
+            callback(event)
+        for loop, queue in queues:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                self.unsubscribe(queue)  # The event loop has been closed
+
+    @staticmethod
+    def _put(queue: "asyncio.Queue[Event]", event: Event) -> None:
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+# Shared by NauticalBackup and the API when they run in the same process
+event_bus = EventBus()
+
+
+def progress_event_from_record(record: Dict[str, Any]) -> Optional[Event]:
+    """Turn a JSON_LOG_FILE record back into the event that was published, or None for other records.
+    Records written by this process are skipped, since they already went through the event bus.
+    """
+    if record.get("phase") != "progress" or record.get("pid") == os.getpid():
+        return None
+    event = {key: value for key, value in record.items() if key not in ["phase", "event", "pid"]}
+    return {"type": record.get("event"), **event}
+
+
+async def follow_progress_events(path: str, queue: "asyncio.Queue[Event]", poll_seconds: float = 1.0) -> None:
+    """Copy the progress events that other processes (cron, the scheduler) append to JSON_LOG_FILE into queue.
+    Only lines written after this started are followed. Runs until cancelled.
+    """
+    position: Optional[int] = None
+    partial = ""
+    while True:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if position is None or size < position:
+            # First look, or the file was truncated or rotated
+            position, partial = (size if position is None else 0), ""
+
+        if size > position:
+            with open(path, "r") as f:
+                f.seek(position)
+                chunk = f.read()
+                position = f.tell()
+            lines = (partial + chunk).split("\n")
+            partial = lines.pop()  # Not terminated yet
+            for line in lines:
+                try:
+                    event = progress_event_from_record(json.loads(line))
+                except ValueError:
+                    continue
+                if event is not None:
+                    EventBus._put(queue, event)
+
+        await asyncio.sleep(poll_seconds)
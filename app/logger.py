@@ -1,8 +1,14 @@
+import atexit
 import datetime
+import json
 import os
+import queue
+import sys
+import threading
+import time
 from pathlib import Path
-from typing import Optional, Union
-from app.nautical_env import NauticalEnv
+from typing import Any, Callable, Dict, List, Optional, TextIO, Tuple, Union
+from app.nautical_env import get_nautical_env
 from enum import Enum
 
 
@@ -19,10 +25,166 @@ class LogType(Enum):
     DEFAULT = 1
 
 
+class ReportFileWriter:
+    """Keeps one append handle open per report file and writes lines in batches.
+    Shared by every Logger writing to the same path.
+    """
+
+    FLUSH_INTERVAL_SECONDS = 2.0
+    FLUSH_BYTES = 64 * 1024
+
+    _writers: Dict[str, "ReportFileWriter"] = {}
+    _writers_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle: Optional[TextIO] = None
+        self._buffer: List[str] = []
+        self._buffered_bytes = 0
+        self._last_flush = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None  # Writes out lines that no later write() picks up
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: str) -> "ReportFileWriter":
+        with cls._writers_lock:
+            writer = cls._writers.get(path)
+            if writer is None:
+                writer = cls._writers[path] = cls(path)
+            return writer
+
+    @classmethod
+    def close_path(cls, path: str) -> None:
+        """Flush and close the writer of a report file that is about to be replaced or removed"""
+        with cls._writers_lock:
+            writer = cls._writers.pop(path, None)
+        if writer:
+            writer.close()
+
+    @classmethod
+    def flush_all(cls) -> None:
+        with cls._writers_lock:
+            writers = list(cls._writers.values())
+        for writer in writers:
+            writer.flush()
+
+    @classmethod
+    def close_all(cls) -> None:
+        with cls._writers_lock:
+            writers = list(cls._writers.values())
+            cls._writers.clear()
+        for writer in writers:
+            writer.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self._handle is not None
+
+    def write(self, line: str, urgent=False) -> None:
+        """Buffer a line. Urgent lines (WARN/ERROR) are written to disk immediately"""
+        with self._lock:
+            self._buffer.append(line)
+            self._buffered_bytes += len(line)
+            if (
+                urgent
+                or self._buffered_bytes >= self.FLUSH_BYTES
+                or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL_SECONDS
+            ):
+                self._flush()
+            elif self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.FLUSH_INTERVAL_SECONDS, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._buffer:
+            return
+
+        if self._handle is None:
+            self._handle = open(self.path, "a")
+        self._handle.write("".join(self._buffer))
+        self._handle.flush()
+        self._buffer.clear()
+        self._buffered_bytes = 0
+
+
+class AsyncLogDispatcher:
+    """Runs console and report file output on a single background thread, in the order it was submitted.
+    The queue is bounded, so a caller only waits when the thread has fallen far behind.
+    """
+
+    MAX_QUEUE_SIZE = 10000
+
+    _instance: Optional["AsyncLogDispatcher"] = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        self._queue: "queue.Queue[Tuple[Callable[..., Any], Tuple[Any, ...]]]" = queue.Queue(self.MAX_QUEUE_SIZE)
+        self._thread = threading.Thread(target=self._run, name="nautical-logger", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get(cls) -> "AsyncLogDispatcher":
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+            return cls._instance
+
+    @classmethod
+    def drain_all(cls) -> None:
+        """Wait until every submitted record has been written. Does nothing if async logging never started"""
+        with cls._instance_lock:
+            instance = cls._instance
+        if instance is not None:
+            instance.drain()
+
+    def submit(self, func: Callable[..., Any], *args: Any) -> None:
+        self._queue.put((func, args))
+
+    def drain(self) -> None:
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"ERROR: Unable to write log record: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+
+def _close_logging() -> None:
+    AsyncLogDispatcher.drain_all()
+    ReportFileWriter.close_all()
+
+
+atexit.register(_close_logging)
+
+
 class Logger:
+    # Report file of the current run. Shared by every Logger so the backup, the DB, etc. write to the same file
+    _report_file: Optional[str] = None
+
     def __init__(self):
         self.levels = {LogLevel.TRACE: 0, LogLevel.DEBUG: 1, LogLevel.INFO: 2, LogLevel.WARN: 3, LogLevel.ERROR: 4}
-        self.env = NauticalEnv()
+        self.env = get_nautical_env()
 
         # Defaults
         self.script_logging_level: LogLevel = LogLevel.INFO
@@ -40,7 +202,16 @@ class Logger:
             self.report_file_on_backup_only = False
 
         self.dest_location: Union[str, Path] = os.environ.get("DEST_LOCATION", "")
-        self.report_file = f"Backup Report - {datetime.datetime.now().strftime('%Y-%m-%d')}.txt"
+
+    @property
+    def report_file(self) -> str:
+        if Logger._report_file is None:
+            Logger._report_file = self._report_file_name()
+        return Logger._report_file
+
+    @staticmethod
+    def _report_file_name() -> str:
+        return f"Backup Report - {datetime.datetime.now().strftime('%Y-%m-%d')}.txt"
 
     @staticmethod
     def set_to_string(input: set) -> str:
@@ -66,7 +237,7 @@ class Logger:
         return None
 
     def _delete_old_report_files(self):
-        """Only completed on Nautical init"""
+        """Completed with every new report file. Only the report file of the current day is kept"""
         if not os.path.exists(self.dest_location):
             return
 
@@ -75,10 +246,15 @@ class Logger:
             if file.startswith("Backup Report -") and file.endswith(".txt"):
                 if file != self.report_file:
                     # Don't delete today's report file
+                    ReportFileWriter.close_path(os.path.join(self.dest_location, file))
                     os.remove(os.path.join(self.dest_location, file))
 
     def _create_new_report_file(self):
-        """Only completed on Nautical init"""
+        """Completed at the start of every backup, so a long running process gets a report file per day"""
+        AsyncLogDispatcher.drain_all()  # Records of the previous run belong in the previous report file
+        # Lines still buffered for the previous report file are written before it is replaced or deleted
+        ReportFileWriter.close_path(os.path.join(self.dest_location, self.report_file))
+        Logger._report_file = self._report_file_name()
         self._delete_old_report_files()
 
         if not os.path.exists(self.dest_location):
@@ -88,17 +264,64 @@ class Logger:
         with open(os.path.join(self.dest_location, self.report_file), "w+") as f:
             f.write(f"Backup Report - {datetime.datetime.now()}\n")
 
-    def _write_to_report_file(self, log_message, log_level: Union[str, LogLevel] = LogLevel.INFO):
+    def _write_to_report_file(
+        self,
+        log_message,
+        log_level: Union[str, LogLevel] = LogLevel.INFO,
+        timestamp: Optional[datetime.datetime] = None,
+    ):
         level = self._parse_log_level(log_level)
         if level not in self.levels:
             return  # Check if level exists
 
+        line = f"{timestamp or datetime.datetime.now()} - {str(level)[9:]}: {log_message}\n"
+
+        if self.env.REPORT_FILE_BUFFERED:
+            writer = ReportFileWriter.for_path(os.path.join(self.dest_location, self.report_file))
+            # The folder only needs to be checked once, when the handle is opened
+            if not writer.is_open and not os.path.exists(self.dest_location):
+                raise FileNotFoundError(f"Destination location {self.dest_location} does not exist.")
+            writer.write(line, urgent=self.levels[level] >= self.levels[LogLevel.WARN])
+            return
+
         # Check if folder exists
         if not os.path.exists(self.dest_location):
             raise FileNotFoundError(f"Destination location {self.dest_location} does not exist.")
 
         with open(os.path.join(self.dest_location, self.report_file), "a") as f:
-            f.write(f"{datetime.datetime.now()} - {str(level)[9:]}: {log_message}\n")
+            f.write(line)
+
+    def flush_report_file(self) -> None:
+        """Write any buffered report file lines to disk"""
+        ReportFileWriter.flush_all()
+
+    def drain(self) -> None:
+        """Wait for queued log records (ASYNC_LOGGING) and write any buffered report file lines to disk"""
+        AsyncLogDispatcher.drain_all()
+        self.flush_report_file()
+
+    def log_event(self, event: Dict[str, Any]) -> None:
+        """Append a structured event as a single JSON line to the JSON_LOG_FILE"""
+        if not self.env.JSON_LOG_FILE:
+            return
+
+        record = {"timestamp": datetime.datetime.now().isoformat(), **event}
+        if self.env.ASYNC_LOGGING:
+            AsyncLogDispatcher.get().submit(self._write_event, record)
+        else:
+            self._write_event(record)
+
+    def _write_event(self, record: Dict[str, Any]) -> None:
+        writer = ReportFileWriter.for_path(self.env.JSON_LOG_FILE)
+        if not writer.is_open:
+            Path(self.env.JSON_LOG_FILE).parent.mkdir(parents=True, exist_ok=True)
+        writer.write(json.dumps(record, default=str) + "\n", urgent=not self.env.REPORT_FILE_BUFFERED)
+
+    def _output(self, log_message, level: LogLevel, timestamp: datetime.datetime, console: bool, report: bool):
+        if console:
+            print(f"{str(level)[9:]}: {log_message}")
+        if report:
+            self._write_to_report_file(log_message, level, timestamp)
 
     def log_this(self, log_message, log_level: Union[str, LogLevel] = LogLevel.INFO, log_type=LogType.DEFAULT):
 
@@ -107,17 +330,22 @@ class Logger:
             return  # Check if level exists
 
         # Check if level is enough for console logging
-        if self.levels[level] >= self.levels[self.script_logging_level]:
-            print(f"{str(level)[9:]}: {log_message}")
-
-        if self.env.REPORT_FILE == False:
-            return
+        console = self.levels[level] >= self.levels[self.script_logging_level]
 
         # Check if level is enough for report file logging
-        if self.levels[level] >= self.levels[self.report_file_logging_level]:
+        report = False
+        if self.env.REPORT_FILE == True and self.levels[level] >= self.levels[self.report_file_logging_level]:
             if self.report_file_on_backup_only == True:
-                if log_type != LogType.INIT:
-                    self._write_to_report_file(log_message, log_level)
+                report = log_type != LogType.INIT
             else:
                 # Always write to report file
-                self._write_to_report_file(log_message, log_level)
+                report = True
+
+        if not console and not report:
+            return
+
+        if self.env.ASYNC_LOGGING:
+            # The timestamp is taken now, not when the background thread gets to it
+            AsyncLogDispatcher.get().submit(self._output, log_message, level, datetime.datetime.now(), console, report)
+        else:
+            self._output(log_message, level, datetime.datetime.now(), console, report)
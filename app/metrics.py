@@ -0,0 +1,184 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from app.nautical_env import get_nautical_env
+
+# Seconds. From quick stops and hooks up to multi-hour copies
+DEFAULT_BUCKETS = [0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200]
+
+# name: (type, help)
+METRICS: Dict[str, Tuple[str, str]] = {
+    "nautical_backup_runs_total": ("counter", "Completed backup runs by status"),
+    "nautical_backup_run_duration_seconds": ("histogram", "Duration of a complete backup run"),
+    "nautical_backup_errors_total": ("counter", "Errors recorded during backup runs"),
+    "nautical_containers_completed_total": ("counter", "Containers backed up successfully"),
+    "nautical_containers_skipped_total": ("counter", "Containers skipped, by reason"),
+    "nautical_containers_failed_total": ("counter", "Containers that failed, by reason"),
+    "nautical_container_downtime_seconds": ("histogram", "Time from stopping a container until it was started again"),
+    "nautical_container_stop_seconds": ("histogram", "Time taken to stop a container"),
+    "nautical_container_start_seconds": ("histogram", "Time taken to start a container"),
+    "nautical_rsync_duration_seconds": ("histogram", "Duration of a single rsync copy"),
+    "nautical_rsync_bytes_total": ("counter", "Bytes transferred by rsync"),
+    "nautical_rsync_failures_total": ("counter", "rsync copies that exited with a non-zero code"),
+    "nautical_hook_duration_seconds": ("histogram", "Duration of exec and lifecycle hooks"),
+    "nautical_retention_deletions_total": ("counter", "Backup folders removed by the retention policy"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def default_metrics_path() -> str:
+    """Metrics are kept next to the database, so every process (cron, scheduler, API) adds to the same totals"""
+    return os.path.join(get_nautical_env().NAUTICAL_DB_PATH, "nautical-metrics.json")
+
+
+class MetricsRegistry:
+    """Minimal Prometheus counters and histograms, persisted as JSON between runs.
+
+    Backups usually run in a different process than the API (cron or the scheduler), so each run collects
+    its own observations and adds them to the saved totals under a file lock (`add_to_saved`).
+    `/metrics` renders whatever was saved last.
+    """
+
+    def __init__(self, buckets: Optional[List[float]] = None):
+        self.buckets = sorted(buckets or DEFAULT_BUCKETS)
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        # Per label set: cumulative bucket counts (+Inf last), sum and count
+        self.histograms: Dict[str, Dict[Labels, Dict[str, object]]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+        return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            key = self._labels(labels)
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            key = self._labels(labels)
+            histogram = series.setdefault(key, {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0})
+
+            bucket_counts: List[int] = histogram["buckets"]  # type: ignore[assignment]
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    bucket_counts[i] += 1
+            bucket_counts[-1] += 1  # +Inf
+            histogram["sum"] = float(histogram["sum"]) + value  # type: ignore[arg-type]
+            histogram["count"] = int(histogram["count"]) + 1  # type: ignore[call-overload]
+
+    def merge(self, other: "MetricsRegistry") -> None:
+        """Add the counters and histograms of another registry (with the same buckets) to this one"""
+        with self._lock, other._lock:
+            for name, series in other.counters.items():
+                own = self.counters.setdefault(name, {})
+                for key, value in series.items():
+                    own[key] = own.get(key, 0) + value
+
+            for name, series in other.histograms.items():
+                own_histograms = self.histograms.setdefault(name, {})
+                for key, histogram in series.items():
+                    own = own_histograms.setdefault(
+                        key, {"buckets": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                    )
+                    own["buckets"] = [a + b for a, b in zip(own["buckets"], histogram["buckets"])]  # type: ignore
+                    own["sum"] = float(own["sum"]) + float(histogram["sum"])  # type: ignore[arg-type]
+                    own["count"] = int(own["count"]) + int(histogram["count"])  # type: ignore[call-overload]
+
+    @staticmethod
+    def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+
+        def _escape(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    @staticmethod
+    def _format_value(value: float) -> str:
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            for name, (metric_type, help_text) in METRICS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+                for labels, value in sorted(self.counters.get(name, {}).items()):
+                    lines.append(f"{name}{self._format_labels(labels)} {self._format_value(value)}")
+
+                for labels, histogram in sorted(self.histograms.get(name, {}).items()):
+                    bucket_counts: List[int] = histogram["buckets"]  # type: ignore[assignment]
+                    bounds = [self._format_value(b) for b in self.buckets] + ["+Inf"]
+                    for bound, count in zip(bounds, bucket_counts):
+                        lines.append(f"{name}_bucket{self._format_labels(labels, ('le', bound))} {count}")
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {self._format_value(histogram['sum'])}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "buckets": self.buckets,
+                "counters": {n: [[list(l), v] for l, v in s.items()] for n, s in self.counters.items()},
+                "histograms": {n: [[list(l), h] for l, h in s.items()] for n, s in self.histograms.items()},
+            }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "MetricsRegistry":
+        registry = cls(data.get("buckets"))
+        for name, series in data.get("counters", {}).items():
+            registry.counters[name] = {tuple(tuple(p) for p in labels): value for labels, value in series}
+        for name, series in data.get("histograms", {}).items():
+            registry.histograms[name] = {tuple(tuple(p) for p in labels): h for labels, h in series}
+        return registry
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "MetricsRegistry":
+        """Load the saved totals. Starts from zero when there are none (or they are unreadable)"""
+        path = path or default_metrics_path()
+        try:
+            with open(path, "r") as f:
+                registry = cls.from_dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return cls()
+
+        if registry.buckets != sorted(DEFAULT_BUCKETS):
+            return cls()  # The buckets changed, so the saved histograms can't be added to
+        return registry
+
+    def add_to_saved(self, path: Optional[str] = None) -> None:
+        """Add this registry to the saved totals. The lock file keeps concurrent runs from losing each other's update"""
+        path = path or default_metrics_path()
+        with open(f"{path}.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                totals = self.load(path)
+                totals.merge(self)
+                totals.save(path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or default_metrics_path()
+        directory = os.path.dirname(path) or "."
+        fd, tmp_path = tempfile.mkstemp(prefix=".nautical-metrics-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
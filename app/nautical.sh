@@ -4,4 +4,4 @@
 # The backup script must be run from the root directory
 cd /
 
-python3 /app/backup.py
\ No newline at end of file
+python3 /app/backup.py "$@"
\ No newline at end of file
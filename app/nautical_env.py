@@ -1,18 +1,26 @@
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, List, Mapping, Tuple
 
 
 class NauticalEnv:
     def __init__(self) -> None:
         self.SKIP_CONTAINERS = os.environ.get("SKIP_CONTAINERS", "")
         self.SKIP_STOPPING = os.environ.get("SKIP_STOPPING", "")
+        self.SKIP_CONTAINERS_SET: FrozenSet[str] = self._split_to_set(self.SKIP_CONTAINERS)
+        self.SKIP_STOPPING_SET: FrozenSet[str] = self._split_to_set(self.SKIP_STOPPING)
         self.SELF_CONTAINER_ID = os.environ.get("SELF_CONTAINER_ID", "")
 
         self.LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
         self.REPORT_FILE_LOG_LEVEL = os.environ.get("REPORT_FILE_LOG_LEVEL", "")
         self.REPORT_FILE_ON_BACKUP_ONLY = os.environ.get("REPORT_FILE_ON_BACKUP_ONLY", "")
 
+        self.ASYNC_LOGGING = False
+        if os.environ.get("ASYNC_LOGGING", "false").lower() == "true":
+            self.ASYNC_LOGGING = True
+
         self.DEST_LOCATION = os.environ.get("DEST_LOCATION", "")
         self.SOURCE_LOCATION = os.environ.get("SOURCE_LOCATION", "")
 
@@ -25,12 +33,36 @@ class NauticalEnv:
         self.USE_DEFAULT_RSYNC_ARGS = os.environ.get("USE_DEFAULT_RSYNC_ARGS", "")
         self.RSYNC_CUSTOM_ARGS = os.environ.get("RSYNC_CUSTOM_ARGS", "")
 
+        self.RSYNC_EXEC_MODE = os.environ.get("RSYNC_EXEC_MODE", "shell").lower()
+        if self.RSYNC_EXEC_MODE not in ["shell", "argv"]:
+            self.RSYNC_EXEC_MODE = "shell"  # Set default
+
+        self.RSYNC_STATS = False
+        if os.environ.get("RSYNC_STATS", "false").lower() == "true":
+            self.RSYNC_STATS = True
+
+        _max_dests = os.environ.get("MAX_CONCURRENT_DESTINATIONS", "1")
+        self.MAX_CONCURRENT_DESTINATIONS = int(_max_dests) if _max_dests.isdigit() and int(_max_dests) > 0 else 1
+
         self.REQUIRE_LABEL = False
         if os.environ.get("REQUIRE_LABEL", "False").lower() == "true":
             self.REQUIRE_LABEL = True
         self.LABEL_PREFIX = os.environ.get("LABEL_PREFIX", "nautical-backup")
 
-        self.NAUTICAL_DB_PATH = os.environ.get("NAUTICAL_DB_PATH", "")
+        self.USE_CONTAINER_SNAPSHOT = False
+        if os.environ.get("USE_CONTAINER_SNAPSHOT", "false").lower() == "true":
+            self.USE_CONTAINER_SNAPSHOT = True
+
+        self.NAUTICAL_DB_PATH = os.environ.get("NAUTICAL_DB_PATH", "/config")
+        self.NAUTICAL_DB_NAME = os.environ.get("NAUTICAL_DB_NAME", "nautical-db.json")
+
+        self.NAUTICAL_DB_CACHE = False
+        if os.environ.get("NAUTICAL_DB_CACHE", "false").lower() == "true":
+            self.NAUTICAL_DB_CACHE = True
+
+        self.NAUTICAL_DB_BACKEND = os.environ.get("NAUTICAL_DB_BACKEND", "json").lower()
+        if self.NAUTICAL_DB_BACKEND not in ["json", "sqlite"]:
+            self.NAUTICAL_DB_BACKEND = "json"  # Set default
 
         self.USE_DEST_DATE_FOLDER = os.environ.get("USE_DEST_DATE_FOLDER", "")
         self.DEST_DATE_FORMAT = os.environ.get("DEST_DATE_FORMAT", "%Y-%m-%d")
@@ -38,6 +70,14 @@ class NauticalEnv:
         if self.DEST_DATE_PATH_FORMAT not in ["date/container", "container/date"]:
             self.DEST_DATE_PATH_FORMAT = "date/container"  # Set default
 
+        self.SKIP_UNCHANGED_SOURCES = False
+        if os.environ.get("SKIP_UNCHANGED_SOURCES", "false").lower() == "true":
+            self.SKIP_UNCHANGED_SOURCES = True
+
+        self.USE_LINK_DEST = False
+        if os.environ.get("USE_LINK_DEST", "false").lower() == "true":
+            self.USE_LINK_DEST = True
+
         self.USE_CONTAINER_BACKUP_DATE = False
         if os.environ.get("USE_CONTAINER_BACKUP_DATE", "false").lower() == "true":
             self.USE_CONTAINER_BACKUP_DATE = True
@@ -47,11 +87,16 @@ class NauticalEnv:
         self.ADDITIONAL_FOLDERS_WHEN = os.environ.get("ADDITIONAL_FOLDERS_WHEN", "before")
         self.ADDITIONAL_FOLDERS_USE_DEST_DATE_FOLDER = os.environ.get("ADDITIONAL_FOLDERS_USE_DEST_DATE_FOLDER", "")
 
-        self.SECONDARY_DEST_DIRS: List[Path] = []
+        secondary_dest_dirs: List[Path] = []
         for dir in os.environ.get("SECONDARY_DEST_DIRS", "").split(","):
             if not dir or dir.strip() == "":
                 continue
-            self.SECONDARY_DEST_DIRS.append(Path(dir.strip()))
+            secondary_dest_dirs.append(Path(dir.strip()))
+        self.SECONDARY_DEST_DIRS: Tuple[Path, ...] = tuple(secondary_dest_dirs)
+
+        self.SECONDARY_DEST_MODE = os.environ.get("SECONDARY_DEST_MODE", "direct").lower()
+        if self.SECONDARY_DEST_MODE not in ["direct", "fanout", "deferred"]:
+            self.SECONDARY_DEST_MODE = "direct"  # Set default
 
         self._PRE_BACKUP_CURL = os.environ.get("PRE_BACKUP_CURL", "")
         self._POST_BACKUP_CURL = os.environ.get("POST_BACKUP_CURL", "")
@@ -68,26 +113,105 @@ class NauticalEnv:
         if os.environ.get("REPORT_FILE", "True").lower() == "false":
             self.REPORT_FILE = False
 
+        self.REPORT_FILE_BUFFERED = False
+        if os.environ.get("REPORT_FILE_BUFFERED", "false").lower() == "true":
+            self.REPORT_FILE_BUFFERED = True
+
+        self.JSON_LOG_FILE = os.environ.get("JSON_LOG_FILE", "")
+
+        self.PROMETHEUS_METRICS = False
+        if os.environ.get("PROMETHEUS_METRICS", "false").lower() == "true":
+            self.PROMETHEUS_METRICS = True
+
         self.STOP_TIMEOUT = int(os.environ.get("STOP_TIMEOUT", 10))
         self.START_TIMEOUT = int(os.environ.get("START_TIMEOUT", 10))
 
+        self.CONTAINER_WAIT_MODE = os.environ.get("CONTAINER_WAIT_MODE", "poll").lower()
+        if self.CONTAINER_WAIT_MODE not in ["poll", "events"]:
+            self.CONTAINER_WAIT_MODE = "poll"  # Set default
+
         _keep = os.environ.get("NUMBER_OF_BACKUPS_TO_KEEP", "0")
         self.NUMBER_OF_BACKUPS_TO_KEEP = int(_keep) if _keep.isdigit() else 0
 
         _min_keep = os.environ.get("MIN_BACKUPS_TO_KEEP", "0")
         self.MIN_BACKUPS_TO_KEEP = int(_min_keep) if _min_keep.isdigit() else 0
 
+        # Grandfather-father-son tiers (0 = disabled)
+        _keep_daily = os.environ.get("RETENTION_KEEP_DAILY", "0")
+        self.RETENTION_KEEP_DAILY = int(_keep_daily) if _keep_daily.isdigit() else 0
+
+        _keep_weekly = os.environ.get("RETENTION_KEEP_WEEKLY", "0")
+        self.RETENTION_KEEP_WEEKLY = int(_keep_weekly) if _keep_weekly.isdigit() else 0
+
+        _keep_monthly = os.environ.get("RETENTION_KEEP_MONTHLY", "0")
+        self.RETENTION_KEEP_MONTHLY = int(_keep_monthly) if _keep_monthly.isdigit() else 0
+
+        _keep_yearly = os.environ.get("RETENTION_KEEP_YEARLY", "0")
+        self.RETENTION_KEEP_YEARLY = int(_keep_yearly) if _keep_yearly.isdigit() else 0
+
+        # Delete the oldest backups when the destination would have less than this free after the backup (0 = disabled)
+        _min_free_bytes = os.environ.get("RETENTION_MIN_FREE_BYTES", "0")
+        self.RETENTION_MIN_FREE_BYTES = int(_min_free_bytes) if _min_free_bytes.isdigit() else 0
+
+        _min_free_percent = os.environ.get("RETENTION_MIN_FREE_PERCENT", "0")
+        self.RETENTION_MIN_FREE_PERCENT = (
+            int(_min_free_percent) if _min_free_percent.isdigit() and int(_min_free_percent) <= 100 else 0
+        )
+
         self.RETENTION_DRY_RUN = False
         if os.environ.get("RETENTION_DRY_RUN", "false").lower() == "true":
             self.RETENTION_DRY_RUN = True
 
+        self.RETENTION_CATALOG = False
+        if os.environ.get("RETENTION_CATALOG", "false").lower() == "true":
+            self.RETENTION_CATALOG = True
+
+        self.RETENTION_DELETE_MODE = os.environ.get("RETENTION_DELETE_MODE", "sync").lower()
+        if self.RETENTION_DELETE_MODE not in ["sync", "background"]:
+            self.RETENTION_DELETE_MODE = "sync"  # Set default
+
+        _delete_workers = os.environ.get("RETENTION_DELETE_WORKERS", "4")
+        self.RETENTION_DELETE_WORKERS = (
+            int(_delete_workers) if _delete_workers.isdigit() and int(_delete_workers) > 0 else 4
+        )
+
         self.RETENTION_SECONDARY_DESTINATIONS = True
         if os.environ.get("RETENTION_SECONDARY_DESTINATIONS", "true").lower() == "false":
             self.RETENTION_SECONDARY_DESTINATIONS = False
 
+        self.PREFLIGHT_CHECK = os.environ.get("PREFLIGHT_CHECK", "off").lower()
+        if self.PREFLIGHT_CHECK not in ["off", "refuse", "reorder"]:
+            self.PREFLIGHT_CHECK = "off"  # Set default
+
+        self.PREFLIGHT_ESTIMATE = os.environ.get("PREFLIGHT_ESTIMATE", "cached").lower()
+        if self.PREFLIGHT_ESTIMATE not in ["cached", "scan", "rsync"]:
+            self.PREFLIGHT_ESTIMATE = "cached"  # Set default
+
+        self.API_JOB_OVERLAP = os.environ.get("API_JOB_OVERLAP", "reject").lower()
+        if self.API_JOB_OVERLAP not in ["reject", "queue"]:
+            self.API_JOB_OVERLAP = "reject"  # Set default
+
+        _max_groups = os.environ.get("MAX_CONCURRENT_GROUPS", "1")
+        self.MAX_CONCURRENT_GROUPS = int(_max_groups) if _max_groups.isdigit() and int(_max_groups) > 0 else 1
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"NauticalEnv is read-only. Use reload_nautical_env() to change '{name}'")
+        super().__setattr__(name, value)
+
+    def freeze(self) -> "NauticalEnv":
+        """Prevent any further changes. Used for the shared instance from get_nautical_env()"""
+        self._frozen = True
+        return self
+
+    @staticmethod
+    def _split_to_set(raw: str) -> FrozenSet[str]:
+        """Translate a comma separated string into a set of stripped, non-empty values"""
+        return frozenset(value.strip() for value in raw.split(",") if value.strip())
+
     @staticmethod
-    def _populate_override_dirs(env_name: str) -> Dict[str, str]:
-        """Translate the Enviornment variable from single string to Python Dict.
+    def _populate_override_dirs(env_name: str) -> Mapping[str, str]:
+        """Translate the Enviornment variable from single string to a read-only Python Dict.
 
         ```
         input="example1:example1-new-source-data,ctr2:ctr2-new-source"
@@ -100,10 +224,10 @@ class NauticalEnv:
         """
         raw = str(os.environ.get(env_name, ""))
 
-        result = {}
+        result: Dict[str, str] = {}
 
         if not raw:
-            return result
+            return MappingProxyType(result)
 
         for pair in raw.split(","):
             split = pair.split(":")
@@ -114,4 +238,16 @@ class NauticalEnv:
             new_dir = str(split[1])
             result[container_name] = new_dir
 
-        return result
+        return MappingProxyType(result)
+
+
+@lru_cache(maxsize=1)
+def get_nautical_env() -> NauticalEnv:
+    """The process wide configuration. The environment is only parsed the first time this is called"""
+    return NauticalEnv().freeze()
+
+
+def reload_nautical_env() -> NauticalEnv:
+    """Parse the environment again. Used by tests and long running processes"""
+    get_nautical_env.cache_clear()
+    return get_nautical_env()
@@ -0,0 +1,161 @@
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.db import DB
+
+
+class RetentionCatalog:
+    """Persistent index of the child folders of every directory the retention policy walks.
+
+    Each entry is keyed by the directory path and holds its child folders, with the date parsed from the
+    folder name (or None when the name is not a date), plus the directory's mtime when it was listed.
+    Creating, renaming or deleting a child always changes the mtime of its parent. So a single `stat`
+    tells whether the entry is still accurate, and the directory is only listed again after a drift.
+    Folders created or deleted by Nautical itself update the entry in place.
+    """
+
+    DB_KEY = "retention_catalog"
+
+    def __init__(self, db: DB, date_format: str, ignored_names: Iterable[str] = ()):
+        self.db = db
+        self.date_format = date_format
+        self.ignored_names = frozenset(ignored_names)
+        self.scans = 0  # Directories listed because their entry was missing or out of date
+
+        self._lock = threading.RLock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._dirty = False
+        self._in_flight: Dict[str, int] = {}  # Directories with a change being tracked, and how many
+        self._overlapped: Set[str] = set()  # Directories that had more than one tracked change at a time
+
+    def child_dirs(self, parent: Path) -> List[Path]:
+        """Real child folders of parent (no symlinks). Raises OSError if parent cannot be read"""
+        return [parent / name for name in self._get_entry(parent)["dirs"]]
+
+    def dated_child_dirs(self, parent: Path) -> List[Tuple[datetime, Path]]:
+        """Child folders of parent whose name matches the date format, with their parsed date"""
+        return [
+            (datetime.fromisoformat(date), parent / name)
+            for name, date in self._get_entry(parent)["dirs"].items()
+            if date is not None
+        ]
+
+    @contextmanager
+    def tracking(self, base: Path, path: Path) -> Iterator[None]:
+        """Keep the entries between base and path up to date while the block creates or removes path.
+
+        An entry is only updated when it was accurate before the change, otherwise the drift is left for
+        the next listing to pick up.
+        """
+        chain: List[Path] = []
+        for ancestor in [path, *path.parents]:
+            if ancestor == base:
+                break
+            chain.append(ancestor)
+
+        with self._lock:
+            entries = self._load()
+            in_sync = {}
+            for child in chain:
+                key = str(child.parent)
+                if self._in_flight.get(key):
+                    self._overlapped.add(key)
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+
+                entry = entries.get(key)
+                if entry is not None:
+                    in_sync[child] = entry["mtime_ns"] == self._mtime_ns(child.parent)
+
+        # The lock is released while the block runs, so other threads can keep listing and tracking
+        try:
+            yield
+        finally:
+            with self._lock:
+                for child in chain:
+                    key = str(child.parent)
+                    # Another change to the same directory overlapped with this one, so the new mtime may
+                    # include a change that is not in the entry. It is left out of date to be listed again
+                    overlapped = key in self._overlapped
+                    self._in_flight[key] -= 1
+                    if not self._in_flight[key]:
+                        del self._in_flight[key]
+                        self._overlapped.discard(key)
+                    if child in in_sync:
+                        self._apply_change(child, in_sync[child] and not overlapped)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty or self._entries is None:
+                return
+            self.db.put(self.DB_KEY, {"date_format": self.date_format, "entries": self._entries})
+            self._dirty = False
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            stored = self.db.get(self.DB_KEY, {}) or {}
+            if stored.get("date_format") == self.date_format:
+                self._entries = dict(stored.get("entries", {}))
+            else:
+                self._entries = {}  # Folder dates were parsed with another format
+        return self._entries
+
+    def _get_entry(self, parent: Path) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._load()
+            mtime_ns = parent.stat().st_mtime_ns
+            entry = entries.get(str(parent))
+            if entry is not None and entry["mtime_ns"] == mtime_ns:
+                return entry
+
+            # Take the mtime before listing so a change made during the listing is seen as drift next time
+            entry = {"mtime_ns": mtime_ns, "dirs": self._scan(parent)}
+            entries[str(parent)] = entry
+            self._dirty = True
+            self.scans += 1
+            return entry
+
+    def _scan(self, parent: Path) -> Dict[str, Optional[str]]:
+        dirs: Dict[str, Optional[str]] = {}
+        for child in parent.iterdir():
+            if child.name in self.ignored_names or child.is_symlink() or not child.is_dir():
+                continue
+            dirs[child.name] = self._parse_date(child.name)
+        return dirs
+
+    def _parse_date(self, folder_name: str) -> Optional[str]:
+        try:
+            return datetime.strptime(folder_name, self.date_format).isoformat()
+        except ValueError:
+            return None
+
+    def _apply_change(self, child: Path, was_in_sync: bool) -> None:
+        if not was_in_sync:
+            return
+
+        entries = self._load()
+        key = str(child.parent)
+        if key not in entries:
+            return  # Removed since, e.g. its own parent was deleted
+        mtime_ns = self._mtime_ns(child.parent)
+        if mtime_ns is None:
+            entries.pop(key, None)  # The parent itself is gone
+        else:
+            dirs = entries[key]["dirs"]
+            if child.is_dir() and not child.is_symlink():
+                if child.name not in self.ignored_names:
+                    dirs[child.name] = self._parse_date(child.name)
+            else:
+                dirs.pop(child.name, None)
+            entries[key]["mtime_ns"] = mtime_ns
+        self._dirty = True
+
+    @staticmethod
+    def _mtime_ns(path: Path) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
@@ -0,0 +1,61 @@
+import re
+from typing import Dict, Optional
+
+# Lines printed by `rsync --stats`, and the key each value is stored under
+STATS_FIELDS = {
+    "Number of files": "files",
+    "Number of regular files transferred": "files_transferred",
+    "Number of files transferred": "files_transferred",  # rsync < 3.1
+    "Total file size": "total_file_size",
+    "Total transferred file size": "transferred_file_size",
+    "Literal data": "literal_data",
+    "Matched data": "matched_data",
+    "Total bytes sent": "bytes_sent",
+    "Total bytes received": "bytes_received",
+}
+
+# Suffixes used when rsync runs with --human-readable
+_UNITS = {"": 1, "K": 1000, "M": 1000**2, "G": 1000**3, "T": 1000**4, "P": 1000**5}
+
+_STATS_LINE = re.compile(r"^(?P<label>[A-Za-z ]+?):\s+(?P<value>[\d.,]+)(?P<unit>[KMGTP]?)\b")
+
+
+def _parse_number(value: str, unit: str) -> Optional[int]:
+    try:
+        return int(float(value.replace(",", "")) * _UNITS[unit])
+    except ValueError:
+        return None
+
+
+def parse_rsync_stats(output: str) -> Dict[str, int]:
+    """Return the values found in the output of `rsync --stats`. Ex: {"files_transferred": 3, "literal_data": 1024}"""
+    stats: Dict[str, int] = {}
+    for line in output.splitlines():
+        match = _STATS_LINE.match(line.strip())
+        if not match or match.group("label") not in STATS_FIELDS:
+            continue
+        number = _parse_number(match.group("value"), match.group("unit"))
+        if number is not None:
+            stats[STATS_FIELDS[match.group("label")]] = number
+    return stats
+
+
+def strip_quiet_flag(rsync_args: str) -> str:
+    """Remove -q/--quiet from rsync arguments, since it also hides the --stats summary. Ex: "-ahq" -> "-ah" """
+    rsync_args = re.sub(r"(?<!\S)--quiet(?!\S)", "", rsync_args)
+
+    def _strip(match: re.Match) -> str:
+        flags = match.group(0).replace("q", "")
+        return "" if flags == "-" else flags
+
+    return re.sub(r"(?<!\S)-[A-Za-z]+(?!\S)", _strip, rsync_args)
+
+
+def strip_rsync_stats(output: str) -> str:
+    """Return the output of `rsync --stats` without the statistics, which start at "Number of files:" """
+    lines = output.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith("Number of files:"):
+            lines = lines[:i]
+            break
+    return "\n".join(lines).strip()
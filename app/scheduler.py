@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import signal
+import threading
+from datetime import datetime
+from typing import Optional
+
+import docker
+
+from app.api.utils import next_cron_time
+from app.backup import NauticalBackup
+from app.logger import Logger, LogType
+
+
+class NauticalScheduler:
+    """Runs backups on the CRON_SCHEDULE from a single long-running process (SCHEDULER_MODE=daemon).
+
+    The Docker client and NauticalBackup are created once and reused for every run, instead of cron
+    starting a fresh interpreter (imports, Docker connection, DB and Logger) each time.
+    """
+
+    # Never sleep longer than this, so clock changes (NTP, suspend) are noticed
+    MAX_SLEEP_SECONDS = 60
+
+    def __init__(self, docker_client: docker.DockerClient):
+        self.docker = docker_client
+        self.logger = Logger()
+        self.nautical = NauticalBackup(docker_client)
+        self._stop_event = threading.Event()
+
+    def log_this(self, log_message, log_priority="INFO", log_type=LogType.DEFAULT) -> None:
+        """Wrapper for log this"""
+        return self.logger.log_this(log_message, log_priority, log_type)
+
+    def stop(self) -> None:
+        """Exit once the current backup (if any) has completed"""
+        self._stop_event.set()
+
+    def run_forever(self) -> None:
+        while not self._stop_event.is_set():
+            # Calculated after every run, so runs missed while a long backup was running are skipped
+            next_run = next_cron_time()
+            if next_run is None:
+                self.log_this("CRON_SCHEDULE_ENABLED=false. The scheduler has nothing to do", "INFO", LogType.INIT)
+                return
+
+            self.log_this(f"Next backup scheduled for {next_run.strftime('%m/%d/%y %H:%M')}", "DEBUG")
+            if not self.wait_until(next_run):
+                return
+
+            self.run_backup()
+
+    def wait_until(self, when: datetime) -> bool:
+        """Sleep until `when`. Returns False if the scheduler was stopped in the meantime"""
+        while True:
+            remaining = (when - datetime.now(when.tzinfo)).total_seconds()
+            if remaining <= 0:
+                return True
+            if self._stop_event.wait(min(remaining, self.MAX_SLEEP_SECONDS)):
+                return False
+
+    def run_backup(self) -> None:
+        try:
+            self.nautical.backup()
+        except Exception as e:
+            # Keep the scheduler alive for the next run
+            self.log_this(f"Backup failed: {e}", "ERROR")
+
+
+if __name__ == "__main__":
+    try:
+        docker_client = docker.from_env()
+        docker_client.ping()  # Test connection to Docker
+    except Exception as e:
+        print(f"Error connecting to Docker. Please either mount the Docker socket or set DOCKER_HOST.")
+        exit(1)
+
+    scheduler = NauticalScheduler(docker_client)
+    # Let a running backup finish (and restart its containers) before exiting
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    scheduler.run_forever()
@@ -0,0 +1,11 @@
+import pytest
+
+from app.nautical_env import get_nautical_env
+
+
+@pytest.fixture(autouse=True)
+def fresh_nautical_env():
+    """The environment is parsed once per process, so every test starts (and ends) without a cached copy"""
+    get_nautical_env.cache_clear()
+    yield
+    get_nautical_env.cache_clear()
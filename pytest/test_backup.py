@@ -0,0 +1,1392 @@
+import json
+import os
+import subprocess
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytest
+from docker.errors import APIError
+from mock import MagicMock, call, patch
+
+from app.backup import NauticalBackup
+from app.container_snapshot import refresh_container_states
+from app.events import EventBus
+from app.logger import LogType, ReportFileWriter
+from app.metrics import MetricsRegistry
+from app.retention_catalog import RetentionCatalog
+
+
+class FakeContainer:
+    """Minimal stand-in for docker.models.containers.Container that records lifecycle calls."""
+
+    def __init__(
+        self,
+        name: str,
+        id: str,
+        labels: Optional[Dict[str, str]] = None,
+        status: str = "running",
+        calls: Optional[List[str]] = None,
+        reload_statuses: Optional[List[str]] = None,
+    ):
+        self.name = name
+        self.id = id
+        self.labels = labels or {}
+        self.status = status
+        self.image = "nginx:latest"
+        self.calls = calls if calls is not None else []
+        self.reload_calls = 0
+        self.reload_statuses = reload_statuses or []  # Statuses reported by successive reloads
+
+    def reload(self):
+        self.reload_calls += 1
+        if self.reload_statuses:
+            self.status = self.reload_statuses.pop(0)
+
+    def stop(self, timeout=10):
+        self.calls.append(f"stop:{self.name}")
+        self.status = "exited"
+
+    def start(self):
+        self.calls.append(f"start:{self.name}")
+        self.status = "running"
+
+    def exec_run(self, command):
+        self.calls.append(f"exec:{self.name}")
+
+
+@pytest.fixture
+def nautical_env(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    for folder in ["source", "destination", "config"]:
+        (tmp_path / folder).mkdir()
+
+    monkeypatch.setenv("SOURCE_LOCATION", str(tmp_path / "source"))
+    monkeypatch.setenv("DEST_LOCATION", str(tmp_path / "destination"))
+    monkeypatch.setenv("NAUTICAL_DB_PATH", str(tmp_path / "config"))
+    monkeypatch.setenv("REPORT_FILE", "false")
+    monkeypatch.setenv("SELF_CONTAINER_ID", "nautical-self")
+    return tmp_path
+
+
+def create_source(nautical_env: Path, *names: str) -> None:
+    for name in names:
+        (nautical_env / "source" / name).mkdir(parents=True, exist_ok=True)
+        (nautical_env / "source" / name / "data.txt").write_text(name)
+
+
+def create_nautical(containers: List[FakeContainer]) -> NauticalBackup:
+    docker_client = MagicMock()
+    docker_client.containers.list.return_value = containers
+    return NauticalBackup(docker_client)
+
+
+def rsync_ok(*args, **kwargs):
+    return subprocess.CompletedProcess(args=args, returncode=0)
+
+
+class TestConcurrentGroups:
+    def test_partition_keeps_groups_sharing_a_container_together(self, nautical_env: Path):
+        shared = FakeContainer("shared", "1" * 64)
+        other = FakeContainer("other", "2" * 64)
+        lonely = FakeContainer("lonely", "3" * 64)
+
+        nb = create_nautical([])
+        batches = nb._partition_independent_groups({"a": [shared], "b": [other], "c": [other, shared], "d": [lonely]})
+
+        assert [[group for group, _ in batch] for batch in batches] == [["a", "b", "c"], ["d"]]
+
+    def test_independent_groups_run_in_parallel(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("MAX_CONCURRENT_GROUPS", "2")
+        create_source(nautical_env, "app1", "app2")
+
+        calls: List[str] = []
+        app1 = FakeContainer("app1", "a" * 64, calls=calls)
+        app2 = FakeContainer("app2", "b" * 64, calls=calls)
+        nb = create_nautical([app1, app2])
+
+        # Both rsyncs must be in flight at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+
+        def rsync_both_at_once(*args, **kwargs):
+            barrier.wait()
+            return rsync_ok()
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_both_at_once):
+            nb.backup()
+
+        assert nb.containers_completed == {"app1", "app2"}
+        assert nb.containers_failed == set()
+        assert nb.db.get("containers_completed") == 2
+
+        # Each group still stops before it copies and starts after
+        for name in ["app1", "app2"]:
+            assert calls.index(f"stop:{name}") < calls.index(f"start:{name}")
+
+    def test_single_worker_runs_groups_in_order(self, nautical_env: Path):
+        create_source(nautical_env, "app1", "app2")
+
+        calls: List[str] = []
+        app1 = FakeContainer("app1", "a" * 64, calls=calls)
+        app2 = FakeContainer("app2", "b" * 64, calls=calls)
+        nb = create_nautical([app1, app2])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        assert calls == ["stop:app1", "start:app1", "stop:app2", "start:app2"]
+        assert nb.containers_completed == {"app1", "app2"}
+
+
+class TestPipelinedGroups:
+    def _create_group(self, nautical_env: Path, pipeline: str, calls: List[str]) -> List[FakeContainer]:
+        create_source(nautical_env, "web", "db")
+        web_labels = {
+            "nautical-backup.group": "stack",
+            "nautical-backup.group.stack.priority": "200",
+            "nautical-backup.group.stack.pipeline": pipeline,
+        }
+        db_labels = {"nautical-backup.group": "stack", "nautical-backup.group.stack.priority": "100"}
+        return [
+            FakeContainer("db", "d" * 64, labels=db_labels, calls=calls),
+            FakeContainer("web", "w" * 64, labels=web_labels, calls=calls),
+        ]
+
+    def test_pipelined_group_restarts_each_container_after_its_own_copy(self, nautical_env: Path):
+        calls: List[str] = []
+        nb = create_nautical(self._create_group(nautical_env, "true", calls))
+
+        def rsync(*args, **kwargs):
+            calls.append("rsync:" + Path(str(args[0]).split()[-1]).name)
+            return rsync_ok()
+
+        with patch("app.backup.subprocess.run", side_effect=rsync):
+            nb.backup()
+
+        # Highest priority first, and each container restarts before the next one is copied
+        assert calls == ["stop:web", "stop:db", "rsync:web", "start:web", "rsync:db", "start:db"]
+        assert nb.containers_completed == {"web", "db"}
+
+    def test_group_waits_for_every_copy_by_default(self, nautical_env: Path):
+        calls: List[str] = []
+        nb = create_nautical(self._create_group(nautical_env, "", calls))
+
+        def rsync(*args, **kwargs):
+            calls.append("rsync:" + Path(str(args[0]).split()[-1]).name)
+            return rsync_ok()
+
+        with patch("app.backup.subprocess.run", side_effect=rsync):
+            nb.backup()
+
+        assert calls == ["stop:web", "stop:db", "rsync:web", "rsync:db", "start:web", "start:db"]
+
+
+class TestContainerWaitEvents:
+    def test_transitional_state_waits_on_events_instead_of_sleeping(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setenv("CONTAINER_WAIT_MODE", "events")
+        c = FakeContainer("app", "a" * 64, reload_statuses=["restarting", "restarting", "running"])
+        nb = create_nautical([c])
+        nb.docker.events.return_value = (event for event in [{"Action": "start", "id": c.id}])
+
+        with patch("app.backup.time.sleep", side_effect=AssertionError("should not sleep")):
+            assert nb._start_container(c) == True
+
+        assert c.reload_calls == 3
+        filters = nb.docker.events.call_args.kwargs["filters"]
+        assert filters["container"] == c.id
+
+    def test_wait_gives_up_when_state_never_settles(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("CONTAINER_WAIT_MODE", "events")
+        c = FakeContainer("app", "a" * 64, status="restarting")
+        nb = create_nautical([c])
+        nb.docker.events.return_value = (event for event in [])
+
+        with patch("app.backup.time.sleep", side_effect=AssertionError("should not sleep")):
+            assert nb._start_container(c) == False
+
+        assert nb.docker.events.call_count == 1
+
+    def test_poll_mode_is_the_default(self, nautical_env: Path):
+        c = FakeContainer("app", "a" * 64, reload_statuses=["restarting", "running"])
+        nb = create_nautical([c])
+
+        with patch("app.backup.time.sleep") as sleep:
+            assert nb._start_container(c) == True
+
+        sleep.assert_called_once_with(2)
+        nb.docker.events.assert_not_called()
+
+
+def container_summary(name: str, id: str, labels: Optional[Dict[str, str]] = None, state: str = "running") -> dict:
+    """A `/containers/json` entry as returned by the Docker API"""
+    return {
+        "Id": id,
+        "Names": [f"/{name}"],
+        "Image": "nginx:latest",
+        "ImageID": "sha256:" + "f" * 64,
+        "Labels": labels or {},
+        "State": state,
+    }
+
+
+class TestContainerSnapshot:
+    def test_group_containers_uses_one_bulk_call(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_CONTAINER_SNAPSHOT", "true")
+        nb = create_nautical([])
+        nb.docker.api.containers.return_value = [
+            container_summary("web", "w" * 64, {"nautical-backup.group": "stack", "other.label": "x"}),
+            container_summary("skipped", "s" * 64, {"nautical-backup.enable": "false"}),
+            container_summary("nautical", "n" * 64, {"org.opencontainers.image.title": "nautical-backup"}),
+        ]
+
+        groups = nb.group_containers()
+
+        nb.docker.containers.list.assert_not_called()
+        assert list(groups.keys()) == ["stack"]
+        web = groups["stack"][0]
+        assert web.name == "web"
+        assert web.status == "running"
+        assert nb.get_label(web, "group") == "stack"
+        assert nb.get_label(web, "missing", "default") == "default"
+        assert nb.snapshot is not None and nb.snapshot.labels[web.id] == {"group": "stack"}
+        assert nb.container_skip_reasons == {"skipped": "enable_label_false", "nautical": "nautical_backup_image"}
+
+    def test_refresh_only_updates_changed_containers(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_CONTAINER_SNAPSHOT", "true")
+        nb = create_nautical([])
+        nb.docker.api.containers.return_value = [container_summary("web", "w" * 64), container_summary("db", "d" * 64)]
+        web, db = nb.group_containers().values()
+        web, db = web[0], db[0]
+
+        nb.docker.api.containers.return_value = [
+            container_summary("web", "w" * 64, state="exited"),
+            container_summary("db", "d" * 64, state="running"),
+        ]
+        changed = nb.snapshot.refresh([web, db])  # type: ignore
+
+        assert changed == [web]
+        assert web.status == "exited"
+        assert db.status == "running"
+        assert nb.docker.api.containers.call_args.kwargs["filters"] == {"id": [web.id, db.id]}
+
+
+class TestRsyncExecution:
+    def test_argv_mode_runs_rsync_without_a_shell(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RSYNC_EXEC_MODE", "argv")
+        monkeypatch.setenv("RSYNC_CUSTOM_ARGS", "--exclude='cache dir'")
+        create_source(nautical_env, "app")
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        args = run.call_args.args[0]
+        assert args[:3] == ["/usr/bin/rsync", "-raq", "--exclude=cache dir"]
+        assert args[-2:] == [f"{nautical_env}/source/app/", f"{nautical_env}/destination/app/"]
+        assert "shell" not in run.call_args.kwargs
+
+    def test_destinations_are_copied_concurrently(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        secondary1, secondary2 = nautical_env / "secondary1", nautical_env / "secondary2"
+        monkeypatch.setenv("SECONDARY_DEST_DIRS", f"{secondary1},{secondary2}")
+        monkeypatch.setenv("MAX_CONCURRENT_DESTINATIONS", "3")
+        create_source(nautical_env, "app")
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+
+        # All three copies must be in flight at the same time to pass the barrier
+        barrier = threading.Barrier(3, timeout=5)
+
+        def rsync(command, **kwargs):
+            barrier.wait()
+            exit_code = 23 if str(secondary2) in command else 0
+            return subprocess.CompletedProcess(args=command, returncode=exit_code)
+
+        with patch("app.backup.subprocess.run", side_effect=rsync):
+            nb.backup()
+
+        results = {str(r.dest_dir): r.returncode for r in nb.get_rsync_results("app")}
+        assert results == {
+            f"{nautical_env}/destination/app": 0,
+            f"{secondary1}/app": 0,
+            f"{secondary2}/app": 23,
+        }
+        assert nb.container_failure_reasons == {"app": "rsync_failed"}
+
+
+class TestExecCommands:
+    def test_exec_variables_are_passed_without_touching_os_environ(self, nautical_env: Path):
+        create_source(nautical_env, "app")
+        nb = create_nautical([FakeContainer("app", "a" * 64, labels={"nautical-backup.exec.before": "echo hi"})])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        exec_calls = [c for c in run.call_args_list if c.args[0] == "echo hi"]
+        assert len(exec_calls) == 1
+        assert exec_calls[0].kwargs["env"]["NB_EXEC_CONTAINER_NAME"] == "app"
+        assert "NB_EXEC_CONTAINER_NAME" not in os.environ
+
+
+class TestSecondaryDestinationModes:
+    def test_fanout_fills_secondaries_from_primary_after_restart(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        secondary = nautical_env / "secondary"
+        monkeypatch.setenv("SECONDARY_DEST_DIRS", str(secondary))
+        monkeypatch.setenv("SECONDARY_DEST_MODE", "fanout")
+        create_source(nautical_env, "app")
+
+        calls: List[str] = []
+        nb = create_nautical([FakeContainer("app", "a" * 64, calls=calls)])
+
+        def rsync(command, **kwargs):
+            src, dest = command.split()[-2:]
+            calls.append(f"rsync:{src}->{dest}")
+            return rsync_ok()
+
+        with patch("app.backup.subprocess.run", side_effect=rsync):
+            nb.backup()
+
+        primary = f"{nautical_env}/destination/app/"
+        assert calls == [
+            "stop:app",
+            f"rsync:{nautical_env}/source/app/->{primary}",
+            "start:app",
+            f"rsync:{primary}->{secondary}/app/",
+        ]
+        assert nb.containers_completed == {"app"}
+
+    def test_fanout_starts_the_whole_group_before_filling_secondaries(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        secondary = nautical_env / "secondary"
+        monkeypatch.setenv("SECONDARY_DEST_DIRS", str(secondary))
+        monkeypatch.setenv("SECONDARY_DEST_MODE", "fanout")
+        create_source(nautical_env, "web", "db")
+
+        calls: List[str] = []
+        labels = {"nautical-backup.group": "stack"}
+        nb = create_nautical(
+            [
+                FakeContainer("web", "w" * 64, labels=labels, calls=calls),
+                FakeContainer("db", "d" * 64, labels=labels, calls=calls),
+            ]
+        )
+
+        def rsync(command, **kwargs):
+            dest = command.split()[-1]
+            if dest.startswith(str(secondary)):
+                calls.append(f"secondary:{Path(dest).name}")
+            return rsync_ok()
+
+        with patch("app.backup.subprocess.run", side_effect=rsync):
+            nb.backup()
+
+        last_start = max(calls.index("start:web"), calls.index("start:db"))
+        assert sorted(calls[last_start + 1 :]) == ["secondary:db", "secondary:web"]
+        assert nb.containers_completed == {"web", "db"}
+
+    def test_fanout_copies_additional_folders_from_the_primary(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        secondary = nautical_env / "secondary"
+        monkeypatch.setenv("SECONDARY_DEST_DIRS", str(secondary))
+        monkeypatch.setenv("SECONDARY_DEST_MODE", "fanout")
+        create_source(nautical_env, "app", "extra")
+
+        nb = create_nautical([FakeContainer("app", "a" * 64, labels={"nautical-backup.additional-folders": "extra"})])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        copies = [tuple(call.args[0].split()[-2:]) for call in run.call_args_list]
+        assert copies == [
+            (f"{nautical_env}/source/app/", f"{nautical_env}/destination/app/"),
+            (f"{nautical_env}/source/extra/", f"{nautical_env}/destination/extra/"),
+            (f"{nautical_env}/destination/app/", f"{secondary}/app/"),
+            (f"{nautical_env}/destination/extra/", f"{secondary}/extra/"),
+        ]
+
+    def test_deferred_copies_run_after_all_containers_restart(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        secondary = nautical_env / "secondary"
+        monkeypatch.setenv("SECONDARY_DEST_DIRS", str(secondary))
+        monkeypatch.setenv("SECONDARY_DEST_MODE", "deferred")
+        create_source(nautical_env, "app1", "app2")
+
+        calls: List[str] = []
+        nb = create_nautical(
+            [FakeContainer("app1", "a" * 64, calls=calls), FakeContainer("app2", "b" * 64, calls=calls)]
+        )
+        app2_released = threading.Event()
+
+        def rsync(command, **kwargs):
+            src, dest = command.split()[-2:]
+            if dest.startswith(str(secondary)):
+                # Hold the background copy of app1 until app2 has restarted
+                if "app1" in dest:
+                    assert app2_released.wait(timeout=5)
+                calls.append(f"secondary:{Path(dest).name}")
+                return subprocess.CompletedProcess(args=command, returncode=0 if "app1" in dest else 12)
+            return rsync_ok()
+
+        original_start = FakeContainer.start
+
+        def start(self):
+            original_start(self)
+            if self.name == "app2":
+                app2_released.set()
+
+        with patch("app.backup.subprocess.run", side_effect=rsync), patch.object(FakeContainer, "start", start):
+            nb.backup()
+
+        assert calls.index("start:app2") < calls.index("secondary:app1")
+        assert nb.containers_completed == {"app1"}
+        assert nb.container_failure_reasons == {"app2": "rsync_failed"}
+        assert nb.db.get("containers_completed") == 1
+
+
+class TestLinkDest:
+    @pytest.mark.parametrize(
+        "path_format, previous, future",
+        [
+            ("container/date", "app/2000-01-01", "app/2999-01-01"),
+            ("date/container", "2000-01-01/app", "2999-01-01/app"),
+        ],
+    )
+    def test_hard_links_against_previous_dated_folder(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch, path_format: str, previous: str, future: str
+    ):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", path_format)
+        monkeypatch.setenv("USE_LINK_DEST", "true")
+        create_source(nautical_env, "app")
+        for folder in [previous, "app/1999-01-01", "1999-01-01/app", future, "app/not-a-date"]:
+            (nautical_env / "destination" / folder).mkdir(parents=True)
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        assert f"--link-dest={nautical_env}/destination/{previous} " in run.call_args.args[0]
+
+    def test_previous_dated_folder_is_read_from_the_retention_catalog(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        monkeypatch.setenv("USE_LINK_DEST", "true")
+        monkeypatch.setenv("RETENTION_CATALOG", "true")
+        create_source(nautical_env, "app")
+        (nautical_env / "destination" / "app" / "2000-01-01").mkdir(parents=True)
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        assert f"--link-dest={nautical_env}/destination/app/2000-01-01 " in run.call_args.args[0]
+        assert nb.retention_catalog.scans == 1
+
+    def test_first_backup_has_no_link_dest(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("USE_LINK_DEST", "true")
+        create_source(nautical_env, "app")
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        assert "--link-dest" not in run.call_args.args[0]
+
+
+class TestRunHistory:
+    def test_backup_records_run_and_container_outcomes(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("NAUTICAL_DB_BACKEND", "sqlite")
+        create_source(nautical_env, "app1")
+
+        app1 = FakeContainer("app1", "a" * 64)
+        missing = FakeContainer("missing", "b" * 64)
+        nb = create_nautical([app1, missing])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        runs = nb.db.get_runs()
+        assert len(runs) == 1
+        assert runs[0]["status"] == "warning"
+        assert runs[0]["containers_completed"] == 1
+        assert runs[0]["containers_skipped"] == 1
+
+        completed = nb.db.get_container_history("app1")[0]
+        assert completed["status"] == "completed"
+        assert completed["duration_seconds"] >= 0
+
+        skipped = nb.db.get_container_history("missing")[0]
+        assert skipped["status"] == "skipped"
+        assert skipped["reason"] == "source_directory_missing"
+
+
+class TestJsonEvents:
+    def read_events(self, path: Path) -> List[dict]:
+        return [json.loads(line) for line in path.read_text().splitlines()]
+
+    def test_events_for_every_phase(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        events_file = nautical_env / "logs" / "events.jsonl"
+        monkeypatch.setenv("JSON_LOG_FILE", str(events_file))
+        create_source(nautical_env, "web", "db")
+
+        labels = {"nautical-backup.group": "stack", "nautical-backup.lifecycle.before": "echo hi"}
+        web = FakeContainer("web", "a" * 64, labels=labels)
+        db = FakeContainer("db", "b" * 64)
+        nb = create_nautical([web, db])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+        ReportFileWriter.close_all()
+
+        events = self.read_events(events_file)
+        web_phases = [e["phase"] for e in events if e["phase"] != "progress" and e["container_name"] == "web"]
+        assert web_phases == ["hook", "stop", "rsync", "start", "downtime"]
+
+        progress = [(e["event"], e["state"]) for e in events if e["phase"] == "progress"]
+        assert progress[0] == ("backup", "started")
+        assert ("container", "done") in progress
+        assert progress[-1] == ("backup", "finished")
+
+        rsync = next(e for e in events if e["phase"] == "rsync" and e["container_name"] == "web")
+        assert rsync["group"] == "stack"
+        assert rsync["container_id"] == "a" * 64
+        assert rsync["exit_code"] == 0
+        assert rsync["duration_ms"] >= 0
+        assert "bytes" in rsync
+
+        db_stop = next(e for e in events if e["phase"] == "stop" and e["container_name"] == "db")
+        assert db_stop["group"] is None
+        assert db_stop["success"] is True
+
+        retention = [e for e in events if e["phase"] == "retention"]
+        assert [e["dest_dir"] for e in retention] == [str(nautical_env / "destination")]
+
+    def test_no_events_without_json_log_file(self, nautical_env: Path):
+        create_source(nautical_env, "app1")
+        nb = create_nautical([FakeContainer("app1", "a" * 64)])
+
+        with patch.object(nb.logger, "log_event") as log_event, patch(
+            "app.backup.subprocess.run", side_effect=rsync_ok
+        ):
+            nb.backup()
+
+        log_event.assert_not_called()
+
+
+class TestProgressEvents:
+    def test_container_transitions_are_published(self, nautical_env: Path):
+        create_source(nautical_env, "app1")
+        app1 = FakeContainer("app1", "a" * 64)
+        missing = FakeContainer("missing", "b" * 64)
+        nb = create_nautical([app1, missing])
+
+        events: List[dict] = []
+        nb.event_bus = EventBus()
+        nb.event_bus.subscribe(events.append)
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        states = [(e.get("container_name"), e["state"]) for e in events]
+        assert states[0] == (None, "started")
+        assert [s for name, s in states if name == "app1"] == ["stopping", "copying", "starting", "done"]
+        assert [s for name, s in states if name == "missing"] == ["starting", "skipped"]
+        assert events[-1]["state"] == "finished"
+        assert events[-1]["completed"] == 1
+        assert events[-1]["skipped"] == 1
+
+    def test_failed_copy_is_published(self, nautical_env: Path):
+        create_source(nautical_env, "app1")
+        nb = create_nautical([FakeContainer("app1", "a" * 64)])
+
+        events: List[dict] = []
+        nb.event_bus = EventBus()
+        nb.event_bus.subscribe(events.append)
+
+        with patch("app.backup.subprocess.run", return_value=subprocess.CompletedProcess(args=[], returncode=1)):
+            nb.backup()
+
+        final = [e for e in events if e.get("container_name") == "app1"][-1]
+        assert final["state"] == "failed"
+        assert final["reason"] == "rsync_failed"
+
+
+class TestPrometheusMetrics:
+    def test_backup_records_metrics(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("PROMETHEUS_METRICS", "true")
+        create_source(nautical_env, "app1")
+        nb = create_nautical([FakeContainer("app1", "a" * 64), FakeContainer("missing", "b" * 64)])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+            nb.backup()
+
+        text = MetricsRegistry.load().render()
+        assert 'nautical_backup_runs_total{status="warning"} 2' in text
+        assert "nautical_backup_run_duration_seconds_count 2" in text
+        assert 'nautical_container_downtime_seconds_count{container="app1"} 2' in text
+        assert 'nautical_container_stop_seconds_count{container="app1"} 2' in text
+        assert 'nautical_rsync_duration_seconds_count{container="app1"} 2' in text
+        assert "nautical_containers_completed_total 2" in text
+        assert 'nautical_containers_skipped_total{reason="source_directory_missing"} 2' in text
+        assert "nautical_retention_deletions_total 0" in text
+
+    def test_disabled_by_default(self, nautical_env: Path):
+        create_source(nautical_env, "app1")
+        nb = create_nautical([FakeContainer("app1", "a" * 64)])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        assert nb.metrics is None
+        assert not (nautical_env / "config" / "nautical-metrics.json").exists()
+
+
+class TestSkipUnchangedSources:
+    def run_backup(self, containers: List[FakeContainer]) -> NauticalBackup:
+        nb = create_nautical(containers)
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+        return nb
+
+    def test_unchanged_source_is_not_stopped(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SKIP_UNCHANGED_SOURCES", "true")
+        create_source(nautical_env, "app1")
+
+        calls: List[str] = []
+        first = self.run_backup([FakeContainer("app1", "a" * 64, calls=calls)])
+        assert first.containers_completed == {"app1"}
+
+        calls.clear()
+        second = self.run_backup([FakeContainer("app1", "a" * 64, calls=calls)])
+        assert calls == []
+        assert second.containers_skipped == {"app1"}
+        assert second.container_skip_reasons == {"app1": "source_unchanged"}
+
+    def test_changed_source_is_backed_up(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SKIP_UNCHANGED_SOURCES", "true")
+        create_source(nautical_env, "app1")
+        self.run_backup([FakeContainer("app1", "a" * 64)])
+
+        (nautical_env / "source" / "app1" / "new.txt").write_text("changed")
+        calls: List[str] = []
+        nb = self.run_backup([FakeContainer("app1", "a" * 64, calls=calls)])
+
+        assert calls == ["stop:app1", "start:app1"]
+        assert nb.containers_completed == {"app1"}
+
+    def test_missing_destination_is_backed_up(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SKIP_UNCHANGED_SOURCES", "true")
+        create_source(nautical_env, "app1")
+        self.run_backup([FakeContainer("app1", "a" * 64)])
+
+        (nautical_env / "destination" / "app1").rename(nautical_env / "destination" / "moved")
+        nb = self.run_backup([FakeContainer("app1", "a" * 64)])
+
+        assert nb.containers_completed == {"app1"}
+
+    def test_group_is_backed_up_when_any_member_changed(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SKIP_UNCHANGED_SOURCES", "true")
+        create_source(nautical_env, "web", "db")
+        labels = {"nautical-backup.group": "stack"}
+
+        def containers(calls: List[str]) -> List[FakeContainer]:
+            return [
+                FakeContainer("web", "a" * 64, labels=labels, calls=calls),
+                FakeContainer("db", "b" * 64, labels=labels, calls=calls),
+            ]
+
+        self.run_backup(containers([]))
+        (nautical_env / "source" / "db" / "data.txt").write_text("changed")
+
+        calls: List[str] = []
+        nb = self.run_backup(containers(calls))
+        assert nb.containers_completed == {"web", "db"}
+        assert "stop:web" in calls
+
+    def test_label_disables_detection(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SKIP_UNCHANGED_SOURCES", "true")
+        create_source(nautical_env, "app1")
+        labels = {"nautical-backup.skip-unchanged": "false"}
+        self.run_backup([FakeContainer("app1", "a" * 64, labels=labels)])
+
+        nb = self.run_backup([FakeContainer("app1", "a" * 64, labels=labels)])
+        assert nb.containers_completed == {"app1"}
+
+    def test_disabled_by_default(self, nautical_env: Path):
+        create_source(nautical_env, "app1")
+        self.run_backup([FakeContainer("app1", "a" * 64)])
+
+        nb = self.run_backup([FakeContainer("app1", "a" * 64)])
+        assert nb.containers_completed == {"app1"}
+
+
+class TestBackgroundRetentionDeletes:
+    @pytest.fixture(autouse=True)
+    def retention_env(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("NUMBER_OF_BACKUPS_TO_KEEP", "1")
+        monkeypatch.setenv("RETENTION_DELETE_MODE", "background")
+        monkeypatch.setenv("RETENTION_DELETE_WORKERS", "2")
+
+    def test_expired_folders_are_moved_then_deleted(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2000-01-02", "app/2999-01-01", "other/2000-01-01", "other/2999-01-01"]:
+            (destination / folder).mkdir(parents=True)
+            (destination / folder / "data.txt").write_text(folder)
+
+        nb = create_nautical([])
+        assert nb._apply_retention_policy(destination) == 3
+        assert not (destination / "app" / "2000-01-01").exists()
+        assert (destination / "app" / "2999-01-01").exists()
+
+        nb.wait_for_retention_deletes()
+        assert list((destination / NauticalBackup.TRASH_DIR_NAME).iterdir()) == []
+        assert sorted(p.name for p in destination.iterdir()) == [NauticalBackup.TRASH_DIR_NAME, "app", "other"]
+
+    def test_date_container_layout_ignores_trash(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "date/container")
+        destination = nautical_env / "destination"
+        for folder in ["2000-01-01/app", "2999-01-01/app"]:
+            (destination / folder).mkdir(parents=True)
+
+        nb = create_nautical([])
+        assert nb._apply_retention_policy(destination) == 1
+        assert nb._apply_retention_policy(destination) == 0  # The trash folder is never a retention candidate
+        nb.wait_for_retention_deletes()
+        assert sorted(p.name for p in destination.iterdir()) == [NauticalBackup.TRASH_DIR_NAME, "2999-01-01"]
+
+    def test_leftover_trash_is_emptied(self, nautical_env: Path):
+        destination = nautical_env / "destination"
+        leftover = destination / NauticalBackup.TRASH_DIR_NAME / "20000101000000-app__2000-01-01"
+        leftover.mkdir(parents=True)
+        (leftover / "data.txt").write_text("old")
+        (destination / "app" / "2999-01-01").mkdir(parents=True)
+
+        nb = create_nautical([])
+        nb._apply_retention_policy(destination)
+        nb.wait_for_retention_deletes()
+
+        assert not leftover.exists()
+
+    def test_delete_failure_is_recorded(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2999-01-01"]:
+            (destination / folder).mkdir(parents=True)
+
+        nb = create_nautical([])
+        with patch("app.backup.shutil.rmtree", side_effect=OSError("busy")):
+            assert nb._apply_retention_policy(destination) == 1
+            nb.wait_for_retention_deletes()
+
+        assert any("failed to remove" in error and "busy" in error for error in nb.error_messages)
+
+    def test_late_delete_failure_is_reported_by_the_next_run(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2999-01-01"]:
+            (destination / folder).mkdir(parents=True)
+
+        nb = create_nautical([])
+        nb._outcome_stored = True  # The run was already stored when the delete fails
+        with patch("app.backup.shutil.rmtree", side_effect=OSError("busy")):
+            assert nb._apply_retention_policy(destination) == 1
+            nb.wait_for_retention_deletes()
+        assert nb.error_messages == []
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        assert any("failed to remove" in error and "busy" in error for error in nb.error_messages)
+        assert nb.db.get("errors") == len(nb.error_messages)
+        assert nb.db.get(NauticalBackup.PENDING_DELETE_ERRORS_KEY) is None
+
+    def test_rename_failure_falls_back_to_a_direct_delete(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2999-01-01"]:
+            (destination / folder).mkdir(parents=True)
+
+        nb = create_nautical([])
+        with patch("app.backup.os.rename", side_effect=OSError("cross-device link")):
+            assert nb._apply_retention_policy(destination) == 1
+
+        assert not (destination / "app" / "2000-01-01").exists()
+        assert nb._trash_deletes == []
+        assert nb.error_messages == []
+
+    def test_dry_run_does_not_move(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RETENTION_DRY_RUN", "true")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2999-01-01"]:
+            (destination / folder).mkdir(parents=True)
+
+        nb = create_nautical([])
+        nb._apply_retention_policy(destination)
+        nb.wait_for_retention_deletes()
+
+        assert (destination / "app" / "2000-01-01").exists()
+        assert not (destination / NauticalBackup.TRASH_DIR_NAME).exists()
+
+
+class TestRetentionCatalog:
+    def test_second_run_does_not_rescan(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        monkeypatch.setenv("NUMBER_OF_BACKUPS_TO_KEEP", "2")
+        monkeypatch.setenv("RETENTION_CATALOG", "true")
+        create_source(nautical_env, "app")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2000-01-02", "app/2000-01-03"]:
+            (destination / folder).mkdir(parents=True)
+
+        first = create_nautical([FakeContainer("app", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            first.backup()
+        assert sorted(p.name for p in (destination / "app").iterdir()) == [
+            "2000-01-03",
+            first.start_time.strftime("%Y-%m-%d"),
+        ]
+
+        # Only the folders created and deleted by Nautical changed, so the catalog is still accurate
+        second = create_nautical([])
+        assert second._apply_retention_policy(destination) == 0
+        assert second.retention_catalog.scans == 0
+
+    def test_catalog_is_disabled_by_default(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("NUMBER_OF_BACKUPS_TO_KEEP", "1")
+        monkeypatch.delenv("RETENTION_CATALOG", raising=False)
+        destination = nautical_env / "destination"
+        for folder in ["2000-01-01/app", "2000-01-02/app"]:
+            (destination / folder).mkdir(parents=True)
+
+        nb = create_nautical([])
+        assert nb._apply_retention_policy(destination) == 1
+        assert nb.db.get(RetentionCatalog.DB_KEY) is None
+
+
+class TestRetentionTiers:
+    def create_daily_backups(self, destination: Path, path_format: str, days: int) -> List[str]:
+        """One backup per day, ending on 2024-03-31"""
+        start = datetime(2024, 3, 31) - timedelta(days=days - 1)
+        names = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
+        for name in names:
+            folder = f"app/{name}" if path_format == "container/date" else f"{name}/app"
+            (destination / folder).mkdir(parents=True)
+        return names
+
+    def remaining(self, destination: Path, path_format: str) -> List[str]:
+        parent = destination / "app" if path_format == "container/date" else destination
+        return sorted(p.name for p in parent.iterdir() if p.name != "app")
+
+    @pytest.mark.parametrize("path_format", ["container/date", "date/container"])
+    def test_tiers_are_unioned_with_newest(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch, path_format: str):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", path_format)
+        monkeypatch.setenv("NUMBER_OF_BACKUPS_TO_KEEP", "2")
+        monkeypatch.setenv("RETENTION_KEEP_WEEKLY", "2")
+        monkeypatch.setenv("RETENTION_KEEP_MONTHLY", "3")
+        monkeypatch.setenv("RETENTION_KEEP_YEARLY", "2")
+        destination = nautical_env / "destination"
+        self.create_daily_backups(destination, path_format, 500)
+
+        nb = create_nautical([])
+        removed = nb._apply_retention_policy(destination)
+
+        # Newest: 03-31, 03-30. Weekly: 03-31 (Sunday), 03-24. Monthly: 03-31, 02-29, 01-31. Yearly: 03-31, 2023-12-31
+        expected = ["2023-12-31", "2024-01-31", "2024-02-29", "2024-03-24", "2024-03-30", "2024-03-31"]
+        assert self.remaining(destination, path_format) == expected
+        assert removed == 500 - len(expected)
+
+    def test_tiers_alone_enable_retention(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("RETENTION_KEEP_DAILY", "3")
+        destination = nautical_env / "destination"
+        self.create_daily_backups(destination, "date/container", 10)
+
+        create_nautical([])._apply_retention_policy(destination)
+
+        assert self.remaining(destination, "date/container") == ["2024-03-29", "2024-03-30", "2024-03-31"]
+
+    def test_daily_tier_keeps_newest_backup_of_each_day(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("DEST_DATE_FORMAT", "%Y-%m-%d_%H-%M")
+        monkeypatch.setenv("RETENTION_KEEP_DAILY", "2")
+        destination = nautical_env / "destination"
+        for name in ["2024-03-30_01-00", "2024-03-30_13-00", "2024-03-31_01-00", "2024-03-31_13-00"]:
+            (destination / name / "app").mkdir(parents=True)
+
+        create_nautical([])._apply_retention_policy(destination)
+
+        assert self.remaining(destination, "date/container") == ["2024-03-30_13-00", "2024-03-31_13-00"]
+
+    def test_dry_run_keeps_everything(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("RETENTION_KEEP_MONTHLY", "1")
+        monkeypatch.setenv("RETENTION_DRY_RUN", "true")
+        destination = nautical_env / "destination"
+        names = self.create_daily_backups(destination, "date/container", 40)
+
+        assert create_nautical([])._apply_retention_policy(destination) == 0
+        assert self.remaining(destination, "date/container") == names
+
+
+class TestCapacityRetention:
+    BACKUP_SIZE = 100  # Bytes each dated folder takes on the fake filesystem
+
+    @pytest.fixture(autouse=True)
+    def capacity_env(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        monkeypatch.setenv("RETENTION_MIN_FREE_BYTES", "500")
+
+    def fake_statvfs(self, destination: Path, total: int = 1000):
+        """Free space shrinks by BACKUP_SIZE for every dated folder in the destination"""
+
+        def statvfs(path):
+            used = sum(1 for folder in destination.iterdir() if folder.name[:2] in ["19", "20"]) * self.BACKUP_SIZE
+            return os.statvfs_result((4096, 1, total, total - used, total - used, 0, 0, 0, 0, 255))
+
+        return patch("app.backup.os.statvfs", side_effect=statvfs)
+
+    def create_backups(self, destination: Path, *dates: str) -> None:
+        for date in dates:
+            (destination / date / "app").mkdir(parents=True)
+
+    def remaining(self, destination: Path) -> List[str]:
+        return sorted(p.name for p in destination.iterdir() if p.name != NauticalBackup.TRASH_DIR_NAME)
+
+    def test_oldest_backups_are_removed_until_floor_is_met(self, nautical_env: Path):
+        destination = nautical_env / "destination"
+        self.create_backups(destination, "2000-01-01", "2000-01-02", "2000-01-03", "2000-01-04", "2000-01-05", "1999")
+
+        nb = create_nautical([])
+        with self.fake_statvfs(destination):
+            assert nb._free_destination_space(destination, projected_bytes=0) == 1
+
+        assert "2000-01-01" not in self.remaining(destination)
+        assert "1999" in self.remaining(destination)  # Not a dated folder
+
+    def test_projected_size_comes_from_previous_run(self, nautical_env: Path):
+        destination = nautical_env / "destination"
+        self.create_backups(destination, "2000-01-01", "2000-01-02", "2000-01-03", "2000-01-04")
+        create_source(nautical_env, "app")
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        nb.db.put("container_sizes", {"app": 150})
+        with self.fake_statvfs(destination), patch("app.backup.subprocess.run", side_effect=rsync_with_stats) as run:
+            nb.backup()
+
+        # 600 free before the run, 650 needed: one backup removed
+        today = nb.start_time.strftime("%Y-%m-%d")
+        assert self.remaining(destination) == ["2000-01-02", "2000-01-03", "2000-01-04", today]
+        # Sized from what rsync transferred, without scanning the new backup
+        assert "--stats" in run.call_args.args[0]
+        assert nb.db.get("container_sizes") == {"app": 2048}
+
+    def test_size_is_kept_when_rsync_reports_nothing(self, nautical_env: Path):
+        create_source(nautical_env, "app")
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        nb.db.put("container_sizes", {"app": 150})
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        assert nb.db.get("container_sizes") == {"app": 150}
+
+    def test_freed_space_estimate_skips_hard_linked_files(self, nautical_env: Path):
+        destination = nautical_env / "destination"
+        self.create_backups(destination, "2000-01-01", "2000-01-02")
+        (destination / "2000-01-01" / "app" / "unique.txt").write_text("x" * 10)
+        (destination / "2000-01-01" / "app" / "shared.txt").write_text("x" * 1000)
+        os.link(destination / "2000-01-01" / "app" / "shared.txt", destination / "2000-01-02" / "app" / "shared.txt")
+
+        assert NauticalBackup._unique_size(destination / "2000-01-01") == 10
+
+    def test_min_backups_to_keep_is_respected(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("MIN_BACKUPS_TO_KEEP", "2")
+        destination = nautical_env / "destination"
+        self.create_backups(destination, "2000-01-01", "2000-01-02", "2000-01-03")
+
+        nb = create_nautical([])
+        with self.fake_statvfs(destination):
+            assert nb._free_destination_space(destination, projected_bytes=1000) == 1
+
+        assert self.remaining(destination) == ["2000-01-02", "2000-01-03"]
+        assert any("unable to free enough space" in error for error in nb.error_messages)
+
+    def test_link_dest_base_is_kept(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_LINK_DEST", "true")
+        destination = nautical_env / "destination"
+        self.create_backups(destination, *[f"2000-01-0{day}" for day in range(1, 7)])
+
+        nb = create_nautical([])
+        nb._get_link_dest_args(destination, "2000-01-02/app")  # Links against the oldest backup
+        assert nb._link_dest_bases == {destination / "2000-01-01" / "app"}
+        with self.fake_statvfs(destination):
+            assert nb._free_destination_space(destination, projected_bytes=0) == 1
+
+        assert self.remaining(destination) == [f"2000-01-0{day}" for day in [1, 3, 4, 5, 6]]
+
+    def test_folder_of_this_run_is_kept(self, nautical_env: Path):
+        destination = nautical_env / "destination"
+        self.create_backups(destination, *[f"2000-01-0{day}" for day in range(1, 7)])
+
+        nb = create_nautical([])
+        nb.start_time = datetime(2000, 1, 1)  # Newer folders exist, e.g. after the clock was set back
+        with self.fake_statvfs(destination):
+            assert nb._free_destination_space(destination, projected_bytes=0) == 1
+
+        assert "2000-01-01" in self.remaining(destination)
+        assert "2000-01-02" not in self.remaining(destination)
+
+    def test_container_date_removes_oldest_across_containers(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("DEST_DATE_PATH_FORMAT", "container/date")
+        monkeypatch.setenv("RETENTION_MIN_FREE_BYTES", "0")
+        monkeypatch.setenv("RETENTION_MIN_FREE_PERCENT", "50")
+        destination = nautical_env / "destination"
+        for folder in ["app/2000-01-01", "app/2000-01-04", "db/2000-01-02", "db/2000-01-03", "db/2000-01-05"]:
+            (destination / folder).mkdir(parents=True)
+
+        def statvfs(path):
+            used = sum(1 for _ in destination.glob("*/20*")) * self.BACKUP_SIZE
+            return os.statvfs_result((4096, 1, 1000, 1000 - used, 1000 - used, 0, 0, 0, 0, 255))
+
+        nb = create_nautical([])
+        with patch("app.backup.os.statvfs", side_effect=statvfs):
+            assert nb._free_destination_space(destination, projected_bytes=200) == 2
+
+        assert sorted(str(p.relative_to(destination)) for p in destination.glob("*/20*")) == [
+            "app/2000-01-04",
+            "db/2000-01-03",
+            "db/2000-01-05",
+        ]
+
+    def test_dry_run_keeps_everything(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RETENTION_DRY_RUN", "true")
+        destination = nautical_env / "destination"
+        self.create_backups(
+            destination, "2000-01-01", "2000-01-02", "2000-01-03", "2000-01-04", "2000-01-05", "2000-01-06"
+        )
+
+        nb = create_nautical([])
+        with self.fake_statvfs(destination):
+            assert nb._free_destination_space(destination, projected_bytes=0) == 0
+
+        assert len(self.remaining(destination)) == 6
+        assert nb.error_messages == []  # Not enough space could be freed, but nothing failed
+
+    def test_disabled_by_default(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.delenv("RETENTION_MIN_FREE_BYTES")
+        create_source(nautical_env, "app")
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        with patch("app.backup.os.statvfs") as statvfs, patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        statvfs.assert_not_called()
+        assert nb.db.get("container_sizes") is None
+
+
+class TestPlan:
+    def test_plan_does_not_stop_or_write(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("USE_DEST_DATE_FOLDER", "true")
+        create_source(nautical_env, "web", "db")
+        (nautical_env / "source" / "db" / "more.txt").write_text("12345")
+        calls: List[str] = []
+        labels = {"nautical-backup.group": "stack"}
+        containers = [
+            FakeContainer("web", "a" * 64, labels=labels, calls=calls),
+            FakeContainer("db", "b" * 64, labels=labels, calls=calls),
+            FakeContainer("skipped", "c" * 64, labels={"nautical-backup.enable": "false"}, calls=calls),
+        ]
+
+        with patch("app.backup.subprocess.run") as run:
+            plan = create_nautical(containers).plan("scan")
+
+        run.assert_not_called()
+        assert calls == []
+        assert list((nautical_env / "destination").iterdir()) == []
+
+        [group] = plan["groups"]
+        assert group["group"] == "stack"
+        assert [(c["name"], c["estimated_bytes"], c["estimated_files"]) for c in group["containers"]] == [
+            ("db", len("db") + 5, 2),
+            ("web", len("web"), 1),
+        ]
+        assert plan["estimated_bytes"] == 10
+        assert plan["skipped"] == [{"name": "skipped", "reason": "enable_label_false"}]
+        assert plan["destinations"][0]["path"] == str(nautical_env / "destination")
+        assert plan["fits"] is True
+
+    def test_cached_estimate_and_downtime_from_history(self, nautical_env: Path):
+        create_source(nautical_env, "app")
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        nb.db.put("container_sizes", {"app": 1000})
+        nb.db.put("container_downtimes", {"app": 10.0})
+
+        with patch.object(NauticalBackup, "_fingerprint_tree") as scan:
+            plan = nb.plan("cached")
+        scan.assert_not_called()
+        assert plan["groups"][0]["containers"][0]["estimated_bytes"] == 1000
+        assert plan["groups"][0]["estimated_downtime_seconds"] == 10.0
+
+        plan = nb.plan("scan")  # 3 bytes now, so the downtime scales down with the previous throughput
+        assert plan["groups"][0]["containers"][0]["estimated_downtime_seconds"] == 0.03
+
+    def test_first_estimate_is_remembered(self, nautical_env: Path):
+        create_source(nautical_env, "app")
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+
+        assert nb.plan("cached")["estimated_bytes"] == 3  # Never backed up, so the source is scanned
+        assert nb.db.get(NauticalBackup.PLAN_SIZE_ESTIMATES_KEY) == {"app": 3}
+        # Neither a previous backup size for capacity retention nor a container count
+        assert nb.db.get("container_sizes") is None
+        assert nb.db.get("number_of_containers") == 0
+
+        with patch.object(NauticalBackup, "_fingerprint_tree") as scan:
+            assert create_nautical([FakeContainer("app", "a" * 64)]).plan("cached")["estimated_bytes"] == 3
+        scan.assert_not_called()
+
+    def test_rsync_estimate(self, nautical_env: Path):
+        create_source(nautical_env, "app")
+        output = "Number of regular files transferred: 4\nTotal transferred file size: 2,048 bytes\n"
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        with patch("app.backup.subprocess.run") as run:
+            run.return_value = subprocess.CompletedProcess(args=[], returncode=0, stdout=output)
+            plan = nb.plan("rsync")
+
+        args = run.call_args.args[0]
+        assert "--dry-run" in args and "--stats" in args and "-ra" in args and "-raq" not in args
+        container = plan["groups"][0]["containers"][0]
+        assert (container["estimated_bytes"], container["estimated_files"]) == (2048, 4)
+
+    def test_unknown_estimate(self, nautical_env: Path):
+        with pytest.raises(ValueError):
+            create_nautical([]).plan("guess")
+
+
+class TestPreflightCheck:
+    def fake_statvfs(self, free: int):
+        return patch(
+            "app.backup.os.statvfs", return_value=os.statvfs_result((4096, 1, 1000, free, free, 0, 0, 0, 0, 255))
+        )
+
+    def test_refuse_skips_every_container(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("PREFLIGHT_CHECK", "refuse")
+        monkeypatch.setenv("PREFLIGHT_ESTIMATE", "scan")
+        monkeypatch.setenv("ADDITIONAL_FOLDERS", "extra")
+        create_source(nautical_env, "app", "extra")
+        calls: List[str] = []
+
+        nb = create_nautical([FakeContainer("app", "a" * 64, calls=calls)])
+        with self.fake_statvfs(free=1), patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        assert calls == []
+        run.assert_not_called()  # Not even the standalone additional folders
+        assert nb.container_skip_reasons == {"app": "insufficient_space"}
+        assert any("Pre-flight check" in error for error in nb.error_messages)
+
+    def test_reorder_backs_up_smallest_groups_first(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("PREFLIGHT_CHECK", "reorder")
+        monkeypatch.setenv("PREFLIGHT_ESTIMATE", "scan")
+        create_source(nautical_env, "big", "small")
+        (nautical_env / "source" / "big" / "more.txt").write_text("x" * 100)
+        calls: List[str] = []
+
+        nb = create_nautical(
+            [FakeContainer("big", "a" * 64, calls=calls), FakeContainer("small", "b" * 64, calls=calls)]
+        )
+        with self.fake_statvfs(free=50), patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        assert calls == ["stop:small", "start:small", "stop:big", "start:big"]
+
+    def test_fitting_run_keeps_order(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("PREFLIGHT_CHECK", "reorder")
+        create_source(nautical_env, "big", "small")
+        (nautical_env / "source" / "big" / "more.txt").write_text("x" * 100)
+        calls: List[str] = []
+
+        nb = create_nautical(
+            [FakeContainer("big", "a" * 64, calls=calls), FakeContainer("small", "b" * 64, calls=calls)]
+        )
+        with self.fake_statvfs(free=1000), patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        assert calls == ["stop:big", "start:big", "stop:small", "start:small"]
+        assert nb.db.get("container_downtimes").keys() == {"big", "small"}
+
+    def test_sizes_are_kept_for_the_next_cached_estimate(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("PREFLIGHT_CHECK", "reorder")
+        create_source(nautical_env, "app")
+
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+        with self.fake_statvfs(free=1000), patch("app.backup.subprocess.run", side_effect=rsync_with_stats) as run:
+            nb.backup()
+
+        assert "--stats" in run.call_args.args[0]
+        assert nb.db.get("container_sizes") == {"app": 2048}  # What rsync transferred, not the first estimate
+
+        with patch.object(NauticalBackup, "_fingerprint_tree") as scan:
+            plan = nb.plan("cached")
+        scan.assert_not_called()
+        assert plan["estimated_bytes"] == 2048
+
+
+RSYNC_STATS_OUTPUT = """
+Number of files: 3 (reg: 2, dir: 1)
+Number of regular files transferred: 2
+Total file size: 4,096 bytes
+Total transferred file size: 2,048 bytes
+Literal data: 1,024 bytes
+Matched data: 1,024 bytes
+Total bytes sent: 1,200
+Total bytes received: 64
+"""
+
+
+def rsync_with_stats(*args, **kwargs):
+    return subprocess.CompletedProcess(args=args, returncode=0, stdout=RSYNC_STATS_OUTPUT, stderr="")
+
+
+class TestRsyncStats:
+    def test_stats_are_parsed_and_stored(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RSYNC_STATS", "true")
+        monkeypatch.setenv("NAUTICAL_DB_BACKEND", "sqlite")
+        monkeypatch.setenv("PROMETHEUS_METRICS", "true")
+        create_source(nautical_env, "app1")
+
+        nb = create_nautical([FakeContainer("app1", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync_with_stats) as run:
+            nb.backup()
+
+        command = run.call_args.args[0]
+        assert "--stats" in command and "-raq" not in command and " -ra " in command
+        assert run.call_args.kwargs["capture_output"] is True
+
+        [result] = nb.get_rsync_results("app1")
+        assert result.stats["files_transferred"] == 2
+        assert result.bytes_transferred == 2048
+
+        stored = nb.db.get("rsync_stats")["app1"][str(nautical_env / "destination" / "app1")]
+        assert stored["literal_data"] == 1024
+        assert stored["matched_data"] == 1024
+        assert stored["returncode"] == 0
+
+        assert nb.db.get_container_history("app1")[0]["bytes_transferred"] == 2048
+        assert 'nautical_rsync_bytes_total{container="app1"} 2048' in MetricsRegistry.load().render()
+
+    def test_non_utf8_output_is_logged_without_the_stats(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RSYNC_STATS", "true")
+        create_source(nautical_env, "app1")
+        # A file name that is not UTF-8, then the --stats block
+        output = nautical_env / "rsync-output"
+        output.write_bytes(b"caf\xe9.txt\n" + RSYNC_STATS_OUTPUT.encode())
+        real_run = subprocess.run
+
+        def rsync(command, **kwargs):
+            # Decoded the way _run_rsync asks for
+            return real_run(["cat", str(output)], **{k: v for k, v in kwargs.items() if k != "shell"})
+
+        nb = create_nautical([FakeContainer("app1", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync), patch.object(nb.logger, "log_this") as log_this:
+            nb.backup()
+
+        assert nb.get_rsync_results("app1")[0].bytes_transferred == 2048
+        assert call("rsync output for app1: caf\ufffd.txt", "INFO", LogType.DEFAULT) in log_this.call_args_list
+
+    def test_previous_containers_are_kept(self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RSYNC_STATS", "true")
+        create_source(nautical_env, "app1", "app2")
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_with_stats):
+            create_nautical([FakeContainer("app1", "a" * 64)]).backup()
+            nb = create_nautical([FakeContainer("app2", "b" * 64)])
+            nb.backup()
+
+        assert nb.db.get("rsync_stats").keys() == {"app1", "app2"}
+
+    def test_disabled_by_default(self, nautical_env: Path):
+        create_source(nautical_env, "app1")
+
+        nb = create_nautical([FakeContainer("app1", "a" * 64)])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok) as run:
+            nb.backup()
+
+        assert "--stats" not in run.call_args.args[0]
+        assert run.call_args.kwargs["capture_output"] is False
+        assert nb.get_rsync_results("app1")[0].bytes_transferred is None
+        assert nb.db.get("rsync_stats") is None
+
+
+class TestBulkStateRefresh:
+    def test_default_path_refreshes_groups_in_bulk(self, nautical_env: Path):
+        create_source(nautical_env, "web", "db")
+        labels = {"nautical-backup.group": "stack"}
+        web = FakeContainer("web", "a" * 64, labels=labels)
+        db = FakeContainer("db", "b" * 64, labels=labels)
+
+        nb = create_nautical([web, db])
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+
+        # Only the checks right after stopping and starting inspect a single container
+        assert (web.reload_calls, db.reload_calls) == (2, 2)
+        filters = [call.kwargs["filters"] for call in nb.docker.api.containers.call_args_list]
+        assert filters == [{"id": [db.id, web.id]}] * 3  # Before stopping, copying and starting
+
+    def test_refresh_keeps_the_rest_of_the_inspect_state(self):
+        c = MagicMock(id="a" * 64, status="running", attrs={"State": {"Status": "running", "ExitCode": 0}})
+        docker_client = MagicMock()
+        docker_client.api.containers.return_value = [container_summary("app", "a" * 64, state="exited")]
+
+        assert refresh_container_states(docker_client, [c]) == [c]
+        assert c.attrs["State"] == {"Status": "exited", "ExitCode": 0}
+
+    def test_falls_back_to_inspecting_each_container(self, nautical_env: Path):
+        c = FakeContainer("app", "a" * 64)
+        nb = create_nautical([c])
+        nb.docker.api.containers.side_effect = APIError("unsupported")
+
+        nb._refresh_containers([c])
+
+        assert c.reload_calls == 1
+
+
+class TestReportFilePerRun:
+    def test_each_backup_writes_the_report_file_of_its_own_day(
+        self, nautical_env: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setenv("REPORT_FILE", "true")
+        create_source(nautical_env, "app")
+        today = datetime(2030, 1, 1, 23, 59)
+
+        class FakeDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return today
+
+        monkeypatch.setattr("app.logger.datetime.datetime", FakeDatetime)
+        nb = create_nautical([FakeContainer("app", "a" * 64)])
+
+        with patch("app.backup.subprocess.run", side_effect=rsync_ok):
+            nb.backup()
+            today = datetime(2030, 1, 2, 0, 1)
+            nb.backup()
+
+        reports = sorted(p.name for p in (nautical_env / "destination").glob("Backup Report - *.txt"))
+        assert reports == ["Backup Report - 2030-01-02.txt"]
+        report = (nautical_env / "destination" / reports[0]).read_text()
+        assert "Starting backup..." in report
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+
+import pytest
+
+from app.db import DB
+
+
+@pytest.fixture
+def db_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("REPORT_FILE", "false")
+    return tmp_path / "nautical-db.json"
+
+
+class TestCachedDB:
+    def test_cache_disabled_by_default(self, db_file, monkeypatch):
+        monkeypatch.delenv("NAUTICAL_DB_CACHE", raising=False)
+        assert DB(db_file).cached is False
+
+    def test_cache_enabled_from_env(self, db_file, monkeypatch):
+        monkeypatch.setenv("NAUTICAL_DB_CACHE", "true")
+        assert DB(db_file).cached is True
+
+    def test_reads_do_not_reparse_unchanged_file(self, db_file, monkeypatch):
+        db = DB(db_file, cached=True)
+        db.put("errors", 3)
+
+        calls = []
+        original_load = json.load
+        monkeypatch.setattr("app.db.json.load", lambda f: calls.append(f) or original_load(f))
+
+        for _ in range(5):
+            assert db.get("errors") == 3
+        assert calls == []
+
+    def test_external_writes_are_detected(self, db_file):
+        db = DB(db_file, cached=True)
+        db.put("errors", 1)
+
+        other = DB(db_file, cached=False)
+        other.put("errors", 42)
+        os.utime(db_file, ns=(0, os.stat(db_file).st_mtime_ns + 1_000_000))
+
+        assert db.get("errors") == 42
+
+    def test_write_during_read_is_detected(self, db_file, monkeypatch):
+        db = DB(db_file, cached=True)
+        db.put("errors", 1)
+
+        other = DB(db_file, cached=False)
+        other.put("errors", 2)
+        os.utime(db_file, ns=(0, os.stat(db_file).st_mtime_ns + 1_000_000))
+
+        original_load = json.load
+        writes = [3]
+
+        def load_then_write(f):
+            data = original_load(f)
+            if writes:
+                # Another process writes after this read but before the cache is stored
+                other.put("errors", writes.pop())
+                os.utime(db_file, ns=(0, os.stat(db_file).st_mtime_ns + 2_000_000))
+            return data
+
+        monkeypatch.setattr("app.db.json.load", load_then_write)
+
+        assert db.get("errors") == 2
+        assert db.get("errors") == 3
+
+    def test_returned_values_do_not_alias_the_cache(self, db_file):
+        db = DB(db_file, cached=True)
+        db.put("history", {"runs": [1]})
+
+        value = db.get("history")
+        value["runs"].append(2)
+
+        assert db.get("history") == {"runs": [1]}
+
+    @pytest.mark.parametrize("cached", [True, False])
+    def test_update_writes_every_key_at_once(self, db_file, cached):
+        db = DB(db_file, cached=cached)
+        db.update({"errors": 2, "containers_completed": 5, "backup_running": True})
+
+        with open(db_file) as f:
+            data = json.load(f)
+        assert data["errors"] == 2
+        assert data["containers_completed"] == 5
+        assert data["backup_running"] is True
+
+    def test_cached_write_is_atomic_replace(self, db_file, monkeypatch):
+        db = DB(db_file, cached=True)
+
+        replaced = []
+        original_replace = os.replace
+        monkeypatch.setattr("app.db.os.replace", lambda a, b: replaced.append(b) or original_replace(a, b))
+
+        db.update({"errors": 1})
+
+        assert replaced == [str(db_file)]
+        assert [p.name for p in db_file.parent.iterdir()] == [db_file.name]  # No temp files left behind
+
+    def test_falls_back_to_in_place_write(self, db_file, monkeypatch):
+        db = DB(db_file, cached=True)
+
+        def busy(a, b):
+            raise OSError(16, "Device or resource busy")
+
+        monkeypatch.setattr("app.db.os.replace", busy)
+        db.put("errors", 7)
+
+        assert DB(db_file, cached=False).get("errors") == 7
+        assert [p.name for p in db_file.parent.iterdir()] == [db_file.name]
+
+    def test_concurrent_updates(self, db_file):
+        db = DB(db_file, cached=True)
+
+        def worker(i):
+            db.put(f"key_{i}", i)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        data = DB(db_file, cached=False).dump_json()
+        assert all(data[f"key_{i}"] == i for i in range(20))
+
+
+class TestSqliteDB:
+    def test_backend_selected_from_env(self, db_file, monkeypatch):
+        monkeypatch.setenv("NAUTICAL_DB_BACKEND", "sqlite")
+        db = DB(db_file)
+
+        assert db.backend == "sqlite"
+        assert db.db_path.endswith("nautical-db.sqlite")
+        assert os.path.isfile(db.db_path)
+
+    def test_unknown_backend_falls_back_to_json(self, db_file):
+        assert DB(db_file, backend="mongodb").backend == "json"
+
+    def test_uses_wal_mode(self, db_file):
+        db = DB(db_file, backend="sqlite")
+        assert db._storage.conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_key_values_are_seeded_and_persisted(self, db_file):
+        db = DB(db_file, backend="sqlite")
+        assert db.get("containers_completed") == 0
+        assert db.get("backup_running") is False
+        assert "created_at" in db.dump_json()
+
+        db.update({"errors": 2, "last_cron": "01/01/24 00:00"})
+        db.put("nested", {"a": [1, 2]})
+        db.delete("last_cron")
+
+        reopened = DB(db_file, backend="sqlite")
+        assert reopened.get("errors") == 2
+        assert reopened.get("nested") == {"a": [1, 2]}
+        assert reopened.get("last_cron", "None") == "None"
+
+    def test_run_history(self, db_file):
+        db = DB(db_file, backend="sqlite")
+        for i in range(3):
+            db.record_run(
+                {
+                    "started_at": f"2024-01-0{i + 1}T00:00:00",
+                    "finished_at": f"2024-01-0{i + 1}T00:01:00",
+                    "duration_seconds": 60.0,
+                    "status": "success",
+                    "containers_completed": 1,
+                    "containers_skipped": 1,
+                    "containers_failed": 0,
+                    "errors": 0,
+                },
+                [
+                    {"container_name": "app", "status": "completed", "duration_seconds": 1.5 + i},
+                    {"container_name": "other", "status": "skipped", "reason": "enable_label_false"},
+                ],
+            )
+
+        runs = db.get_runs(limit=2)
+        assert [r["started_at"] for r in runs] == ["2024-01-03T00:00:00", "2024-01-02T00:00:00"]
+
+        history = db.get_container_history("app")
+        assert [h["duration_seconds"] for h in history] == [3.5, 2.5, 1.5]
+        assert history[0]["started_at"] == "2024-01-03T00:00:00"
+        assert db.get_container_history("other", limit=1)[0]["reason"] == "enable_label_false"
+
+    def test_json_backend_keeps_no_history(self, db_file):
+        db = DB(db_file, backend="json")
+        assert db.record_run({}, []) is None
+        assert db.get_runs() == []
+        assert db.get_container_history("app") == []
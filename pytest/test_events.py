@@ -0,0 +1,96 @@
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+from app.events import Event, EventBus, follow_progress_events, progress_event_from_record
+
+
+class TestEventBus:
+    def test_callbacks_receive_events(self):
+        bus = EventBus()
+        received: List[Event] = []
+        bus.subscribe(received.append)
+
+        bus.publish("container", state="stopping", container_name="app1")
+        bus.unsubscribe(received.append)
+        bus.publish("container", state="copying", container_name="app1")
+
+        assert [e["state"] for e in received] == ["stopping"]
+        assert received[0]["type"] == "container"
+        assert "timestamp" in received[0]
+
+    def test_queue_is_filled_from_other_threads(self):
+        bus = EventBus()
+
+        async def consume() -> List[Event]:
+            queue = bus.subscribe_queue(asyncio.get_running_loop())
+            publisher = threading.Thread(
+                target=lambda: [bus.publish("container", state=s) for s in ["stopping", "copying", "starting"]]
+            )
+            publisher.start()
+            events = [await asyncio.wait_for(queue.get(), timeout=5) for _ in range(3)]
+            publisher.join()
+            bus.unsubscribe(queue)
+            return events
+
+        events = asyncio.run(consume())
+        assert [e["state"] for e in events] == ["stopping", "copying", "starting"]
+
+    def test_slow_subscriber_drops_events(self, monkeypatch):
+        monkeypatch.setattr(EventBus, "MAX_QUEUE_SIZE", 2)
+        bus = EventBus()
+
+        async def fill() -> int:
+            queue = bus.subscribe_queue(asyncio.get_running_loop())
+            for i in range(5):
+                bus.publish("container", state="copying", index=i)
+            await asyncio.sleep(0)  # Let the scheduled puts run
+            return queue.qsize()
+
+        assert asyncio.run(fill()) == 2
+
+    def test_closed_loop_is_unsubscribed(self):
+        bus = EventBus()
+        loop = asyncio.new_event_loop()
+        bus.subscribe_queue(loop)
+        loop.close()
+
+        bus.publish("container", state="done")
+        assert bus._queues == []
+
+
+class TestProgressFromJsonLog:
+    def test_records_of_other_processes_become_events(self):
+        record = {"timestamp": "t", "phase": "progress", "event": "container", "pid": -1, "state": "copying"}
+
+        assert progress_event_from_record(record) == {"type": "container", "timestamp": "t", "state": "copying"}
+        assert progress_event_from_record({**record, "pid": os.getpid()}) is None  # Already on the event bus
+        assert progress_event_from_record({"phase": "rsync", "pid": -1}) is None
+
+    def test_follows_lines_appended_after_start(self, tmp_path: Path):
+        log_file = tmp_path / "events.jsonl"
+        old = {"phase": "progress", "event": "backup", "pid": -1, "state": "started"}
+        log_file.write_text(json.dumps(old) + "\n")
+
+        async def follow() -> List[Event]:
+            queue: "asyncio.Queue[Event]" = asyncio.Queue()
+            task = asyncio.create_task(follow_progress_events(str(log_file), queue, poll_seconds=0.01))
+            await asyncio.sleep(0.05)
+
+            with open(log_file, "a") as f:
+                f.write(json.dumps({"phase": "rsync", "pid": -1}) + "\n")
+                f.write(json.dumps({**old, "event": "container", "state": "copying"}) + "\n")
+                f.write('{"phase": "progress", "event": "container"')  # Not complete yet
+            events = [await asyncio.wait_for(queue.get(), timeout=5)]
+
+            with open(log_file, "a") as f:
+                f.write(', "pid": -1, "state": "done"}\n')
+            events.append(await asyncio.wait_for(queue.get(), timeout=5))
+            task.cancel()
+            return events
+
+        events = asyncio.run(follow())
+        assert [(e["type"], e["state"]) for e in events] == [("container", "copying"), ("container", "done")]
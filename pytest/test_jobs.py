@@ -0,0 +1,134 @@
+import threading
+from typing import Tuple
+
+import pytest
+from mock import MagicMock, patch
+
+import app.api.jobs
+from app.api.jobs import JobAlreadyRunning, JobManager
+
+
+@pytest.fixture
+def manager(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("REPORT_FILE", "false")
+    with patch("app.api.jobs.NauticalBackup") as nautical_backup:
+        nautical = nautical_backup.return_value
+        nautical.containers_completed = {"app1"}
+        nautical.containers_skipped = set()
+        nautical.containers_failed = set()
+        nautical.error_messages = []
+
+        docker_factory = MagicMock()
+        manager = JobManager(docker_factory)
+        yield manager
+        manager.shutdown()
+
+        assert docker_factory.call_count <= 1  # One shared Docker client
+        assert nautical_backup.call_count <= 2  # One warm NauticalBackup for backups, one for plans
+
+
+def block_backup(manager: JobManager) -> Tuple[threading.Event, threading.Event]:
+    """Make the next backups wait until `release` is set. `started` is set once a backup is running"""
+    started, release = threading.Event(), threading.Event()
+
+    def backup(**kwargs):
+        started.set()
+        release.wait(5)
+
+    manager._get_nautical().backup.side_effect = backup
+    return started, release
+
+
+class TestJobManager:
+    def test_runs_backup_on_worker_thread(self, manager: JobManager):
+        thread_names = []
+
+        def backup(**kwargs):
+            thread_names.append(threading.current_thread().name)
+
+        manager._get_nautical().backup.side_effect = backup
+
+        job = manager.wait(manager.submit())
+
+        assert job.status == "completed"
+        assert job.summary["completed"] == ["app1"]
+        assert job.started_at and job.finished_at
+        assert thread_names[0].startswith("nautical-job")
+        assert manager.get(job.id) is job
+
+    def test_overlapping_run_is_rejected(self, manager: JobManager):
+        started, release = block_backup(manager)
+        running = manager.submit()
+        started.wait(5)
+
+        with pytest.raises(JobAlreadyRunning) as e:
+            manager.submit()
+        assert e.value.job is running
+
+        release.set()
+        assert manager.wait(running).status == "completed"
+        manager.wait(manager.submit())  # Accepted again once the first job finished
+
+    def test_overlapping_runs_are_queued_once(self, manager: JobManager, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("API_JOB_OVERLAP", "queue")
+        started, release = block_backup(manager)
+
+        running = manager.submit()
+        started.wait(5)
+        queued = manager.submit()
+        assert queued is not running
+        assert manager.submit() is queued
+
+        release.set()
+        assert manager.wait(queued).status == "completed"
+        assert manager._get_nautical().backup.call_count == 2
+
+    def test_failed_backup(self, manager: JobManager):
+        manager._get_nautical().backup.side_effect = RuntimeError("Docker went away")
+
+        job = manager.wait(manager.submit())
+
+        assert job.status == "failed"
+        assert job.error == "Docker went away"
+        assert job.to_dict()["job_id"] == job.id
+
+    def test_failed_backup_is_logged(self, manager: JobManager):
+        manager._get_nautical().backup.side_effect = RuntimeError("Docker went away")
+
+        with patch("app.api.jobs.Logger") as logger:
+            job = manager.wait(manager.submit())
+
+        logger.return_value.log_this.assert_called_once_with(f"Backup job {job.id} failed: Docker went away", "ERROR")
+
+    def test_run_once_does_not_exit_the_api(self, manager: JobManager, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("RUN_ONCE", "true")
+
+        job = manager.wait(manager.submit())
+
+        assert job.status == "completed"
+        manager._get_nautical().backup.assert_called_once_with(exit_on_run_once=False)
+
+    def test_system_exit_keeps_the_summary(self, manager: JobManager):
+        manager._get_nautical().backup.side_effect = SystemExit(0)
+
+        job = manager.wait(manager.submit())
+
+        assert job.status == "completed"
+        assert job.summary["completed"] == ["app1"]
+
+    def test_plans_reuse_one_planner(self, manager: JobManager):
+        manager.plan("scan")
+        manager.plan("cached")
+
+        nautical_backup = app.api.jobs.NauticalBackup
+        nautical_backup.assert_called_once_with(manager._get_docker(), new_report_file=False)
+        assert nautical_backup.return_value.plan.call_count == 2
+
+    def test_shutdown_closes_the_docker_client(self, manager: JobManager):
+        docker_client = manager._get_docker()
+        manager.shutdown()
+
+        docker_client.close.assert_called_once()
+
+    def test_unknown_job(self, manager: JobManager):
+        assert manager.get("missing") is None
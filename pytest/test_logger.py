@@ -0,0 +1,161 @@
+import datetime
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.logger import AsyncLogDispatcher, Logger, LogLevel, ReportFileWriter
+from app.nautical_env import reload_nautical_env
+
+
+@pytest.fixture
+def report_logger(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Logger:
+    monkeypatch.setenv("DEST_LOCATION", str(tmp_path))
+    monkeypatch.setenv("REPORT_FILE", "true")
+    monkeypatch.setenv("REPORT_FILE_ON_BACKUP_ONLY", "false")
+    monkeypatch.setenv("REPORT_FILE_BUFFERED", "true")
+    logger = Logger()
+    logger._create_new_report_file()
+    yield logger
+    ReportFileWriter.close_all()
+
+
+def read_report(logger: Logger) -> str:
+    return (Path(logger.dest_location) / logger.report_file).read_text()
+
+
+class TestBufferedReportFile:
+    def test_info_lines_are_buffered_until_flush(self, report_logger: Logger):
+        report_logger.log_this("Stopping app...", LogLevel.INFO)
+        assert "Stopping app..." not in read_report(report_logger)
+
+        report_logger.flush_report_file()
+        assert "INFO: Stopping app..." in read_report(report_logger)
+
+    def test_warn_and_error_are_written_immediately(self, report_logger: Logger):
+        report_logger.log_this("Stopping app...", LogLevel.INFO)
+        report_logger.log_this("Source directory does not exist", LogLevel.WARN)
+
+        report = read_report(report_logger)
+        assert report.index("INFO: Stopping app...") < report.index("WARN: Source directory does not exist")
+
+    def test_flushes_after_size_threshold(self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(ReportFileWriter, "FLUSH_BYTES", 200)
+        for i in range(10):
+            report_logger.log_this(f"line {i} " + "x" * 40, LogLevel.INFO)
+
+        assert "line 0" in read_report(report_logger)
+
+    def test_flushes_after_time_threshold(self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(ReportFileWriter, "FLUSH_INTERVAL_SECONDS", 0)
+        report_logger.log_this("Starting backup...", LogLevel.INFO)
+
+        assert "Starting backup..." in read_report(report_logger)
+
+    def test_idle_buffer_is_flushed_by_timer(self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(ReportFileWriter, "FLUSH_INTERVAL_SECONDS", 0.05)
+        report_logger.log_this("Completed in 00m 01s", LogLevel.INFO)
+        assert "Completed in" not in read_report(report_logger)
+
+        # No further write() comes along to trigger the time threshold
+        deadline = time.monotonic() + 5
+        while "Completed in" not in read_report(report_logger) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "INFO: Completed in 00m 01s" in read_report(report_logger)
+
+    def test_loggers_share_one_handle(self, report_logger: Logger):
+        other = Logger()
+        report_logger.log_this("first", LogLevel.INFO)
+        other.log_this("second", LogLevel.INFO)
+
+        assert len(ReportFileWriter._writers) == 1
+        report_logger.flush_report_file()
+        report = read_report(report_logger)
+        assert report.index("first") < report.index("second")
+
+    def test_new_report_file_keeps_pending_lines_out(self, report_logger: Logger):
+        report_logger.log_this("old run", LogLevel.INFO)
+        report_logger._create_new_report_file()
+        report_logger.log_this("new run", LogLevel.ERROR)
+
+        report = read_report(report_logger)
+        assert "old run" not in report
+        assert report.startswith("Backup Report - ")
+        assert "ERROR: new run" in report
+
+
+class TestUnbufferedReportFile:
+    def test_every_line_is_written_immediately(self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("REPORT_FILE_BUFFERED", "false")
+        reload_nautical_env()
+        logger = Logger()
+        logger.log_this("Stopping app...", LogLevel.INFO)
+
+        assert "INFO: Stopping app..." in read_report(logger)
+        assert ReportFileWriter._writers == {}
+
+
+class TestAsyncLogging:
+    def test_output_happens_on_background_thread_in_order(
+        self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+    ):
+        monkeypatch.setenv("ASYNC_LOGGING", "true")
+        reload_nautical_env()
+        logger = Logger()
+
+        threads = []
+        original_output = logger._output
+
+        def recording_output(*args):
+            threads.append(threading.current_thread().name)
+            original_output(*args)
+
+        monkeypatch.setattr(logger, "_output", recording_output)
+        for i in range(50):
+            logger.log_this(f"message {i}", LogLevel.INFO)
+        logger.drain()
+
+        assert set(threads) == {"nautical-logger"}
+        console = capsys.readouterr().out.splitlines()
+        assert console == [f"INFO: message {i}" for i in range(50)]
+
+        report = read_report(logger)
+        assert report.index("message 0") < report.index("message 49")
+
+    def test_timestamp_is_taken_when_logged(self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("ASYNC_LOGGING", "true")
+        monkeypatch.setenv("REPORT_FILE_BUFFERED", "false")
+        reload_nautical_env()
+        logger = Logger()
+
+        gate = threading.Event()
+        AsyncLogDispatcher.get().submit(gate.wait)  # Hold the background thread
+
+        before = datetime.datetime.now()
+        logger.log_this("queued", LogLevel.INFO)
+        time.sleep(0.05)
+        gate.set()
+        logger.drain()
+
+        line = next(line for line in read_report(logger).splitlines() if "queued" in line)
+        logged_at = datetime.datetime.fromisoformat(line.split(" - ")[0])
+        assert logged_at - before < datetime.timedelta(seconds=0.04)
+
+    def test_write_errors_do_not_stop_the_thread(
+        self, report_logger: Logger, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture
+    ):
+        monkeypatch.setenv("ASYNC_LOGGING", "true")
+        reload_nautical_env()
+        logger = Logger()
+
+        def broken():
+            raise OSError("disk full")
+
+        AsyncLogDispatcher.get().submit(broken)
+        logger.log_this("still logging", LogLevel.INFO)
+        logger.drain()
+
+        captured = capsys.readouterr()
+        assert "disk full" in captured.err
+        assert "INFO: still logging" in captured.out
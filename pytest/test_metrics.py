@@ -0,0 +1,70 @@
+import threading
+from pathlib import Path
+
+from app.metrics import MetricsRegistry
+
+
+class TestMetricsRegistry:
+    def test_counter_and_histogram_rendering(self):
+        registry = MetricsRegistry(buckets=[1, 5])
+        registry.inc("nautical_backup_runs_total", 1, {"status": "success"})
+        registry.inc("nautical_backup_runs_total", 1, {"status": "success"})
+        registry.observe("nautical_container_downtime_seconds", 0.5, {"container": "app1"})
+        registry.observe("nautical_container_downtime_seconds", 3, {"container": "app1"})
+
+        text = registry.render()
+
+        assert "# TYPE nautical_backup_runs_total counter" in text
+        assert 'nautical_backup_runs_total{status="success"} 2' in text
+        assert "# TYPE nautical_container_downtime_seconds histogram" in text
+        assert 'nautical_container_downtime_seconds_bucket{container="app1",le="1"} 1' in text
+        assert 'nautical_container_downtime_seconds_bucket{container="app1",le="5"} 2' in text
+        assert 'nautical_container_downtime_seconds_bucket{container="app1",le="+Inf"} 2' in text
+        assert 'nautical_container_downtime_seconds_sum{container="app1"} 3.5' in text
+        assert 'nautical_container_downtime_seconds_count{container="app1"} 2' in text
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.inc("nautical_containers_failed_total", 1, {"reason": 'bad "quote"\\'})
+
+        assert 'nautical_containers_failed_total{reason="bad \\"quote\\"\\\\"} 1' in registry.render()
+
+    def test_totals_survive_save_and_load(self, tmp_path: Path):
+        path = str(tmp_path / "metrics.json")
+        registry = MetricsRegistry()
+        registry.inc("nautical_rsync_bytes_total", 100, {"container": "app1"})
+        registry.observe("nautical_rsync_duration_seconds", 2, {"container": "app1"})
+        registry.save(path)
+
+        loaded = MetricsRegistry.load(path)
+        loaded.inc("nautical_rsync_bytes_total", 50, {"container": "app1"})
+
+        assert loaded.render().count('nautical_rsync_bytes_total{container="app1"} 150') == 1
+        assert 'nautical_rsync_duration_seconds_count{container="app1"} 1' in loaded.render()
+        assert [p.name for p in tmp_path.iterdir()] == ["metrics.json"]
+
+    def test_missing_or_corrupt_file_starts_from_zero(self, tmp_path: Path):
+        assert MetricsRegistry.load(str(tmp_path / "missing.json")).counters == {}
+
+        (tmp_path / "corrupt.json").write_text("{not json")
+        assert MetricsRegistry.load(str(tmp_path / "corrupt.json")).counters == {}
+
+    def test_concurrent_runs_are_all_added(self, tmp_path: Path):
+        path = str(tmp_path / "metrics.json")
+
+        def run():
+            registry = MetricsRegistry()
+            registry.inc("nautical_backup_runs_total", 1, {"status": "success"})
+            registry.observe("nautical_backup_run_duration_seconds", 3)
+            registry.add_to_saved(path)
+
+        threads = [threading.Thread(target=run) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        text = MetricsRegistry.load(path).render()
+        assert 'nautical_backup_runs_total{status="success"} 10' in text
+        assert "nautical_backup_run_duration_seconds_count 10" in text
+        assert "nautical_backup_run_duration_seconds_sum 30" in text
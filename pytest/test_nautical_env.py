@@ -0,0 +1,60 @@
+from pathlib import Path
+
+import pytest
+
+from app.nautical_env import NauticalEnv, get_nautical_env, reload_nautical_env
+
+
+class TestCachedNauticalEnv:
+    def test_parsed_once(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+        env = get_nautical_env()
+
+        monkeypatch.setenv("LOG_LEVEL", "ERROR")
+        assert get_nautical_env() is env
+        assert get_nautical_env().LOG_LEVEL == "DEBUG"
+
+    def test_reload_picks_up_changes(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+        env = get_nautical_env()
+
+        monkeypatch.setenv("LOG_LEVEL", "ERROR")
+        reloaded = reload_nautical_env()
+
+        assert reloaded is not env
+        assert reloaded.LOG_LEVEL == "ERROR"
+        assert get_nautical_env() is reloaded
+
+    def test_shared_instance_is_read_only(self):
+        with pytest.raises(AttributeError):
+            get_nautical_env().LOG_LEVEL = "TRACE"
+
+    def test_skip_lists_are_split_into_sets(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SKIP_CONTAINERS", "app1, app2,,abc123")
+        monkeypatch.setenv("SKIP_STOPPING", "")
+        env = NauticalEnv()
+
+        assert env.SKIP_CONTAINERS_SET == {"app1", "app2", "abc123"}
+        assert env.SKIP_STOPPING_SET == frozenset()
+        assert env.SKIP_CONTAINERS == "app1, app2,,abc123"  # The raw value is still available
+
+    def test_collections_are_read_only(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("SECONDARY_DEST_DIRS", "/backup1, /backup2")
+        monkeypatch.setenv("OVERRIDE_SOURCE_DIR", "app1:app1-data")
+        env = get_nautical_env()
+
+        assert env.SECONDARY_DEST_DIRS == (Path("/backup1"), Path("/backup2"))
+        assert env.OVERRIDE_SOURCE_DIR == {"app1": "app1-data"}
+        with pytest.raises(TypeError):
+            env.OVERRIDE_SOURCE_DIR["app2"] = "app2-data"  # type: ignore[index]
+
+    def test_database_settings(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.delenv("NAUTICAL_DB_PATH", raising=False)
+        monkeypatch.setenv("NAUTICAL_DB_CACHE", "TRUE")
+        monkeypatch.setenv("NAUTICAL_DB_BACKEND", "unknown")
+        env = NauticalEnv()
+
+        assert env.NAUTICAL_DB_PATH == "/config"
+        assert env.NAUTICAL_DB_NAME == "nautical-db.json"
+        assert env.NAUTICAL_DB_CACHE is True
+        assert env.NAUTICAL_DB_BACKEND == "json"
@@ -0,0 +1,122 @@
+import os
+import threading
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from app.db import DB
+from app.retention_catalog import RetentionCatalog
+
+
+@pytest.fixture
+def db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> DB:
+    monkeypatch.setenv("REPORT_FILE", "false")
+    return DB(tmp_path / "nautical-db.json")
+
+
+@pytest.fixture
+def destination(tmp_path: Path) -> Path:
+    for folder in ["app/2000-01-01", "app/2000-01-02", "app/not-a-date"]:
+        (tmp_path / "destination" / folder).mkdir(parents=True)
+    (tmp_path / "destination" / "app" / "file.txt").write_text("not a folder")
+    return tmp_path / "destination"
+
+
+def bump_mtime(path: Path) -> None:
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+class TestRetentionCatalog:
+    def test_lists_dated_folders(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+
+        dated = sorted(path.name for _, path in catalog.dated_child_dirs(destination / "app"))
+        assert dated == ["2000-01-01", "2000-01-02"]
+        assert sorted(path.name for path in catalog.child_dirs(destination)) == ["app"]
+
+    def test_unchanged_folder_is_not_listed_again(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.dated_child_dirs(destination / "app")
+        catalog.save()
+
+        reloaded = RetentionCatalog(db, "%Y-%m-%d")
+        assert len(reloaded.dated_child_dirs(destination / "app")) == 2
+        assert reloaded.scans == 0
+
+    def test_drift_triggers_a_new_listing(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.dated_child_dirs(destination / "app")
+
+        (destination / "app" / "2000-01-03").mkdir()
+        bump_mtime(destination / "app")  # Some filesystems keep the same mtime within one tick
+
+        assert len(catalog.dated_child_dirs(destination / "app")) == 3
+        assert catalog.scans == 2
+
+    def test_tracked_changes_update_in_place(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.child_dirs(destination)
+        catalog.dated_child_dirs(destination / "app")
+
+        with catalog.tracking(destination, destination / "app" / "2000-01-03"):
+            (destination / "app" / "2000-01-03").mkdir()
+        with catalog.tracking(destination, destination / "app" / "2000-01-01"):
+            (destination / "app" / "2000-01-01").rmdir()
+        with catalog.tracking(destination, destination / "other" / "2000-01-01"):
+            (destination / "other" / "2000-01-01").mkdir(parents=True)
+
+        dated = sorted(path.name for _, path in catalog.dated_child_dirs(destination / "app"))
+        assert dated == ["2000-01-02", "2000-01-03"]
+        assert sorted(path.name for path in catalog.child_dirs(destination)) == ["app", "other"]
+        assert catalog.scans == 2
+
+    def test_untracked_drift_is_not_hidden_by_tracked_change(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.dated_child_dirs(destination / "app")
+
+        (destination / "app" / "2000-01-04").mkdir()
+        bump_mtime(destination / "app")
+        with catalog.tracking(destination, destination / "app" / "2000-01-03"):
+            (destination / "app" / "2000-01-03").mkdir()
+
+        dated = sorted(path.name for _, path in catalog.dated_child_dirs(destination / "app"))
+        assert dated == ["2000-01-01", "2000-01-02", "2000-01-03", "2000-01-04"]
+
+    def test_other_threads_can_list_while_a_change_is_tracked(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.dated_child_dirs(destination / "app")
+
+        listed: List[int] = []
+        with catalog.tracking(destination, destination / "app" / "2000-01-03"):
+            reader = threading.Thread(target=lambda: listed.append(len(catalog.dated_child_dirs(destination / "app"))))
+            reader.start()
+            reader.join(timeout=5)
+            assert listed == [2]  # The lock is not held while the folder is created
+            (destination / "app" / "2000-01-03").mkdir()
+
+        assert len(catalog.dated_child_dirs(destination / "app")) == 3
+
+    def test_overlapping_changes_leave_the_entry_to_be_listed_again(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.dated_child_dirs(destination / "app")
+
+        with catalog.tracking(destination, destination / "app" / "2000-01-03"):
+            with catalog.tracking(destination, destination / "app" / "2000-01-04"):
+                (destination / "app" / "2000-01-04").mkdir()
+            (destination / "app" / "2000-01-03").mkdir()
+            bump_mtime(destination / "app")
+
+        dated = sorted(path.name for _, path in catalog.dated_child_dirs(destination / "app"))
+        assert dated == ["2000-01-01", "2000-01-02", "2000-01-03", "2000-01-04"]
+        assert catalog.scans == 2
+
+    def test_date_format_change_discards_catalog(self, db: DB, destination: Path):
+        catalog = RetentionCatalog(db, "%Y-%m-%d")
+        catalog.dated_child_dirs(destination / "app")
+        catalog.save()
+
+        reloaded = RetentionCatalog(db, "%Y%m%d")
+        assert reloaded.dated_child_dirs(destination / "app") == []
+        assert reloaded.scans == 1
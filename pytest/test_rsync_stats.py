@@ -0,0 +1,70 @@
+import pytest
+
+from app.rsync_stats import parse_rsync_stats, strip_quiet_flag, strip_rsync_stats
+
+RSYNC_STATS_OUTPUT = """
+Number of files: 1,204 (reg: 1,100, dir: 104)
+Number of created files: 3 (reg: 3)
+Number of deleted files: 0
+Number of regular files transferred: 12
+Total file size: 52,428,800 bytes
+Total transferred file size: 1,048,576 bytes
+Literal data: 524,288 bytes
+Matched data: 524,288 bytes
+File list size: 0
+File list generation time: 0.001 seconds
+File list transfer time: 0.000 seconds
+Total bytes sent: 530,000
+Total bytes received: 2,400
+
+sent 530,000 bytes  received 2,400 bytes  1,064,800.00 bytes/sec
+total size is 52,428,800  speedup is 98.47
+"""
+
+
+class TestParseRsyncStats:
+    def test_parses_stats_block(self):
+        assert parse_rsync_stats(RSYNC_STATS_OUTPUT) == {
+            "files": 1204,
+            "files_transferred": 12,
+            "total_file_size": 52428800,
+            "transferred_file_size": 1048576,
+            "literal_data": 524288,
+            "matched_data": 524288,
+            "bytes_sent": 530000,
+            "bytes_received": 2400,
+        }
+
+    def test_parses_human_readable_values(self):
+        stats = parse_rsync_stats("Total transferred file size: 1.50M bytes\nLiteral data: 2K bytes")
+        assert stats == {"transferred_file_size": 1_500_000, "literal_data": 2000}
+
+    def test_parses_old_rsync_labels(self):
+        assert parse_rsync_stats("Number of files transferred: 7") == {"files_transferred": 7}
+
+    def test_ignores_other_output(self):
+        assert parse_rsync_stats("sending incremental file list\napp/data.txt\n") == {}
+
+
+class TestStripRsyncStats:
+    def test_keeps_the_output_before_the_stats(self):
+        output = "sending incremental file list\napp/data.txt\n" + RSYNC_STATS_OUTPUT
+        assert strip_rsync_stats(output) == "sending incremental file list\napp/data.txt"
+
+    def test_stats_only(self):
+        assert strip_rsync_stats(RSYNC_STATS_OUTPUT) == ""
+
+
+class TestStripQuietFlag:
+    @pytest.mark.parametrize(
+        "args, expected",
+        [
+            ("-ahq ", "-ah "),
+            ("-q -a", " -a"),
+            ("-ah --quiet --exclude=q", "-ah  --exclude=q"),
+            ("-ah -e 'ssh -q'", "-ah -e 'ssh -q'"),
+            ("-ah", "-ah"),
+        ],
+    )
+    def test_removes_quiet(self, args: str, expected: str):
+        assert strip_quiet_flag(args) == expected
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+import pytz
+from mock import MagicMock, patch
+
+from app.api.utils import next_cron_occurrences, next_cron_time
+from app.scheduler import NauticalScheduler
+
+
+@pytest.fixture
+def scheduler(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("REPORT_FILE", "false")
+    with patch("app.scheduler.NauticalBackup") as nautical_backup:
+        yield NauticalScheduler(MagicMock())
+    nautical_backup.assert_called_once()  # The same NauticalBackup is reused for every run
+
+
+class TestNextCronTime:
+    def test_matches_first_occurrence(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("CRON_SCHEDULE", "*/15 * * * *")
+        monkeypatch.setenv("TZ", "Etc/UTC")
+        now = datetime(2024, 1, 1, 10, 7, tzinfo=pytz.utc)
+
+        assert next_cron_time(now) == datetime(2024, 1, 1, 10, 15, tzinfo=pytz.utc)
+        assert next_cron_occurrences(1, now)["1"][1] == "01/01/24 10:15"
+
+    def test_disabled(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("CRON_SCHEDULE_ENABLED", "false")
+        assert next_cron_time() is None
+
+
+class TestNauticalScheduler:
+    def test_runs_backup_on_each_occurrence(self, scheduler: NauticalScheduler):
+        runs: List[int] = []
+
+        def backup():
+            runs.append(1)
+            if len(runs) == 3:
+                scheduler.stop()
+
+        scheduler.nautical.backup.side_effect = backup
+        past = datetime.now(pytz.utc) - timedelta(seconds=1)
+        with patch("app.scheduler.next_cron_time", return_value=past):
+            scheduler.run_forever()
+
+        assert len(runs) == 3
+
+    def test_backup_errors_do_not_stop_the_scheduler(self, scheduler: NauticalScheduler):
+        calls: List[int] = []
+
+        def backup():
+            calls.append(1)
+            if len(calls) == 2:
+                scheduler.stop()
+            raise RuntimeError("docker went away")
+
+        scheduler.nautical.backup.side_effect = backup
+        past = datetime.now(pytz.utc) - timedelta(seconds=1)
+        with patch("app.scheduler.next_cron_time", return_value=past):
+            scheduler.run_forever()
+
+        assert len(calls) == 2
+
+    def test_stop_interrupts_the_wait(self, scheduler: NauticalScheduler):
+        scheduler.stop()
+        assert scheduler.wait_until(datetime.now(pytz.utc) + timedelta(hours=1)) is False
+
+    def test_exits_when_schedule_disabled(self, scheduler: NauticalScheduler, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("CRON_SCHEDULE_ENABLED", "false")
+        scheduler.run_forever()
+        scheduler.nautical.backup.assert_not_called()